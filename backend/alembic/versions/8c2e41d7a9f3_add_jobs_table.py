@@ -0,0 +1,49 @@
+"""Add jobs table for the background job queue
+
+Revision ID: 8c2e41d7a9f3
+Revises: 37f9dfd4b821
+Create Date: 2026-10-16 09:12:41.208313
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c2e41d7a9f3'
+down_revision: Union[str, None] = '37f9dfd4b821'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('jobs',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('document_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('payload', sa.JSON(), nullable=True),
+        sa.Column('status', sa.Enum('QUEUED', 'RUNNING', 'DONE', 'DEAD', name='jobstatusenum'), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('max_attempts', sa.Integer(), nullable=False),
+        sa.Column('run_at', sa.DateTime(), nullable=False),
+        sa.Column('locked_at', sa.DateTime(), nullable=True),
+        sa.Column('locked_by', sa.String(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_jobs_document_id'), 'jobs', ['document_id'], unique=False)
+    op.create_index('ix_jobs_status_run_at', 'jobs', ['status', 'run_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_jobs_status_run_at', table_name='jobs')
+    op.drop_index(op.f('ix_jobs_document_id'), table_name='jobs')
+    op.drop_table('jobs')
+    sa.Enum(name='jobstatusenum').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,45 @@
+"""Add (created_at DESC, id DESC) indexes for keyset pagination of the lists
+
+Revision ID: a3d5e8f17c42
+Revises: f2c8a6d40b19
+Create Date: 2026-10-16 22:05:13.481730
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3d5e8f17c42'
+down_revision: Union[str, None] = 'f2c8a6d40b19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (index, table, leading columns)
+INDEXES = [
+    ('ix_documents_hospital_id_created_at_id', 'documents', ['hospital_id']),
+    ('ix_templates_hospital_id_created_at_id', 'templates', ['hospital_id']),
+    ('ix_hospitals_created_at_id', 'hospitals', []),
+    ('ix_users_created_at_id', 'users', []),
+]
+
+
+def upgrade() -> None:
+    # A cursor can't point past a row without created_at
+    for _, table, _ in INDEXES:
+        op.execute(f"UPDATE {table} SET created_at = COALESCE(updated_at, now()) WHERE created_at IS NULL")
+
+    # Built without locking out writes to documents
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name, table, [*columns, sa.text('created_at DESC'), sa.text('id DESC')],
+                unique=False, postgresql_concurrently=True, if_not_exists=True
+            )
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,50 @@
+"""Add outbox_messages table for WizeChat notifications
+
+Revision ID: b5d09e3c6a17
+Revises: 8c2e41d7a9f3
+Create Date: 2026-10-16 14:37:05.614920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d09e3c6a17'
+down_revision: Union[str, None] = '8c2e41d7a9f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('outbox_messages',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('document_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('hospital_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('status', sa.Enum('PENDING', 'SENT', 'FAILED', 'EXPIRED', name='outboxstatusenum'), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.Column('after_job_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('response', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['hospital_id'], ['hospitals.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_outbox_messages_document_id'), 'outbox_messages', ['document_id'], unique=False)
+    op.create_index('ix_outbox_messages_status_next_attempt_at', 'outbox_messages', ['status', 'next_attempt_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_outbox_messages_status_next_attempt_at', table_name='outbox_messages')
+    op.drop_index(op.f('ix_outbox_messages_document_id'), table_name='outbox_messages')
+    op.drop_table('outbox_messages')
+    sa.Enum(name='outboxstatusenum').drop(op.get_bind(), checkfirst=True)
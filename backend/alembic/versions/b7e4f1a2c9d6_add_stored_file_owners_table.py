@@ -0,0 +1,47 @@
+"""Add stored_file_owners: the hospitals that may use each stored file
+
+Revision ID: b7e4f1a2c9d6
+Revises: d8e2a7c3b915
+Create Date: 2026-10-17 01:12:37.604218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e4f1a2c9d6'
+down_revision: Union[str, None] = 'd8e2a7c3b915'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('stored_file_owners',
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('hospital_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['sha256'], ['stored_files.sha256'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['hospital_id'], ['hospitals.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('sha256', 'hospital_id')
+    )
+
+    # Hospitals own the stored files their documents and templates already use;
+    # /upload-file uploads not used yet have to be uploaded again
+    op.execute("""
+        INSERT INTO stored_file_owners (sha256, hospital_id, created_at)
+        SELECT DISTINCT s.sha256, r.hospital_id, now() AT TIME ZONE 'UTC'
+        FROM stored_files s
+        JOIN (
+            SELECT hospital_id, file_path FROM documents
+            UNION
+            SELECT hospital_id, file_path FROM templates
+        ) r ON r.file_path = s.path
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('stored_file_owners')
@@ -0,0 +1,44 @@
+"""Add pg_trgm GIN indexes for document search
+
+Revision ID: c6b1f4a9e2d7
+Revises: a3d5e8f17c42
+Create Date: 2026-10-16 23:31:52.917604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6b1f4a9e2d7'
+down_revision: Union[str, None] = 'a3d5e8f17c42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (index, table, column) searched by app/services/search.py
+INDEXES = [
+    ('ix_documents_procedure_name_trgm', 'documents', 'procedure_name'),
+    ('ix_documents_doctor_name_trgm', 'documents', 'doctor_name'),
+    ('ix_patients_full_name_trgm', 'patients', 'full_name'),
+    ('ix_patients_email_trgm', 'patients', 'email'),
+]
+
+
+def upgrade() -> None:
+    # Creating an extension needs the CREATE privilege on the database (the postgres user has it)
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # Built without locking out writes to documents
+    with op.get_context().autocommit_block():
+        for name, table, column in INDEXES:
+            op.create_index(
+                name, table, [column], unique=False, postgresql_using='gin',
+                postgresql_ops={column: 'gin_trgm_ops'}, postgresql_concurrently=True, if_not_exists=True
+            )
+
+
+def downgrade() -> None:
+    # pg_trgm is left installed; other database objects may use it
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
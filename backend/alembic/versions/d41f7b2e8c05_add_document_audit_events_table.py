@@ -0,0 +1,98 @@
+"""Move document audit trails from documents.audit_trail to document_audit_events
+
+Revision ID: d41f7b2e8c05
+Revises: b5d09e3c6a17
+Create Date: 2026-10-16 15:02:11.540871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41f7b2e8c05'
+down_revision: Union[str, None] = 'b5d09e3c6a17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('document_audit_events',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('document_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('ts', sa.DateTime(), nullable=False),
+        sa.Column('action', sa.String(), nullable=False),
+        sa.Column('actor', sa.String(), nullable=True),
+        sa.Column('details', sa.Text(), nullable=True),
+        sa.Column('extra', sa.JSON(), nullable=True),
+        sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    # Audit timestamps are UTC: naive (server events), with a trailing Z or with
+    # an offset (client events, whatever SignatureSubmit.audit_events carried).
+    # Values that don't parse give NULL instead of aborting the migration.
+    op.execute("""
+        CREATE FUNCTION audit_event_ts(value text) RETURNS timestamp
+        LANGUAGE plpgsql STABLE SET timezone = 'UTC' AS $$
+        BEGIN
+            IF value !~ '^\\d{4}-\\d{2}-\\d{2}[T ]\\d{2}:\\d{2}' THEN
+                RETURN NULL;
+            END IF;
+            RETURN value::timestamptz AT TIME ZONE 'UTC';
+        EXCEPTION WHEN data_exception THEN
+            RETURN NULL;
+        END
+        $$
+    """)
+
+    # Copy the existing trails in their original order; events without a usable
+    # timestamp get the document's creation time
+    op.execute("""
+        INSERT INTO document_audit_events (document_id, ts, action, actor, details, extra)
+        SELECT
+            d.id,
+            COALESCE(audit_event_ts(e.event->>'timestamp'), d.created_at, now() AT TIME ZONE 'UTC'),
+            COALESCE(e.event->>'action', 'UNKNOWN'),
+            e.event->>'actor',
+            e.event->>'details',
+            NULLIF((e.event::jsonb - 'timestamp' - 'action' - 'actor' - 'details')::text, '{}')::json
+        FROM documents d
+        CROSS JOIN LATERAL json_array_elements(d.audit_trail) WITH ORDINALITY AS e(event, position)
+        WHERE json_typeof(d.audit_trail) = 'array' AND json_typeof(e.event) = 'object'
+        ORDER BY d.id, e.position
+    """)
+    op.execute("DROP FUNCTION audit_event_ts(text)")
+
+    # Created after the copy so the insert doesn't maintain it row by row
+    op.create_index('ix_document_audit_events_document_id_ts', 'document_audit_events', ['document_id', 'ts'], unique=False)
+    op.drop_column('documents', 'audit_trail')
+
+
+def downgrade() -> None:
+    op.add_column('documents', sa.Column('audit_trail', sa.JSON(), nullable=True))
+    op.execute("""
+        UPDATE documents d
+        SET audit_trail = t.trail
+        FROM (
+            SELECT
+                document_id,
+                json_agg(
+                    (jsonb_build_object(
+                        'timestamp', to_char(ts, 'YYYY-MM-DD"T"HH24:MI:SS.US'),
+                        'action', action,
+                        'actor', actor,
+                        'details', details
+                    ) || COALESCE(extra::jsonb, '{}'::jsonb))::json
+                    ORDER BY ts, id
+                ) AS trail
+            FROM document_audit_events
+            GROUP BY document_id
+        ) t
+        WHERE t.document_id = d.id
+    """)
+    op.drop_index('ix_document_audit_events_document_id_ts', table_name='document_audit_events')
+    op.drop_table('document_audit_events')
@@ -0,0 +1,32 @@
+"""Add a partial index on documents.link_expiry for the link expiry sweep
+
+Revision ID: d8e2a7c3b915
+Revises: c6b1f4a9e2d7
+Create Date: 2026-10-17 00:24:06.158273
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8e2a7c3b915'
+down_revision: Union[str, None] = 'c6b1f4a9e2d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Only documents that can still expire (app/services/link_expiry.py); built without locking out writes
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_documents_link_expiry_expirable', 'documents', ['link_expiry'], unique=False,
+            postgresql_where=sa.text("status IN ('DRAFT', 'SENT', 'VIEWED')"),
+            postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_documents_link_expiry_expirable', table_name='documents')
@@ -0,0 +1,37 @@
+"""Add stored_files table for the content-addressed upload store
+
+Revision ID: e7a3c9152b4d
+Revises: d41f7b2e8c05
+Create Date: 2026-10-16 18:41:27.093518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a3c9152b4d'
+down_revision: Union[str, None] = 'd41f7b2e8c05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing files are moved into the store by dedupe_uploads.py
+    op.create_table('stored_files',
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('path', sa.Text(), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('content_type', sa.String(), nullable=True),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('sha256'),
+        sa.UniqueConstraint('path')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('stored_files')
@@ -0,0 +1,98 @@
+"""Merge duplicate patients, make external_id unique per hospital and add the normalized phone
+
+Revision ID: f2c8a6d40b19
+Revises: e7a3c9152b4d
+Create Date: 2026-10-16 21:12:48.306214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c8a6d40b19'
+down_revision: Union[str, None] = 'e7a3c9152b4d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Patient names compared with whitespace and case ignored, as by app/services/patients.py
+FULL_NAME_KEY = r"lower(regexp_replace(btrim(full_name), '\s+', ' ', 'g'))"
+
+
+def merge_duplicates(key: str, where: str) -> None:
+    """
+    Keep the latest patient of every (hospital_id, key) group, the one the old
+    lookups returned, and move the documents of the others to it.
+    """
+    op.execute(f"""
+        CREATE TEMP TABLE patient_merges AS
+        SELECT id, keep_id FROM (
+            SELECT id, first_value(id) OVER (
+                PARTITION BY hospital_id, {key} ORDER BY created_at DESC NULLS LAST, id DESC
+            ) AS keep_id
+            FROM patients
+            WHERE {where}
+        ) ranked
+        WHERE id <> keep_id
+    """)
+    op.execute("""
+        INSERT INTO document_audit_events (document_id, ts, action, actor, details)
+        SELECT d.id, now() AT TIME ZONE 'utc', 'PATIENT_MERGED', 'SYSTEM',
+               'Duplicate patient ' || m.id || ' merged into ' || m.keep_id
+        FROM documents d JOIN patient_merges m ON d.patient_id = m.id
+    """)
+    op.execute("UPDATE documents d SET patient_id = m.keep_id FROM patient_merges m WHERE d.patient_id = m.id")
+    op.execute("DELETE FROM patients p USING patient_merges m WHERE p.id = m.id")
+    op.execute("DROP TABLE patient_merges")
+
+
+def report_shared_phones() -> None:
+    """Print the patients without an external_id that still share a phone, for manual review"""
+    if op.get_context().as_sql:
+        return
+    groups = op.get_bind().execute(sa.text("""
+        SELECT hospital_id, phone_normalized, array_agg(id::text ORDER BY created_at) AS ids
+        FROM patients
+        WHERE phone_normalized IS NOT NULL AND external_id IS NULL
+        GROUP BY hospital_id, phone_normalized
+        HAVING count(*) > 1
+    """)).all()
+    if groups:
+        print(f"⚠️ {len(groups)} phone numbers are shared by patients with different names or emails (not merged):")
+        for hospital_id, phone, ids in groups:
+            print(f"   hospital {hospital_id}, phone {phone}: {', '.join(ids)}")
+
+
+def upgrade() -> None:
+    op.add_column('patients', sa.Column('phone_normalized', sa.String(), nullable=True))
+
+    # Same rules as normalize_phone() in app/services/patients.py
+    op.execute("UPDATE patients SET external_id = NULL WHERE external_id = ''")
+    op.execute(r"""
+        UPDATE patients
+        SET phone_normalized = CASE WHEN phone ~ '^\s*\+' THEN '+' ELSE '' END || regexp_replace(phone, '\D', '', 'g')
+        WHERE regexp_replace(phone, '\D', '', 'g') <> ''
+    """)
+
+    merge_duplicates("external_id", "external_id IS NOT NULL")
+    # Relatives share phones, so only patients that also agree on name and email are the same person
+    merge_duplicates(
+        f"phone_normalized, {FULL_NAME_KEY}, lower(email)", "phone_normalized IS NOT NULL AND external_id IS NULL"
+    )
+    report_shared_phones()
+
+    op.create_index(op.f('ix_patients_phone_normalized'), 'patients', ['phone_normalized'], unique=False)
+    op.create_index(
+        'uq_patients_hospital_id_external_id', 'patients', ['hospital_id', 'external_id'], unique=True,
+        postgresql_where=sa.text('external_id IS NOT NULL')
+    )
+
+
+def downgrade() -> None:
+    # Merged patients are not split again
+    op.drop_index('uq_patients_hospital_id_external_id', table_name='patients')
+    op.drop_index(op.f('ix_patients_phone_normalized'), table_name='patients')
+    op.drop_column('patients', 'phone_normalized')
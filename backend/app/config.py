@@ -13,6 +13,63 @@ class Settings(BaseSettings):
     WIZECHAT_API_URL: str | None = None
     WIZECHAT_API_KEY: str | None = None
     
+    # PDF rendering process pool (per uvicorn worker)
+    PDF_RENDER_WORKERS: int = 2
+    PDF_RENDER_MAX_QUEUE: int = 16  # Jobs allowed to wait for a free worker before 503
+    PDF_RENDER_RETRY_AFTER: int = 5  # Seconds advertised in Retry-After when saturated
+    PDF_PARSE_CACHE_MAX_MB: int = 64  # Parsed source PDF cache, per render process
+    PDF_OUTPUT_MODE: str = "full"  # "full" rewrite or "incremental" (append-only update of the original)
+    PDF_LINEARIZE: bool = True  # Linearize originals and full-mode signed PDFs (needs pikepdf)
+    SIGNATURE_IMAGE_DPI: int = 200  # Signature images are downsampled to this resolution
+    IMAGE_PDF_DPI: int = 200  # Uploaded photos/scans are downscaled to this resolution on the page
+    IMAGE_PDF_JPEG_QUALITY: int = 85  # Used when a downscaled photo is re-encoded
+
+    # Multipart uploads (app/services/storage.py)
+    UPLOAD_MAX_MB: int = 25  # Per file part
+    UPLOAD_WRITE_BUFFER_KB: int = 1024  # File data buffered per request before it is written out
+    STORAGE_GC_GRACE_HOURS: int = 24  # Unreferenced stored files (and abandoned partial uploads) are kept this long
+    STORAGE_GC_INTERVAL: int = 3600  # Seconds between garbage collection runs in worker.py
+
+    # Link expiry sweep (app/services/link_expiry.py, runs in worker.py)
+    LINK_EXPIRY_SWEEP_INTERVAL: int = 300  # Seconds between sweeps
+    LINK_EXPIRY_BATCH_SIZE: int = 500  # Documents expired per transaction
+
+    # POST /api/documents/bulk-create
+    BULK_CREATE_MAX_ITEMS: int = 500  # Documents per request
+
+    # Patient view cache (app/services/document_cache.py)
+    DOCUMENT_CACHE_TTL: float = 30  # Seconds a cached view is served (0 disables the cache)
+    DOCUMENT_CACHE_MAX_ENTRIES: int = 10000  # Per API process, least recently viewed dropped first
+
+    # Document search (app/services/search.py)
+    SEARCH_STATEMENT_TIMEOUT_MS: int = 3000  # A search running longer is cancelled and answered with 503
+
+    # Per-request database cost (app/services/query_stats.py)
+    SERVER_TIMING_HEADER: bool = True  # Send round trips / statements / DB time in a Server-Timing header
+
+    # Page raster previews for the mobile patient view (needs pypdfium2)
+    PREVIEW_DIR: str = "/app/previews"
+    PREVIEW_WIDTHS: list[int] = [480, 960]  # Pixel widths rendered per page
+    PREVIEW_FORMAT: str = "webp"  # "webp" or "jpeg"
+    PREVIEW_QUALITY: int = 70
+
+    # Background job queue (worker.py)
+    JOB_WORKER_CONCURRENCY: int = 4  # Jobs run at once per worker process
+    JOB_POLL_INTERVAL: float = 1.0  # Seconds between polls when the queue is idle
+    JOB_MAX_ATTEMPTS: int = 5  # Attempts before a job is dead-lettered
+    JOB_RETRY_BASE_SECONDS: int = 10  # Backoff after the n-th failure: base * 2^(n-1) (jobs and outbox)
+    JOB_RETRY_MAX_SECONDS: int = 900
+    JOB_LOCK_TIMEOUT: int = 600  # RUNNING jobs locked longer than this are assumed lost and retried
+    JOB_RETENTION_DAYS: int = 30  # Finished jobs (shown on documents) and sent outbox messages are deleted after this
+    JOB_WORKER_METRICS_PORT: int = 9101  # /metrics of the worker process (0 disables)
+
+    # WizeChat outbox dispatcher (runs in worker.py)
+    OUTBOX_CONCURRENCY: int = 8  # Messages in flight to WizeChat at once
+    OUTBOX_POLL_INTERVAL: float = 0.5  # OTPs go through the outbox, keep this short
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_LEASE_SECONDS: int = 120  # A claimed message is retried after this if its dispatcher dies
+    WIZECHAT_MAX_CONNECTIONS: int = 20  # Shared HTTP client pool size
+
     APP_NAME: str = "WizeSign"
     APP_ENV: str = "development"
 
@@ -1,14 +1,38 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
+from app.database import engine
 from app.routers import documents, auth, templates, hospitals, superadmin
+from app.services.pdf_generator import pdf_render_engine
+from app.services.metrics import metrics
+from app.services.document_cache import document_cache
+from app.services.query_stats import QueryStatsMiddleware, instrument
+from app.services.wizechat import wizechat_service
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    document_cache.start()
+    yield
+    await document_cache.stop()
+    # Let in-flight renders finish, drop queued ones
+    pdf_render_engine.shutdown(wait=True)
+    await wizechat_service.aclose()
+
 
 app = FastAPI(
     title=settings.APP_NAME,
     description="E-Signature Platform API for WizeSign",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Count statements / round trips / DB time per request
+instrument(engine.sync_engine)
+app.add_middleware(QueryStatsMiddleware, server_timing=settings.SERVER_TIMING_HEADER)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -16,6 +40,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # pdf.js needs the Range ones to switch to Range requests cross-origin; X-Next-Cursor pages the lists
+    expose_headers=["Accept-Ranges", "Content-Range", "Content-Length", "ETag", "Server-Timing", "X-Next-Cursor"],
 )
 
 # Include routers
@@ -40,6 +66,12 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint (internal: nginx only proxies /api/)"""
+    return PlainTextResponse(await metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Enum, JSON, Text, Integer, Float
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Enum, JSON, Text, Integer, BigInteger, Float, Index, text, DDL, event
 from sqlalchemy.dialects.postgresql import UUID, ARRAY
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -7,6 +7,12 @@ import enum
 
 from .database import Base
 
+# The trigram indexes need pg_trgm (the migrations create it too)
+event.listen(
+    Base.metadata, "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
 
 class RoleEnum(str, enum.Enum):
     SUPERADMIN = "SUPERADMIN"
@@ -25,6 +31,20 @@ class DocumentStatusEnum(str, enum.Enum):
     EXPIRED = "EXPIRED"
 
 
+class JobStatusEnum(str, enum.Enum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    DEAD = "DEAD"  # Out of attempts; kept for inspection and manual requeue
+
+
+class OutboxStatusEnum(str, enum.Enum):
+    PENDING = "PENDING"
+    SENT = "SENT"
+    FAILED = "FAILED"  # Rejected by WizeChat or out of attempts
+    EXPIRED = "EXPIRED"  # Not delivered before expires_at (e.g. an OTP past its validity)
+
+
 class Hospital(Base):
     __tablename__ = "hospitals"
 
@@ -47,6 +67,11 @@ class Hospital(Base):
     documents = relationship("Document", back_populates="hospital")
     templates = relationship("Template", back_populates="hospital")
 
+    __table_args__ = (
+        # Keyset pagination (app/services/pagination.py)
+        Index("ix_hospitals_created_at_id", text("created_at DESC"), text("id DESC")),
+    )
+
 
 class User(Base):
     __tablename__ = "users"
@@ -74,6 +99,11 @@ class User(Base):
     documents = relationship("Document", back_populates="created_by")
     templates = relationship("Template", back_populates="created_by")
 
+    __table_args__ = (
+        # Keyset pagination (app/services/pagination.py)
+        Index("ix_users_created_at_id", text("created_at DESC"), text("id DESC")),
+    )
+
 
 class Template(Base):
     __tablename__ = "templates"
@@ -98,6 +128,11 @@ class Template(Base):
     created_by = relationship("User", back_populates="templates")
     documents = relationship("Document", back_populates="template")
 
+    __table_args__ = (
+        # Keyset pagination (app/services/pagination.py)
+        Index("ix_templates_hospital_id_created_at_id", "hospital_id", text("created_at DESC"), text("id DESC")),
+    )
+
 
 class Patient(Base):
     __tablename__ = "patients"
@@ -109,6 +144,7 @@ class Patient(Base):
     full_name = Column(String, nullable=False)
     email = Column(String, nullable=True, index=True)
     phone = Column(String, nullable=True, index=True)
+    phone_normalized = Column(String, nullable=True, index=True)  # Digits and leading + (app/services/patients.py)
     dob = Column(String, nullable=True)
     
     age = Column(Float, nullable=True)
@@ -125,6 +161,23 @@ class Patient(Base):
     hospital = relationship("Hospital", back_populates="patients")
     documents = relationship("Document", back_populates="patient")
 
+    __table_args__ = (
+        # Conflict target of the patient insert; phone_normalized isn't unique, relatives share phones
+        Index(
+            "uq_patients_hospital_id_external_id", "hospital_id", "external_id", unique=True,
+            postgresql_where=text("external_id IS NOT NULL")
+        ),
+        # Document search (app/services/search.py)
+        Index(
+            "ix_patients_full_name_trgm", "full_name",
+            postgresql_using="gin", postgresql_ops={"full_name": "gin_trgm_ops"}
+        ),
+        Index(
+            "ix_patients_email_trgm", "email",
+            postgresql_using="gin", postgresql_ops={"email": "gin_trgm_ops"}
+        ),
+    )
+
 
 class Document(Base):
     __tablename__ = "documents"
@@ -171,8 +224,7 @@ class Document(Base):
     # Fields (JSON)
     fields = Column(JSON, nullable=True)
 
-    # Audit Trail
-    audit_trail = Column(JSON, default=list)
+    # Audit trail lives in document_audit_events (app/services/audit.py)
 
     # Created By
     created_by_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
@@ -184,3 +236,123 @@ class Document(Base):
     patient = relationship("Patient", back_populates="documents")
     template = relationship("Template", back_populates="documents")
     created_by = relationship("User", back_populates="documents")
+
+    __table_args__ = (
+        # Keyset pagination (app/services/pagination.py)
+        Index("ix_documents_hospital_id_created_at_id", "hospital_id", text("created_at DESC"), text("id DESC")),
+        # Link expiry sweep (app/services/link_expiry.py): only documents that can still expire
+        Index(
+            "ix_documents_link_expiry_expirable", "link_expiry",
+            postgresql_where=text("status IN ('DRAFT', 'SENT', 'VIEWED')")
+        ),
+        # Document search (app/services/search.py)
+        Index(
+            "ix_documents_procedure_name_trgm", "procedure_name",
+            postgresql_using="gin", postgresql_ops={"procedure_name": "gin_trgm_ops"}
+        ),
+        Index(
+            "ix_documents_doctor_name_trgm", "doctor_name",
+            postgresql_using="gin", postgresql_ops={"doctor_name": "gin_trgm_ops"}
+        ),
+    )
+
+
+class StoredFile(Base):
+    """
+    A file in the content-addressed upload store (app/services/storage.py),
+    shared by every document and template whose file_path points to it.
+    """
+    __tablename__ = "stored_files"
+
+    sha256 = Column(String(64), primary_key=True)  # Of the file as uploaded (stored PDFs are linearized)
+    path = Column(Text, nullable=False, unique=True)
+    size = Column(BigInteger, nullable=False)
+    content_type = Column(String, nullable=True)
+    ref_count = Column(Integer, default=0, nullable=False)  # Documents + templates using it; 0 = garbage after a grace period
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)  # Last reference change
+
+
+class StoredFileOwner(Base):
+    """
+    A hospital that uploaded a stored file or uses it. Files are shared on disk
+    across hospitals, but a client may only pass the path of a file its own
+    hospital owns (ContentStore.check_client_path).
+    """
+    __tablename__ = "stored_file_owners"
+
+    sha256 = Column(String(64), ForeignKey("stored_files.sha256", ondelete="CASCADE"), primary_key=True)
+    hospital_id = Column(UUID(as_uuid=True), ForeignKey("hospitals.id", ondelete="CASCADE"), primary_key=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class DocumentAuditEvent(Base):
+    """One audit trail entry of a document; rows are only ever inserted"""
+    __tablename__ = "document_audit_events"
+    __table_args__ = (
+        # Trail of one document in time order
+        Index("ix_document_audit_events_document_id_ts", "document_id", "ts"),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    document_id = Column(UUID(as_uuid=True), ForeignKey("documents.id", ondelete="CASCADE"), nullable=False)
+    ts = Column(DateTime, default=datetime.utcnow, nullable=False)
+    action = Column(String, nullable=False)  # e.g. DOCUMENT_CREATED, LINK_ACCESSED, SIGNED_PDF_GENERATED
+    actor = Column(String, nullable=True)  # User or patient name, or SYSTEM
+    details = Column(Text, nullable=True)
+    extra = Column(JSON, nullable=True)  # Any other keys of client-submitted events
+
+
+class Job(Base):
+    """Durable background job, claimed by worker.py with SELECT ... FOR UPDATE SKIP LOCKED"""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Dequeue scan: due jobs in run_at order
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    kind = Column(String, nullable=False)  # Handler name, e.g. render_signed_pdf
+    document_id = Column(UUID(as_uuid=True), ForeignKey("documents.id", ondelete="CASCADE"), nullable=True, index=True)
+    payload = Column(JSON, nullable=True)
+
+    status = Column(Enum(JobStatusEnum), default=JobStatusEnum.QUEUED, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=5, nullable=False)
+    run_at = Column(DateTime, default=datetime.utcnow, nullable=False)  # Not picked up before this time
+    locked_at = Column(DateTime, nullable=True)
+    locked_by = Column(String, nullable=True)  # Worker id (host:pid)
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class OutboxMessage(Base):
+    """
+    WizeChat message written in the same transaction as the document change that
+    triggers it, delivered by the outbox dispatcher in worker.py (at least once).
+    """
+    __tablename__ = "outbox_messages"
+    __table_args__ = (
+        Index("ix_outbox_messages_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    kind = Column(String, nullable=False)  # WizeChatService method: send_otp, send_signature_request, send_completion
+    document_id = Column(UUID(as_uuid=True), ForeignKey("documents.id", ondelete="CASCADE"), nullable=True, index=True)
+    hospital_id = Column(UUID(as_uuid=True), ForeignKey("hospitals.id"), nullable=True)  # API key is read at send time
+    payload = Column(JSON, nullable=False)  # Method arguments except api_key
+
+    status = Column(Enum(OutboxStatusEnum), default=OutboxStatusEnum.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)  # Also the lease of a claimed message
+    expires_at = Column(DateTime, nullable=True)
+    after_job_id = Column(UUID(as_uuid=True), nullable=True)  # Held back while this job is queued or running
+    last_error = Column(Text, nullable=True)
+    response = Column(JSON, nullable=True)  # WizeChat response body of the successful send
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
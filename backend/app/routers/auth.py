@@ -11,6 +11,7 @@ from app.database import get_db
 from app.models import User, RoleEnum, Hospital, Patient
 from app.schemas import SSOTokenValidate, SSOUserData, Token, UserResponse, SSOHospitalData, SSOPatientData
 from app.config import settings
+from app.services.patients import resolve_patient
 import uuid
 
 router = APIRouter(prefix="/api/auth", tags=["authentication"])
@@ -235,28 +236,19 @@ async def validate_sso_token(
     # 3. Deep Linking: Sync Patient if provided
     context_patient_id = None
     if patient_data:
-        p_ext_id = patient_data.get("id")
-        p_result = await db.execute(select(Patient).where(
-            (Patient.external_id == p_ext_id) & (Patient.hospital_id == hospital.id)
-        ))
-        patient = p_result.scalar_one_or_none()
-        
-        if not patient:
-            patient = Patient(
-                external_id=p_ext_id,
-                hospital_id=hospital.id,
-                full_name=patient_data.get("name"),
-                email=patient_data.get("email"),
-                phone=patient_data.get("phone"),
-                dob=patient_data.get("dob"),
-                registration_number=patient_data.get("reg_no"),
-                age=patient_data.get("age"),
-                gender=patient_data.get("gender"),
-                address=patient_data.get("address")
-            )
-            db.add(patient)
+        patient, created = await resolve_patient(db, hospital.id, {
+            "external_id": patient_data.get("id"),
+            "full_name": patient_data.get("name"),
+            "email": patient_data.get("email"),
+            "phone": patient_data.get("phone"),
+            "dob": patient_data.get("dob"),
+            "registration_number": patient_data.get("reg_no"),
+            "age": patient_data.get("age"),
+            "gender": patient_data.get("gender"),
+            "address": patient_data.get("address"),
+        })
+        if created or db.dirty:  # New patient, or an existing one linked to its WizeFlow id
             await db.commit()
-            await db.refresh(patient)
         
         context_patient_id = str(patient.id)
 
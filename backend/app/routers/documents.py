@@ -1,26 +1,45 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Header, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Header, UploadFile, File, Form, BackgroundTasks, Response
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, insert
+from sqlalchemy.orm import selectinload, load_only
 from typing import List, Optional
+from pydantic import TypeAdapter
 import uuid
 from datetime import datetime, timedelta
 from jose import jwt, JWTError
 import hashlib
 import secrets
 import random
-import shutil
 from pathlib import Path
+from contextlib import nullcontext
 
 from app.database import get_db
-from app.models import Document, Patient, DocumentStatusEnum, User, RoleEnum
+from app.models import Document, Patient, Template, Hospital, DocumentStatusEnum, User, RoleEnum
 from app.schemas import (
-    DocumentCreate, DocumentResponse, DocumentDetailResponse,
-    SignatureSubmit, DocumentUpdate
+    DocumentCreate, DocumentResponse, DocumentDetailResponse, DocumentSummaryResponse,
+    SignatureSubmit, DocumentUpdate,
+    BulkDocumentCreate, BulkDocumentCreateResponse, BulkDocumentResult
 )
 from app.config import settings
-from app.services.wizechat import wizechat_service
-from app.services.pdf_generator import pdf_generator_service
+from app.services.pdf_generator import pdf_generator_service, pdf_render_engine, RenderQueueFullError
+from app.services.file_responses import ranged_file_response
+from app.services.jobs import enqueue, jobs_for_documents, pending_job
+from app.services.document_jobs import RENDER_SIGNED_PDF, queue_completion_message
+from app.services.outbox import add_message
+from app.services import audit
+from app.services.patients import resolve_patient, resolve_patients
+from app.services.pagination import paginate, next_page
+from app.services.search import document_search, search_time_limit
+from app.services.document_cache import document_cache
+from app.services.link_expiry import EXPIRABLE_STATUSES
+from app.services.image_converter import image_converter
+from app.services.storage import (
+    read_upload_request, pdf_from_uploads, upload_openapi, UploadWriter, content_store
+)
+from app.services.page_previews import (
+    MEDIA_TYPES, previews_available, file_digest, preview_path, snap_width, render_page_preview
+)
 from app.schemas_wizechat import SendDocumentLinkRequest, WhatsAppResponse
 from fastapi.responses import FileResponse
 from app.routers.auth import get_current_user_from_token
@@ -39,6 +58,7 @@ UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 @router.post("/upload-file")
 async def upload_document_file(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user_from_token),
     db: AsyncSession = Depends(get_db)
@@ -58,26 +78,34 @@ async def upload_document_file(
             detail=f"Invalid file type. Allowed: PDF, JPEG, PNG"
         )
     
-    # Generate unique filename
-    file_id = uuid.uuid4()
-    file_extension = Path(file.filename).suffix if file.filename else ".pdf"
-    filename = f"{file_id}{file_extension}"
-    file_path = UPLOAD_DIR / filename
-    
-    # Save file
+    # Save file into the content store (an identical earlier upload is reused);
+    # it is linearized there for fast web view
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        writer = UploadWriter(UPLOAD_DIR, file.filename, 25 * 1024 * 1024)
+        try:
+            while chunk := await file.read(1024 * 1024):
+                await writer.write(chunk)
+            staged = await writer.finish()
+        except Exception:
+            writer.abort()
+            raise
+        file_path = await content_store.add(db, staged, current_user.hospital_id, reference=False)
         
         print(f"✅ File uploaded: {file_path}")
         
+        if staged.is_pdf:
+            # Page previews for the mobile view, rendered after the response is sent
+            background_tasks.add_task(pdf_render_engine.render_previews, file_path)
+        
         # Return the relative path that can be used later
         return {
-            "file_path": str(file_path),
-            "file_id": str(file_id),
+            "file_path": file_path,
+            "file_id": staged.sha256,
             "filename": file.filename,
             "content_type": file.content_type
         }
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error uploading file: {e}")
         raise HTTPException(
@@ -86,9 +114,26 @@ async def upload_document_file(
         )
 
 
-@router.post("/create", response_model=DocumentResponse, status_code=status.HTTP_201_CREATED)
+def fill_field_values(fields: List[dict], values: dict) -> List[dict]:
+    """Copy of `fields` with the given values set by field id; unknown ids are a 400"""
+    unknown = set(values) - {field.get("id") for field in fields}
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown field ids in field_values: {', '.join(sorted(unknown))}"
+        )
+    return [
+        {**field, "value": values[field["id"]]} if field.get("id") in values else field
+        for field in fields
+    ]
+
+
+@router.post(
+    "/create", response_model=DocumentResponse, status_code=status.HTTP_201_CREATED,
+    openapi_extra=upload_openapi(DocumentCreate)
+)
 async def create_document_for_patient(
-    document_data: DocumentCreate,
+    request: Request,
     current_user: User = Depends(get_current_user_from_token),
     db: AsyncSession = Depends(get_db)
 ):
@@ -99,58 +144,41 @@ async def create_document_for_patient(
     2. Create the document
     3. Generate a secure link
     4. Return the link for WizeChat to send via WhatsApp
+    
+    Body: DocumentCreate as JSON (file as base64 in file_content / a data URL),
+    or multipart/form-data with DocumentCreate in a `metadata` part and the PDF
+    or page images in `file` parts, which are streamed to disk.
+    With only a template_id the document shares the template's file and fields;
+    per-document values go in field_values.
     """
+    document_data, uploads = await read_upload_request(request, DocumentCreate)
+    await content_store.check_client_path(db, current_user.hospital_id, document_data.file_path)
     
-    # Step 1: Create or get patient (within same hospital)
-    # Prefer external_id, then email, then phone. Use latest match if duplicates exist.
-    patient = None
-    if document_data.patient.external_id:
+    template = None
+    if document_data.template_id:
         result = await db.execute(
-            select(Patient)
-            .where(
-                (Patient.external_id == document_data.patient.external_id) &
-                (Patient.hospital_id == current_user.hospital_id)
+            select(Template).where(
+                (Template.id == document_data.template_id) &
+                (Template.hospital_id == current_user.hospital_id)
             )
-            .order_by(Patient.created_at.desc())
-            .limit(1)
         )
-        patient = result.scalars().first()
-
-    if not patient and document_data.patient.email:
-        result = await db.execute(
-            select(Patient)
-            .where(
-                (Patient.email == document_data.patient.email) &
-                (Patient.hospital_id == current_user.hospital_id)
+        template = result.scalar_one_or_none()
+        if not template:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Template not found"
             )
-            .order_by(Patient.created_at.desc())
-            .limit(1)
-        )
-        patient = result.scalars().first()
     
-    if not patient and document_data.patient.phone:
-        result = await db.execute(
-            select(Patient)
-            .where(
-                (Patient.phone == document_data.patient.phone) &
-                (Patient.hospital_id == current_user.hospital_id)
-            )
-            .order_by(Patient.created_at.desc())
-            .limit(1)
-        )
-        patient = result.scalars().first()
-    
-    # Create new patient if not exists
-    if not patient:
-        patient = Patient(
-            full_name=document_data.patient.full_name,
-            email=document_data.patient.email,
-            phone=document_data.patient.phone,
-            dob=document_data.patient.dob,
-            hospital_id=current_user.hospital_id
-        )
-        db.add(patient)
-        await db.flush()  # Get the patient ID
+    fields = []
+    if document_data.fields is not None:
+        fields = [field.dict() for field in document_data.fields]
+    elif template:
+        fields = template.fields or []
+    if document_data.field_values:
+        fields = fill_field_values(fields, document_data.field_values)
+    
+    # Step 1: Create or get patient (within same hospital)
+    patient, _ = await resolve_patient(db, current_user.hospital_id, document_data.patient)
     
     # Step 2: Create document
     secure_token = uuid.uuid4()
@@ -171,15 +199,16 @@ async def create_document_for_patient(
         print(f"  - file_content length: {len(document_data.file_content)}")
         print(f"  - file_content starts with: {document_data.file_content[:50]}")
     
+    if uploads:
+        stored = await pdf_from_uploads(uploads)
+        file_path = await content_store.add(db, stored, current_user.hospital_id)
+        print(f"  - ✅ Streamed {len(uploads)} file part(s) to: {file_path} ({stored.size} bytes)")
+    
     # Check if file_url contains data URL (base64 encoded content)
-    if document_data.file_url and document_data.file_url.startswith('data:'):
+    elif document_data.file_url and document_data.file_url.startswith('data:'):
         print(f"  - 📄 file_url contains data URL, extracting...")
         try:
             import base64
-            from PIL import Image
-            import io
-            from reportlab.pdfgen import canvas
-            from reportlab.lib.pagesizes import letter
             
             # Extract base64 content from data URL
             if ',' in document_data.file_url:
@@ -195,49 +224,15 @@ async def create_document_for_patient(
             
             # Check if it's an image (JPEG/PNG) - convert to PDF
             if 'image/' in mime_type or not 'pdf' in mime_type.lower():
-                print(f"  - 🖼️ Converting image to PDF for signature overlay support...")
-                
-                # Open image and convert to PDF
-                image = Image.open(io.BytesIO(file_bytes))
-                img_width, img_height = image.size
-                print(f"  - Image size: {img_width}x{img_height}")
-                
-                # Create PDF from image
-                pdf_buffer = io.BytesIO()
-                # Scale to letter size while maintaining aspect ratio
-                pdf_width, pdf_height = letter
-                scale = min(pdf_width / img_width, pdf_height / img_height)
-                scaled_width = img_width * scale
-                scaled_height = img_height * scale
-                
-                # Center image on page
-                x_offset = (pdf_width - scaled_width) / 2
-                y_offset = (pdf_height - scaled_height) / 2
-                
-                c = canvas.Canvas(pdf_buffer, pagesize=letter)
-                
-                # Save image to temp buffer for reportlab
-                img_buffer = io.BytesIO()
-                image.save(img_buffer, format='PNG')
-                img_buffer.seek(0)
-                
-                from reportlab.lib.utils import ImageReader
-                img_reader = ImageReader(img_buffer)
-                c.drawImage(img_reader, x_offset, y_offset, scaled_width, scaled_height)
-                c.save()
-                
-                file_bytes = pdf_buffer.getvalue()
+                images = [file_bytes] + [
+                    base64.b64decode(url.split(',', 1)[-1]) for url in document_data.image_urls or []
+                ]
+                print(f"  - 🖼️ Converting {len(images)} image(s) to PDF for signature overlay support...")
+                file_bytes = await image_converter.convert_async(images)
                 print(f"  - ✅ Converted image to PDF: {len(file_bytes)} bytes")
             
-            # Save to uploads directory
-            file_id = uuid.uuid4()
-            filename = f"{file_id}.pdf"
-            file_path = UPLOAD_DIR / filename
-            
-            with open(file_path, 'wb') as f:
-                f.write(file_bytes)
-            
-            file_path = str(file_path)
+            # Save to the content store
+            file_path = await content_store.add_bytes(db, file_bytes, current_user.hospital_id)
             print(f"  - ✅ Saved file from data URL to: {file_path}")
             
         except Exception as e:
@@ -261,32 +256,34 @@ async def create_document_for_patient(
             file_bytes = base64.b64decode(file_content)
             print(f"  - Decoded {len(file_bytes)} bytes")
             
-            # Save to uploads directory
-            file_id = uuid.uuid4()
-            filename = f"{file_id}.pdf"
-            file_path = UPLOAD_DIR / filename
-            
-            with open(file_path, 'wb') as f:
-                f.write(file_bytes)
-            
-            file_path = str(file_path)
+            # Save to the content store
+            file_path = await content_store.add_bytes(db, file_bytes, current_user.hospital_id)
             print(f"✅ Saved uploaded file content to: {file_path}")
         except Exception as e:
             print(f"❌ Error saving file content: {e}")
             import traceback
             traceback.print_exc()
             file_path = None
+    elif template and not file_path and not document_data.file_content:
+        # The template's stored file is shared, nothing is decoded or copied
+        file_path = template.file_path
+        await content_store.acquire(db, file_path)
+        print(f"  - 📋 Using file of template {template.id}: {file_path}")
+    
     else:
         if not document_data.file_content:
             print(f"⚠️ No file_content provided in request")
         if file_path:
             print(f"  - file_path already set, skipping file_content processing")
+            # Shared with the upload or template it came from
+            await content_store.acquire(db, file_path)
     
     print(f"\n📝 CREATING DOCUMENT RECORD:")
     print(f"  - Will use file_path: {file_path}")
-    print(f"  - Fields count: {len(document_data.fields) if document_data.fields else 0}")
+    print(f"  - Fields count: {len(fields)}")
     
     document = Document(
+        id=uuid.uuid4(),
         transaction_id=transaction_id,
         procedure_name=document_data.procedure_name,
         file_url="", # Will update this after getting the ID
@@ -297,19 +294,14 @@ async def create_document_for_patient(
         template_id=document_data.template_id,
         secure_token=secure_token,
         link_expiry=link_expiry,
-        fields=[field.dict() for field in document_data.fields] if document_data.fields else [],
+        fields=fields,
         status=DocumentStatusEnum.SENT,
         hospital_id=current_user.hospital_id,
-        created_by_id=current_user.id,
-        audit_trail=[{
-            "timestamp": datetime.utcnow().isoformat(),
-            "action": "DOCUMENT_CREATED",
-            "actor": current_user.name,
-            "details": f"Document created for {patient.full_name}"
-        }]
+        created_by_id=current_user.id
     )
     
     db.add(document)
+    audit.record(db, document.id, "DOCUMENT_CREATED", current_user.name, f"Document created for {patient.full_name}")
     await db.commit()
     await db.refresh(document)
     
@@ -322,6 +314,11 @@ async def create_document_for_patient(
         document.file_url = document_data.file_url
         await db.commit()
         await db.refresh(document)
+    elif template and template.file_url:
+        # Template kept as an external URL only
+        document.file_url = template.file_url
+        await db.commit()
+        await db.refresh(document)
     
     print(f"\n✅ DOCUMENT CREATED SUCCESSFULLY:")
     print(f"  - Document ID: {document.id}")
@@ -347,6 +344,143 @@ async def create_document_for_patient(
     )
 
 
+@router.post("/bulk-create", response_model=BulkDocumentCreateResponse, status_code=status.HTTP_201_CREATED)
+async def bulk_create_documents(
+    bulk_data: BulkDocumentCreate,
+    current_user: User = Depends(get_current_user_from_token),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Create the same document (a template or a file from /upload-file) for many
+    patients in one transaction: patients are resolved with one query (and the
+    missing ones inserted with one more), documents inserted with one multi-row
+    INSERT. Items that can't be created are reported in `results` without
+    failing the others. With send_via_whatsapp the signature requests are
+    queued in the outbox like /send-whatsapp does.
+    """
+    if not bulk_data.items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No items to create")
+    if len(bulk_data.items) > settings.BULK_CREATE_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.BULK_CREATE_MAX_ITEMS} documents per request"
+        )
+    await content_store.check_client_path(db, current_user.hospital_id, bulk_data.file_path)
+    
+    template = None
+    if bulk_data.template_id:
+        result = await db.execute(
+            select(Template).where(
+                (Template.id == bulk_data.template_id) &
+                (Template.hospital_id == current_user.hospital_id)
+            )
+        )
+        template = result.scalar_one_or_none()
+        if not template:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Template not found")
+    
+    file_path = bulk_data.file_path or (template.file_path if template else None)
+    file_url = template.file_url if template and not file_path else ""
+    if not file_path and not file_url:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="template_id or file_path is required")
+    
+    base_fields = []
+    if bulk_data.fields is not None:
+        base_fields = [field.dict() for field in bulk_data.fields]
+    elif template:
+        base_fields = template.fields or []
+    default_procedure = bulk_data.procedure_name or (template.name if template else None)
+    
+    inbox_id = None
+    if bulk_data.send_via_whatsapp:
+        hospital = await db.get(Hospital, current_user.hospital_id)
+        config = (hospital.wizechat_config if hospital else None) or {}
+        inbox_id = bulk_data.inbox_id or config.get("inbox_id")
+        if not inbox_id or not config.get("api_key"):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="WizeChat is not configured. Please configure WizeChat settings first."
+            )
+    
+    results = [None] * len(bulk_data.items)
+    accepted = []
+    for index, item in enumerate(bulk_data.items):
+        procedure_name = item.procedure_name or default_procedure
+        if not procedure_name:
+            results[index] = BulkDocumentResult(index=index, success=False, error="procedure_name is required")
+            continue
+        try:
+            fields = fill_field_values(base_fields, item.field_values) if item.field_values else base_fields
+        except HTTPException as e:
+            results[index] = BulkDocumentResult(index=index, success=False, error=e.detail)
+            continue
+        accepted.append((index, item, procedure_name, fields))
+    
+    patients = await resolve_patients(db, current_user.hospital_id, [item.patient for _, item, _, _ in accepted])
+    
+    link_expiry = datetime.utcnow() + timedelta(days=7)
+    rows = []
+    for (index, item, procedure_name, fields), (patient, _) in zip(accepted, patients):
+        document_id = uuid.uuid4()
+        rows.append({
+            "id": document_id,
+            "transaction_id": uuid.uuid4(),
+            "procedure_name": procedure_name,
+            "file_url": f"/api/documents/{document_id}/pdf" if file_path else file_url,
+            "file_path": file_path,
+            "doctor_name": item.doctor_name or bulk_data.doctor_name,
+            "clinic_name": item.clinic_name or bulk_data.clinic_name,
+            "patient_id": patient.id,
+            "template_id": template.id if template else None,
+            "secure_token": uuid.uuid4(),
+            "link_expiry": link_expiry,
+            "fields": fields,
+            "status": DocumentStatusEnum.SENT,
+            "hospital_id": current_user.hospital_id,
+            "created_by_id": current_user.id,
+        })
+    documents = []
+    if rows:
+        result = await db.scalars(insert(Document).returning(Document, sort_by_parameter_order=True), rows)
+        documents = result.all()
+        await content_store.acquire(db, file_path, len(documents))
+    
+    for (index, item, _, _), (patient, patient_created), document in zip(accepted, patients, documents):
+        audit.record(db, document.id, "DOCUMENT_CREATED", current_user.name, f"Document created for {patient.full_name} (bulk)")
+        patient_link = f"{settings.FRONTEND_URL}/patient/view?token={document.secure_token}"
+        outcome = BulkDocumentResult(
+            index=index, success=True, document_id=document.id, patient_id=patient.id,
+            patient_created=patient_created, patient_link=patient_link
+        )
+        if bulk_data.send_via_whatsapp:
+            phone = item.patient.phone or patient.phone
+            if phone:
+                message = add_message(db, "send_signature_request", document, {
+                    "inbox_id": inbox_id,
+                    "to_phone": phone,
+                    "document_name": document.procedure_name,
+                    "signature_link": patient_link,
+                    "recipient_name": patient.full_name,
+                    "expires_in_hours": 7 * 24,
+                }, expires_at=link_expiry)
+                outcome.whatsapp_message_id = str(message.id)
+            else:
+                outcome.whatsapp_error = "Patient phone number is required"
+        results[index] = outcome
+    
+    await db.commit()
+    patients_created = len({patient.id for patient, created in patients if created})
+    print(f"✅ Bulk created {len(documents)} of {len(results)} documents ({patients_created} new patients)")
+    
+    return BulkDocumentCreateResponse(
+        created=len(documents),
+        failed=len(results) - len(documents),
+        patients_created=patients_created,
+        whatsapp_queued=sum(1 for outcome in results if outcome.whatsapp_message_id),
+        results=results
+    )
+
+
 @router.get("/by-token/{token}", response_model=DocumentDetailResponse)
 async def get_document_by_token(
     token: str,
@@ -367,6 +501,12 @@ async def get_document_by_token(
             detail="Invalid token format"
         )
     
+    # Reloads are served from the patient view cache until the document changes
+    generation = document_cache.generation()
+    cached = document_cache.get(token_uuid)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+
     # Find document by secure_token and eagerly load patient relationship
     result = await db.execute(
         select(Document)
@@ -381,10 +521,13 @@ async def get_document_by_token(
             detail="Document not found"
         )
     
-    # Check if link has expired
+    # Check if link has expired (usually the sweep in worker.py has set EXPIRED already)
     if document.link_expiry and document.link_expiry < datetime.utcnow():
-        document.status = DocumentStatusEnum.EXPIRED
-        await db.commit()
+        if document.status in EXPIRABLE_STATUSES:  # A signed document keeps its status
+            document.status = DocumentStatusEnum.EXPIRED
+            audit.record(db, document.id, "LINK_EXPIRED", details=f"Patient link expired at {document.link_expiry.isoformat()} UTC")
+            await document_cache.invalidate(db, document.id)
+            await db.commit()
         raise HTTPException(
             status_code=status.HTTP_410_GONE,
             detail="This link has expired"
@@ -397,26 +540,15 @@ async def get_document_by_token(
         document.status = DocumentStatusEnum.VIEWED
         
         # Add audit event
-        audit_event = {
-            "timestamp": datetime.utcnow().isoformat(),
-            "action": "LINK_ACCESSED",
-            "actor": document.patient.full_name,
-            "details": f"IP: {request.client.host}"
-        }
-        
-        if document.audit_trail:
-            document.audit_trail = [*document.audit_trail, audit_event]
-        else:
-            document.audit_trail = [audit_event]
+        audit.record(db, document.id, "LINK_ACCESSED", document.patient.full_name, f"IP: {request.client.host}")
         
         await db.commit()
         await db.refresh(document)
     
-    # Load patient relationship using selectinload or joinedload in query instead
-    # The patient relationship should be eagerly loaded in the initial query
-    # For now, access it directly (SQLAlchemy will lazy load if needed)
-    
-    return document
+    document.audit_trail = await audit.audit_trail(db, document.id)
+    view = DocumentDetailResponse.model_validate(document).model_dump_json()
+    document_cache.put(token_uuid, document.id, document.link_expiry, view, generation)
+    return Response(content=view, media_type="application/json")
 
 
 @router.patch("/{document_id}/fields")
@@ -465,18 +597,14 @@ async def update_document_fields(
         document.certificate_issued_at = None
         document.status = DocumentStatusEnum.SENT
         
-        invalidation_event = {
-            "timestamp": datetime.utcnow().isoformat(),
-            "action": "SIGNATURE_INVALIDATED",
-            "actor": current_user.name if current_user else "SYSTEM",
-            "details": f"Document fields modified after signing. Signature stripped and document requires re-signing. IST: {ist_now}"
-        }
-        if document.audit_trail:
-            document.audit_trail = [*document.audit_trail, invalidation_event]
-        else:
-            document.audit_trail = [invalidation_event]
+        audit.record(
+            db, document.id, "SIGNATURE_INVALIDATED",
+            current_user.name if current_user else "SYSTEM",
+            f"Document fields modified after signing. Signature stripped and document requires re-signing. IST: {ist_now}"
+        )
     
     document.updated_at = datetime.utcnow()
+    await document_cache.invalidate(db, document.id)
     await db.commit()
     
     return {
@@ -497,6 +625,9 @@ async def submit_signature(
 ):
     """
     Submit patient signature for a document.
+    Only the signature is persisted here; the signed PDF is rendered by a
+    background job (see `jobs` in the response) and the WhatsApp confirmation
+    is sent through the outbox.
     """
     
     try:
@@ -507,8 +638,9 @@ async def submit_signature(
             detail="Invalid document ID"
         )
     
+    # Row lock: a double submit waits here and then sees SIGNED instead of enqueueing twice
     result = await db.execute(
-        select(Document).where(Document.id == doc_uuid)
+        select(Document).where(Document.id == doc_uuid).with_for_update()
     )
     document = result.scalar_one_or_none()
     
@@ -556,117 +688,38 @@ async def submit_signature(
     document.certificate_issued_at = document.signed_date
     
     # Add certificate generation to audit trail
-    cert_audit = {
-        "timestamp": cert_timestamp,
-        "action": "CERTIFICATE_GENERATED",
-        "actor": "SYSTEM",
-        "details": f"SHA-256 certificate issued: {document.certificate_hash[:16]}..."
-    }
-    if document.audit_trail:
-        document.audit_trail = [*document.audit_trail, cert_audit]
-    else:
-        document.audit_trail = [cert_audit]
+    audit.record(
+        db, document.id, "CERTIFICATE_GENERATED",
+        details=f"SHA-256 certificate issued: {document.certificate_hash[:16]}...",
+        ts=document.signed_date
+    )
     
     # Add audit events
     if signature_data.audit_events:
-        if document.audit_trail:
-            document.audit_trail = [*document.audit_trail, *signature_data.audit_events]
-        else:
-            document.audit_trail = signature_data.audit_events
+        audit.record_client_events(db, document.id, signature_data.audit_events)
     
-    # Load patient relationship before PDF generation to avoid lazy loading issues
+    # Rendering and the WhatsApp confirmation run in worker.py; both commit with the signature
     await db.refresh(document, ["patient", "hospital"])
-    
-    # Generate signed PDF (synchronous operation)
-    try:
-        signed_pdf_path = pdf_generator_service.generate_signed_pdf(
-            document_id=str(document.id),
-            signature_base64=document.signature,
-            patient_name=document.patient.full_name if document.patient else "Unknown",
-            procedure_name=document.procedure_name,
-            signed_date=document.signed_date,
-            certificate_hash=document.certificate_hash,
-            original_pdf_path=document.file_path,  # Use stored file path
-            signature_fields=document.fields,  # Pass signature field positions
-            ip_address=document.ip_address,
-            phone_number=document.patient.phone if document.patient else None
-        )
-        
-        # Update document with signed PDF path
-        document.file_url = f"/api/documents/{document.id}/download"
-        
-        pdf_audit = {
-            "timestamp": datetime.utcnow().isoformat(),
-            "action": "SIGNED_PDF_GENERATED",
-            "actor": "SYSTEM",
-            "details": f"Signed PDF generated: {signed_pdf_path}"
-        }
-        if document.audit_trail:
-            document.audit_trail = [*document.audit_trail, pdf_audit]
-        else:
-            document.audit_trail = [pdf_audit]
-    except Exception as e:
-        print(f"❌ Error generating signed PDF: {e}")
+    render_job = enqueue(db, RENDER_SIGNED_PDF, document_id=document.id)
+    queue_completion_message(db, document, after_job=render_job)
+    await document_cache.invalidate(db, document.id)
     
     await db.commit()
-    await db.refresh(document, ["patient"])
-    
-    # Auto-send signed copy + certificate to patient via wizechat
-    if document.status == DocumentStatusEnum.SIGNED and document.patient and document.patient.phone:
-        try:
-            # Get hospital wizechat config
-            if document.hospital and document.hospital.wizechat_config:
-                config = document.hospital.wizechat_config
-                inbox_id = config.get("inbox_id")
-                api_key = config.get("api_key")
-                
-                if inbox_id:
-                    # Generate document link
-                    frontend_url = settings.FRONTEND_URL
-                    document_link = f"{frontend_url}/document/{document.secure_token}"
-                    
-                    # Format signed date (ISO format for API)
-                    signed_at_iso = document.signed_date.isoformat() if document.signed_date else datetime.utcnow().isoformat()
-                    
-                    # Send completion notification via wizechat e-signature API
-                    await wizechat_service.send_completion(
-                        inbox_id=inbox_id,
-                        to_phone=document.patient.phone,
-                        document_name=document.procedure_name or "Medical Consent Form",
-                        signed_document_url=document_link,
-                        signer_name=document.patient.full_name,
-                        signed_at=signed_at_iso,
-                        send_document=False,  # Link only, not PDF attachment
-                        api_key=api_key
-                    )
-                    
-                    # Add audit event for signed copy delivery
-                    wizechat_audit = {
-                        "timestamp": datetime.utcnow().isoformat(),
-                        "action": "SIGNED_COPY_SENT",
-                        "actor": "SYSTEM",
-                        "details": f"Signed document notification sent to {document.patient.phone} via WizeChat (Certificate: {document.certificate_hash[:16]}...)"
-                    }
-                    if document.audit_trail:
-                        document.audit_trail = [*document.audit_trail, wizechat_audit]
-                    else:
-                        document.audit_trail = [wizechat_audit]
-                    
-                    await db.commit()
-        except Exception as e:
-            # Log error but don't fail the signature submission
-            print(f"Error sending signed copy via wizechat: {e}")
     
+    document.jobs = [render_job]
+    document.audit_trail = await audit.audit_trail(db, document.id)
     return document
 
 
 @router.get("/{document_id}/download")
 async def download_signed_document(
     document_id: str,
+    request: Request,
     db: AsyncSession = Depends(get_db)
 ):
     """
     Download the signed PDF document.
+    Supports Range requests so pdf.js can render the first page early.
     """
     try:
         doc_uuid = uuid.UUID(document_id)
@@ -693,6 +746,15 @@ async def download_signed_document(
             detail="Document has not been signed yet"
         )
     
+    # While a render is queued or running, a signed PDF on disk is from an
+    # earlier signature (invalidated by a field update) and must not be served
+    if await pending_job(db, document.id, RENDER_SIGNED_PDF):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Signed PDF is still being generated. Please try again in a few seconds.",
+            headers={"Retry-After": str(settings.PDF_RENDER_RETRY_AFTER)}
+        )
+    
     # Get signed PDF path
     pdf_path = pdf_generator_service.get_download_path(str(document.id))
     
@@ -705,21 +767,18 @@ async def download_signed_document(
     # Return file for download
     await db.refresh(document, ["patient"])
     filename = f"{document.procedure_name.replace(' ', '_')}_signed_{document.patient.full_name.replace(' ', '_')}.pdf"
-    return FileResponse(
-        path=str(pdf_path),
-        media_type="application/pdf",
-        filename=filename
-    )
+    return ranged_file_response(request, pdf_path, filename)
 
 
 @router.get("/{document_id}/pdf")
 async def download_original_document(
     document_id: str,
+    request: Request,
     db: AsyncSession = Depends(get_db)
 ):
     """
     Download the original unsigned document PDF.
-    This is used for frontend rendering of the PDF via pdf.js
+    This is used for frontend rendering of the PDF via pdf.js (Range requests supported)
     """
     try:
         doc_uuid = uuid.UUID(document_id)
@@ -748,10 +807,73 @@ async def download_original_document(
         )
         
     filename = f"{document.procedure_name.replace(' ', '_')}_original.pdf"
+    return ranged_file_response(request, file_path, filename)
+
+
+@router.get("/{document_id}/pages/{page_number}")
+async def get_page_preview(
+    document_id: str,
+    page_number: int,
+    w: Optional[int] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Rendered preview image of one page (1-indexed) of the original document.
+    Used by the mobile patient view instead of pdf.js; `w` is snapped to the
+    nearest pre-rendered width.
+    """
+    try:
+        doc_uuid = uuid.UUID(document_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid document ID format"
+        )
+    
+    result = await db.execute(
+        select(Document).where(Document.id == doc_uuid)
+    )
+    document = result.scalar_one_or_none()
+    
+    if not document or not document.file_path or not Path(document.file_path).exists():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Original document PDF not found"
+        )
+    
+    if not previews_available():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Page previews are not available"
+        )
+    
+    width = snap_width(w)
+    digest = await run_in_threadpool(file_digest, document.file_path)
+    target = preview_path(digest, page_number, width)
+    
+    if not target.exists():
+        # Not pre-rendered (yet): render just this page
+        try:
+            rendered = await pdf_render_engine.submit(
+                render_page_preview, document.file_path, page_number, width
+            )
+        except RenderQueueFullError as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Preview rendering is busy, please retry shortly",
+                headers={"Retry-After": str(e.retry_after)}
+            )
+        if not rendered:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Page not found"
+            )
+    
+    # Previews are keyed by file content and never change for a document
     return FileResponse(
-        path=str(file_path),
-        media_type="application/pdf",
-        filename=filename
+        path=str(target),
+        media_type=MEDIA_TYPES[settings.PREVIEW_FORMAT],
+        headers={"Cache-Control": "private, max-age=31536000, immutable"}
     )
 
 
@@ -797,6 +919,19 @@ async def send_otp(
     print(f"📝 OTP Generation: document_id={document_id}, patient_phone={document.patient.phone}")
     print(f"📝 APP_ENV={settings.APP_ENV}")
     
+    config = document.hospital.wizechat_config if document.hospital else None
+    if not config:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="WizeChat not configured for this hospital"
+        )
+    inbox_id = config.get("inbox_id")
+    if not inbox_id:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="WizeChat inbox_id not configured"
+        )
+    
     # Hash OTP for storage (using SHA-256)
     otp_hash = hashlib.sha256(otp_code.encode()).hexdigest()
     
@@ -806,60 +941,24 @@ async def send_otp(
     document.otp_attempts = 0
     document.otp_verified_at = None
     
+    if settings.APP_ENV == "development":
+        print(f"\n🔐 DEV MODE - OTP for {document.patient.phone}: {otp_code}")
+        print(f"   Document: {document.procedure_name}")
+        print(f"   Patient: {document.patient.full_name}")
+    
+    # Delivered by the outbox dispatcher; an OTP that could not go out within its validity is dropped
+    expires_in_minutes = 10
+    add_message(db, "send_otp", document, {
+        "inbox_id": inbox_id,
+        "to_phone": document.patient.phone,
+        "otp_code": otp_code,
+        "document_name": document.procedure_name or "Medical Consent Form",
+        "expires_in_minutes": expires_in_minutes,
+    }, expires_at=document.otp_sent_at + timedelta(minutes=expires_in_minutes))
+    
     await db.commit()
     
-    # Send OTP via wizechat
-    try:
-        print(f"🔍 Checking hospital wizechat_config...")
-        print(f"🔍 Hospital exists: {document.hospital is not None}")
-        print(f"🔍 Hospital wizechat_config: {document.hospital.wizechat_config if document.hospital else 'N/A'}")
-        
-        if document.hospital and document.hospital.wizechat_config:
-            config = document.hospital.wizechat_config
-            inbox_id = config.get("inbox_id")
-            api_key = config.get("api_key")
-            
-            print(f"🔍 Config found - inbox_id: {inbox_id}, api_key: {api_key[:10] if api_key else None}...")
-            print(f"🔍 Settings.APP_ENV = '{settings.APP_ENV}'")
-            print(f"🔍 Dev mode check: {settings.APP_ENV == 'development'}")
-            
-            if inbox_id:
-                if settings.APP_ENV == "development":
-                    print(f"\n🔐 DEV MODE - OTP for {document.patient.phone}: {otp_code}")
-                    print(f"   Document: {document.procedure_name}")
-                    print(f"   Patient: {document.patient.full_name}")
-                
-                # In production, send via WizeChat
-                await wizechat_service.send_otp(
-                    inbox_id=inbox_id,
-                    to_phone=document.patient.phone,
-                    otp_code=otp_code,
-                    document_name=document.procedure_name or "Medical Consent Form",
-                    expires_in_minutes=10,
-                    api_key=api_key
-                )
-                
-                response = {"success": True, "message": "OTP sent successfully"}
-                
-                return response
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="WizeChat inbox_id not configured"
-                )
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="WizeChat not configured for this hospital"
-            )
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"❌ OTP Error: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to send OTP: {str(e)}"
-        )
+    return {"success": True, "message": "OTP sent successfully"}
 
 
 @router.post("/{document_id}/verify-otp")
@@ -961,27 +1060,63 @@ async def get_document_by_id(
     await db.refresh(document, ["patient"])
     
     document.patient_link = f"{settings.FRONTEND_URL}/patient/view?token={document.secure_token}"
+    document.jobs = (await jobs_for_documents(db, [document.id]))[document.id]
+    document.audit_trail = await audit.audit_trail(db, document.id)
     return document
 
 
-@router.get("/", response_model=List[DocumentDetailResponse])
+# Columns view=summary loads; the rest (signature, fields, ...) stay in the database
+SUMMARY_COLUMNS = (
+    Document.id, Document.transaction_id, Document.procedure_name, Document.doctor_name, Document.clinic_name,
+    Document.status, Document.patient_id, Document.secure_token, Document.link_expiry, Document.created_at,
+    Document.signed_date, Document.link_accessed_at,
+)
+SUMMARY_PATIENT_COLUMNS = (Patient.id, Patient.external_id, Patient.full_name, Patient.email, Patient.phone)
+summary_list = TypeAdapter(List[DocumentSummaryResponse])
+
+
+@router.get(
+    "/", response_model=List[DocumentDetailResponse],
+    responses={200: {"description": "List of DocumentSummaryResponse with view=summary"}}
+)
 async def list_documents(
+    response: Response,
     skip: int = 0,
     limit: int = 50,
+    cursor: str = None,
+    view: str = "detail",
     status_filter: str = None,
     patient_id: str = None,
     search: str = None,
+    sort: str = None,
     current_user: User = Depends(get_current_user_from_token),
     db: AsyncSession = Depends(get_db)
 ):
     """
     List all documents for the doctor's hospital (for doctor dashboard).
     Includes optional filters for status, patient_id, and general keyword search.
+    Newest first; pass the X-Next-Cursor header of a page as ?cursor= for the next one.
+    Search results are ranked by relevance (sort=relevance, paged with ?skip=)
+    unless sort=newest is given.
+    view=summary returns DocumentSummaryResponse rows, without signatures, fields and jobs.
     """
-    
-    query = select(Document).options(selectinload(Document.patient)).where(
-        Document.hospital_id == current_user.hospital_id
-    )
+    if view not in ("detail", "summary"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="view must be 'detail' or 'summary'")
+    search = (search or "").strip()
+    sort = sort or ("relevance" if search else "newest")
+    if sort not in ("newest", "relevance") or (sort == "relevance" and not search):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="sort must be 'newest', or 'relevance' with a search")
+    if sort == "relevance" and cursor:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="cursor pagination needs sort=newest")
+
+    if view == "summary":
+        query = select(Document).options(
+            load_only(*SUMMARY_COLUMNS),
+            selectinload(Document.patient).load_only(*SUMMARY_PATIENT_COLUMNS)
+        )
+    else:
+        query = select(Document).options(selectinload(Document.patient))
+    query = query.where(Document.hospital_id == current_user.hospital_id)
     
     # 1. Status Filter
     if status_filter:
@@ -991,13 +1126,12 @@ async def list_documents(
         except KeyError:
             pass  # Invalid status filter, ignore
             
+    # Join Patient to filter by its columns (patient_id) or rank by them (search)
+    if patient_id or search:
+        query = query.join(Document.patient)
+
     # 2. Patient ID Filter (Support both internal UUID and WizeFlow external_id)
     if patient_id:
-        # Join Patient to allow filtering by its columns
-        # Check if it was already joined to avoid duplicate joins
-        if not search: 
-            query = query.join(Document.patient)
-            
         uuid_condition = None
         try:
             patient_uuid = uuid.UUID(patient_id)
@@ -1012,24 +1146,34 @@ async def list_documents(
             # Only match external_id
             query = query.where(Patient.external_id == patient_id)
             
-    # 3. Text Search (Procedure Name, Doctor Name, or Patient Name)
-    if search:
-        search_term = f"%{search}%"
-        # Join Patient to search their fields as well
-        query = query.join(Document.patient).where(
-            (Document.procedure_name.ilike(search_term)) |
-            (Document.doctor_name.ilike(search_term)) |
-            (Patient.full_name.ilike(search_term)) |
-            (Patient.email.ilike(search_term))
-        ).distinct()
-    
-    query = query.offset(skip).limit(limit).order_by(Document.created_at.desc())
-    
-    result = await db.execute(query)
-    documents = result.scalars().all()
-    
+    # 3. Text Search (Procedure Name, Doctor Name, Patient Name or Email), see app/services/search.py
+    async with search_time_limit(db) if search else nullcontext():
+        if search:
+            condition, rank = await document_search(db, current_user.hospital_id, search)
+            query = query.where(condition)
+
+        if sort == "relevance":
+            query = query.order_by(rank.desc(), Document.created_at.desc(), Document.id.desc())
+            result = await db.execute(query.offset(skip).limit(limit))
+            documents = result.scalars().all()
+        else:
+            result = await db.execute(paginate(query, Document, cursor, skip, limit))
+            documents = next_page(result.scalars().all(), limit, response)
+
     for doc in documents:
         doc.patient_link = f"{settings.FRONTEND_URL}/patient/view?token={doc.secure_token}"
+
+    if view == "summary":
+        # Serialized straight to JSON, skipping the response_model round trip through dicts
+        return Response(
+            content=summary_list.dump_json(summary_list.validate_python(documents, from_attributes=True)),
+            media_type="application/json",
+            headers=response.headers
+        )
+
+    jobs = await jobs_for_documents(db, [doc.id for doc in documents])
+    for doc in documents:
+        doc.jobs = jobs[doc.id]
     
     return documents
 
@@ -1052,7 +1196,7 @@ async def send_document_via_whatsapp(
         "send_via_whatsapp": true
     }
     
-    This will call WizeChat API to send the WhatsApp message.
+    The message is queued in the outbox and sent to WizeChat by worker.py.
     """
     
     try:
@@ -1118,66 +1262,26 @@ async def send_document_via_whatsapp(
             detail="Patient phone number is required"
         )
 
-    try:
-        # Calculate link expiry hours
-        expiry_hours = 168  # Default 7 days
-        if document.link_expiry:
-            time_until_expiry = document.link_expiry - datetime.utcnow()
-            expiry_hours = int(time_until_expiry.total_seconds() / 3600)
-        
-        # Call WizeChat e-signature API to send signature request
-        wizechat_response = await wizechat_service.send_signature_request(
-            inbox_id=inbox_id,
-            to_phone=send_request.phone_number,
-            document_name=document.procedure_name or "Medical Consent Form",
-            signature_link=patient_link,
-            recipient_name=document.patient.full_name,
-            expires_in_hours=expiry_hours,
-            api_key=api_key
-        )
-        
-        # Add audit trail
-        audit_event = {
-            "timestamp": datetime.utcnow().isoformat(),
-            "action": "WHATSAPP_SENT",
-            "actor": "System",
-            "details": f"WhatsApp sent to {send_request.phone_number} via inbox {inbox_id}"
-        }
-        
-        if document.audit_trail:
-            document.audit_trail.append(audit_event)
-        else:
-            document.audit_trail = [audit_event]
-        
-        await db.commit()
-        
-        return WhatsAppResponse(
-            success=True,
-            message="WhatsApp message sent successfully",
-            message_id=wizechat_response.get("whatsapp_message_id") or wizechat_response.get("message_id") or ""
-        )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        error_message = str(e)
-        print(f"❌ Error sending WhatsApp: {error_message}")
-        
-        # Parse specific error types
-        if "api key" in error_message.lower() or "authentication" in error_message.lower():
-            error_detail = "Invalid WizeChat API Key. Please check your settings."
-        elif "inbox" in error_message.lower():
-            error_detail = "Invalid WizeChat Inbox ID. Please check your settings."
-        elif "phone" in error_message.lower():
-            error_detail = "Invalid phone number format. Please use international format (e.g., +1234567890)."
-        elif "timeout" in error_message.lower():
-            error_detail = "Connection timeout. Please check your WizeChat service."
-        else:
-            error_detail = f"Failed to send WhatsApp message: {error_message}"
-        
-        return WhatsAppResponse(
-            success=False,
-            message=error_detail,
-            error=error_message
-        )
-
+    # Calculate link expiry hours
+    expiry_hours = 168  # Default 7 days
+    if document.link_expiry:
+        time_until_expiry = document.link_expiry - datetime.utcnow()
+        expiry_hours = int(time_until_expiry.total_seconds() / 3600)
+    
+    # Sent by the outbox dispatcher; delivery (or failure) is recorded in the audit trail
+    message = add_message(db, "send_signature_request", document, {
+        "inbox_id": inbox_id,
+        "to_phone": send_request.phone_number,
+        "document_name": document.procedure_name or "Medical Consent Form",
+        "signature_link": patient_link,
+        "recipient_name": document.patient.full_name,
+        "expires_in_hours": expiry_hours,
+    }, expires_at=document.link_expiry)
+    
+    await db.commit()
+    
+    return WhatsAppResponse(
+        success=True,
+        message="WhatsApp message queued for delivery",
+        message_id=str(message.id)
+    )
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from typing import List
@@ -8,6 +8,7 @@ from app.database import get_db
 from app.models import User, Hospital, Document, Patient, RoleEnum
 from app.schemas import SuperAdminStatsResponse, UserResponse, HospitalResponse
 from app.routers.auth import get_current_user_from_token
+from app.services.pagination import paginate, next_page
 
 router = APIRouter(prefix="/api/superadmin", tags=["superadmin"])
 
@@ -59,23 +60,27 @@ async def get_dashboard_stats(
 
 @router.get("/hospitals", response_model=List[HospitalResponse])
 async def list_hospitals(
+    response: Response,
     skip: int = 0,
     limit: int = 50,
+    cursor: str = None,
     db: AsyncSession = Depends(get_db),
     admin: User = Depends(get_current_superadmin)
 ):
-    """List all tenant hospitals."""
-    result = await db.execute(select(Hospital).offset(skip).limit(limit).order_by(Hospital.created_at.desc()))
-    return result.scalars().all()
+    """List all tenant hospitals (newest first, X-Next-Cursor / ?cursor= for the next page)."""
+    result = await db.execute(paginate(select(Hospital), Hospital, cursor, skip, limit))
+    return next_page(result.scalars().all(), limit, response)
 
 
 @router.get("/users", response_model=List[UserResponse])
 async def list_all_users(
+    response: Response,
     skip: int = 0,
     limit: int = 50,
+    cursor: str = None,
     db: AsyncSession = Depends(get_db),
     admin: User = Depends(get_current_superadmin)
 ):
-    """List all users across the platform."""
-    result = await db.execute(select(User).offset(skip).limit(limit).order_by(User.created_at.desc()))
-    return result.scalars().all()
+    """List all users across the platform (newest first, X-Next-Cursor / ?cursor= for the next page)."""
+    result = await db.execute(paginate(select(User), User, cursor, skip, limit))
+    return next_page(result.scalars().all(), limit, response)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Header
+from fastapi import APIRouter, Depends, HTTPException, status, Header, BackgroundTasks, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from typing import List
@@ -10,6 +10,9 @@ from app.models import Template, User, RoleEnum
 from app.schemas import TemplateCreate, TemplateResponse, TemplateUpdate
 from app.config import settings
 from app.routers.auth import get_current_user_from_token
+from app.services.pdf_generator import pdf_render_engine
+from app.services.storage import read_upload_request, pdf_from_uploads, upload_openapi, content_store
+from app.services.pagination import paginate, next_page
 
 router = APIRouter(prefix="/api/templates", tags=["templates"])
 
@@ -25,13 +28,19 @@ from pathlib import Path
 UPLOAD_DIR = Path("/app/uploads")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
-@router.post("/", response_model=TemplateResponse, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/", response_model=TemplateResponse, status_code=status.HTTP_201_CREATED,
+    openapi_extra=upload_openapi(TemplateCreate)
+)
 async def create_template(
-    template_data: TemplateCreate,
+    request: Request,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user_from_token),
     db: AsyncSession = Depends(get_db)
 ):
-    """Create a new template"""
+    """Create a new template (JSON with base64 file_content, or multipart: `metadata` JSON + `file` parts)"""
+    template_data, uploads = await read_upload_request(request, TemplateCreate)
+    await content_store.check_client_path(db, current_user.hospital_id, template_data.file_path)
     
     file_path = template_data.file_path
     
@@ -42,8 +51,15 @@ async def create_template(
     if template_data.file_content:
         print(f"File content length: {len(template_data.file_content)}")
     
+    if uploads:
+        stored = await pdf_from_uploads(uploads)
+        file_path = await content_store.add(db, stored, current_user.hospital_id)
+        print(f"Streamed upload to: {file_path} ({stored.size} bytes)")
+        # Page previews are shared with documents created from this file
+        background_tasks.add_task(pdf_render_engine.render_previews, file_path)
+    
     # Process base64 file content if present
-    if template_data.file_content and not file_path:
+    elif template_data.file_content and not file_path:
         if len(template_data.file_content) > 14 * 1024 * 1024:
             raise HTTPException(status_code=413, detail="File too large. Maximum size is 10MB.")
             
@@ -59,19 +75,17 @@ async def create_template(
             file_bytes = base64.b64decode(file_content)
             print(f"Decoded {len(file_bytes)} bytes.")
             
-            file_id = uuid.uuid4()
-            filename = f"{file_id}.pdf"
-            local_file_path = UPLOAD_DIR / filename
-            
-            print(f"Writing to {local_file_path}...")
-            with open(local_file_path, 'wb') as f:
-                f.write(file_bytes)
-            
-            file_path = str(local_file_path)
+            file_path = await content_store.add_bytes(db, file_bytes, current_user.hospital_id)
             print(f"Successfully saved file to: {file_path}")
+            # Page previews are shared with documents created from this file
+            background_tasks.add_task(pdf_render_engine.render_previews, file_path)
         except Exception as e:
             print(f"ERROR saving template file content: {e}")
             file_path = None
+    
+    elif file_path:
+        # Shared with the upload it came from
+        await content_store.acquire(db, file_path)
             
     print(f"Final template file_path: {file_path}")
     
@@ -104,25 +118,23 @@ async def create_template(
 
 @router.get("/", response_model=List[TemplateResponse])
 async def list_templates(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: str = None,
     category: str = None,
     current_user: User = Depends(get_current_user_from_token),
     db: AsyncSession = Depends(get_db)
 ):
-    """List all templates"""
+    """List all templates (newest first, X-Next-Cursor / ?cursor= for the next page)"""
     
     query = select(Template).where(Template.hospital_id == current_user.hospital_id)
     
     if category:
         query = query.where(Template.category == category)
     
-    query = query.offset(skip).limit(limit).order_by(Template.created_at.desc())
-    
-    result = await db.execute(query)
-    templates = result.scalars().all()
-    
-    return templates
+    result = await db.execute(paginate(query, Template, cursor, skip, limit))
+    return next_page(result.scalars().all(), limit, response)
 
 
 @router.get("/{template_id}", response_model=TemplateResponse)
@@ -155,14 +167,16 @@ async def get_template(
     return template
 
 
-@router.patch("/{template_id}", response_model=TemplateResponse)
+@router.patch("/{template_id}", response_model=TemplateResponse, openapi_extra=upload_openapi(TemplateUpdate))
 async def update_template(
     template_id: str,
-    template_data: TemplateUpdate,
+    request: Request,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user_from_token),
     db: AsyncSession = Depends(get_db)
 ):
-    """Update a template"""
+    """Update a template (JSON with base64 file_content, or multipart: `metadata` JSON + `file` parts)"""
+    template_data, uploads = await read_upload_request(request, TemplateUpdate)
     
     try:
         temp_uuid = uuid.UUID(template_id)
@@ -182,6 +196,7 @@ async def update_template(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Template not found"
         )
+    await content_store.check_client_path(db, current_user.hospital_id, template_data.file_path, template.file_path)
     
     # Update fields
     if template_data.name is not None:
@@ -199,8 +214,17 @@ async def update_template(
     if template_data.file_content:
         print(f"File content length: {len(template_data.file_content)}")
     
+    if uploads:
+        stored = await pdf_from_uploads(uploads)
+        file_path = await content_store.add(db, stored, current_user.hospital_id)
+        await content_store.release(db, template.file_path)
+        template.file_path = file_path
+        template.file_url = f"/api/templates/{template.id}/download"
+        print(f"Streamed updated file to: {file_path} ({stored.size} bytes)")
+        background_tasks.add_task(pdf_render_engine.render_previews, file_path)
+    
     # Process base64 file content if present
-    if template_data.file_content and not file_path:
+    elif template_data.file_content and not file_path:
         if len(template_data.file_content) > 14 * 1024 * 1024:
             raise HTTPException(status_code=413, detail="File too large. Maximum size is 10MB.")
             
@@ -213,16 +237,11 @@ async def update_template(
             
             file_bytes = base64.b64decode(file_content)
             
-            file_id = uuid.uuid4()
-            filename = f"{file_id}.pdf"
-            local_file_path = UPLOAD_DIR / filename
-            
-            with open(local_file_path, 'wb') as f:
-                f.write(file_bytes)
-            
-            file_path = str(local_file_path)
+            file_path = await content_store.add_bytes(db, file_bytes, current_user.hospital_id)
+            await content_store.release(db, template.file_path)
             template.file_path = file_path
             print(f"Successfully saved updated file to: {file_path}")
+            background_tasks.add_task(pdf_render_engine.render_previews, file_path)
             
             # Avoid overwriting a true backend URL with a transient blob URL during front-end updates
             if file_path:
@@ -232,10 +251,12 @@ async def update_template(
         except Exception as e:
             print(f"ERROR saving template file content during update: {e}")
             
-    elif template_data.file_path is not None:
+    elif template_data.file_path is not None and template_data.file_path != template.file_path:
+        await content_store.acquire(db, template_data.file_path)
+        await content_store.release(db, template.file_path)
         template.file_path = template_data.file_path
         
-    if template_data.file_url is not None and not template_data.file_url.startswith('blob:') and not template_data.file_content:
+    if template_data.file_url is not None and not template_data.file_url.startswith('blob:') and not template_data.file_content and not uploads:
         template.file_url = template_data.file_url
     elif template_data.file_url is not None and template_data.file_url.startswith('blob:') and not template_data.file_content:
         # Ignore blob updates if there's no new file content
@@ -274,6 +295,7 @@ async def delete_template(
             detail="Template not found"
         )
     
+    await content_store.release(db, template.file_path)
     await db.delete(template)
     await db.commit()
     
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, field_validator
-from typing import Optional, List, Any
+from typing import Optional, List, Dict, Any
 from datetime import datetime
 from enum import Enum
 from uuid import UUID
@@ -22,6 +22,13 @@ class DocumentStatusEnum(str, Enum):
     EXPIRED = "EXPIRED"
 
 
+class JobStatusEnum(str, Enum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    DEAD = "DEAD"
+
+
 # ============ Patient Schemas ============
 class PatientBase(BaseModel):
     full_name: str
@@ -83,13 +90,57 @@ class DocumentCreate(BaseModel):
     """From WizeFlow - Create a new document for signing"""
     patient: PatientCreate
     procedure_name: str
-    file_url: str
+    file_url: str = ""  # Not needed when the file comes as a multipart part
     file_path: Optional[str] = None  # Local file path if uploaded
     file_content: Optional[str] = None  # Base64 encoded file content
+    image_urls: Optional[List[str]] = None  # Extra page images (data URLs), appended after an image file_url
     doctor_name: Optional[str] = None
     clinic_name: Optional[str] = None
-    template_id: Optional[UUID] = None
-    fields: Optional[List[SmartField]] = None
+    template_id: Optional[UUID] = None  # Enough on its own: the document reuses the template's stored file and fields
+    fields: Optional[List[SmartField]] = None  # Replaces the template's fields when both are given
+    field_values: Optional[Dict[str, str]] = None  # Field id -> value, e.g. the patient name on a template field
+
+
+class BulkDocumentItem(BaseModel):
+    """One patient of a bulk create; unset document details come from the request"""
+    patient: PatientCreate
+    procedure_name: Optional[str] = None
+    doctor_name: Optional[str] = None
+    clinic_name: Optional[str] = None
+    field_values: Optional[Dict[str, str]] = None  # Field id -> value for this patient's copy
+
+
+class BulkDocumentCreate(BaseModel):
+    """Same consent pack for many patients, e.g. a day's surgical list"""
+    template_id: Optional[UUID] = None  # Documents share the template's file and fields
+    file_path: Optional[str] = None  # Or a file from /upload-file
+    fields: Optional[List[SmartField]] = None  # Replaces the template's fields
+    procedure_name: Optional[str] = None  # Defaults to the template name
+    doctor_name: Optional[str] = None
+    clinic_name: Optional[str] = None
+    items: List[BulkDocumentItem]
+    send_via_whatsapp: bool = False  # Queue the signature request of every created document
+    inbox_id: Optional[str] = None  # Defaults to the hospital's WizeChat inbox
+
+
+class BulkDocumentResult(BaseModel):
+    index: int  # Position in items
+    success: bool
+    document_id: Optional[UUID] = None
+    patient_id: Optional[UUID] = None
+    patient_created: bool = False
+    patient_link: Optional[str] = None
+    whatsapp_message_id: Optional[str] = None
+    whatsapp_error: Optional[str] = None  # Document created, but the WhatsApp send could not be queued
+    error: Optional[str] = None  # Why the document was not created
+
+
+class BulkDocumentCreateResponse(BaseModel):
+    created: int
+    failed: int
+    patients_created: int
+    whatsapp_queued: int
+    results: List[BulkDocumentResult]
 
 
 class DocumentResponse(BaseModel):
@@ -124,6 +175,19 @@ class SignatureSubmit(BaseModel):
     audit_events: Optional[List[dict]] = None
 
 
+class JobStatusResponse(BaseModel):
+    """Background job of a document (signed PDF rendering, WhatsApp confirmation)"""
+    kind: str
+    status: JobStatusEnum
+    attempts: int
+    last_error: Optional[str] = None
+    run_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
 class DocumentDetailResponse(BaseModel):
     id: UUID
     transaction_id: UUID
@@ -137,12 +201,44 @@ class DocumentDetailResponse(BaseModel):
     signed_date: Optional[datetime]
     certificate_hash: Optional[str]
     certificate_issued_at: Optional[datetime]
-    audit_trail: List[dict]
+    audit_trail: Optional[List[dict]] = None  # Single-document responses only, not in lists
     patient: PatientResponse
     secure_token: UUID
     patient_link: Optional[str] = None
     created_at: datetime
     link_accessed_at: Optional[datetime] = None
+    jobs: Optional[List[JobStatusResponse]] = None
+
+    class Config:
+        from_attributes = True
+
+
+class PatientSummaryResponse(BaseModel):
+    id: UUID
+    external_id: Optional[str] = None
+    full_name: str
+    email: Optional[str] = None
+    phone: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class DocumentSummaryResponse(BaseModel):
+    """List row for dashboards (GET /api/documents/?view=summary): no signature, fields, jobs or audit trail"""
+    id: UUID
+    transaction_id: UUID
+    procedure_name: str
+    doctor_name: Optional[str]
+    clinic_name: Optional[str]
+    status: DocumentStatusEnum
+    patient: PatientSummaryResponse
+    secure_token: UUID
+    patient_link: Optional[str] = None
+    link_expiry: Optional[datetime] = None
+    created_at: datetime
+    signed_date: Optional[datetime] = None
+    link_accessed_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -151,7 +247,7 @@ class DocumentDetailResponse(BaseModel):
 # ============ Template Schemas ============
 class TemplateCreate(BaseModel):
     name: str
-    file_url: str
+    file_url: str = ""  # Not needed when the file comes as a multipart part
     file_path: Optional[str] = None
     file_content: Optional[str] = None
     category: Optional[str] = None
@@ -0,0 +1,88 @@
+"""
+Document audit trail, stored as one row per event in document_audit_events.
+
+Appending is a single INSERT; the document row is not touched, so an event no
+longer rewrites the whole trail (and the document) and concurrent writers
+can't overwrite each other's events. The trail is only read for responses
+that show it.
+"""
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import DocumentAuditEvent
+
+EVENT_KEYS = ("timestamp", "action", "actor", "details")
+
+
+def record(
+    db: AsyncSession,
+    document_id: uuid.UUID,
+    action: str,
+    actor: Optional[str] = "SYSTEM",
+    details: Optional[str] = None,
+    ts: Optional[datetime] = None
+) -> DocumentAuditEvent:
+    """Add an audit event to the session; it is written when the caller commits"""
+    event = DocumentAuditEvent(
+        document_id=document_id,
+        ts=ts or datetime.utcnow(),
+        action=action,
+        actor=actor,
+        details=details,
+    )
+    db.add(event)
+    return event
+
+
+def _parse_timestamp(value) -> datetime:
+    """ISO timestamp of a client-submitted event as naive UTC; now if missing or invalid"""
+    try:
+        ts = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return datetime.utcnow()
+    if ts.tzinfo:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def record_client_events(db: AsyncSession, document_id: uuid.UUID, events: List[dict]):
+    """Events submitted with the signature (consents, identity checks) in the old trail format"""
+    for event in events:
+        if not isinstance(event, dict):
+            continue
+        extra = {key: value for key, value in event.items() if key not in EVENT_KEYS}
+        db.add(DocumentAuditEvent(
+            document_id=document_id,
+            ts=_parse_timestamp(event.get("timestamp")),
+            action=str(event.get("action") or "UNKNOWN"),
+            actor=event.get("actor"),
+            details=event.get("details"),
+            extra=extra or None,
+        ))
+
+
+def as_dict(event: DocumentAuditEvent) -> dict:
+    """Trail entry in the format of the former documents.audit_trail JSON"""
+    entry = {
+        "timestamp": event.ts.isoformat(),
+        "action": event.action,
+        "actor": event.actor,
+        "details": event.details,
+    }
+    if event.extra:
+        entry.update(event.extra)
+    return entry
+
+
+async def audit_trail(db: AsyncSession, document_id: uuid.UUID) -> List[dict]:
+    """Audit trail of a document, oldest first"""
+    result = await db.execute(
+        select(DocumentAuditEvent)
+        .where(DocumentAuditEvent.document_id == document_id)
+        .order_by(DocumentAuditEvent.ts, DocumentAuditEvent.id)
+    )
+    return [as_dict(event) for event in result.scalars()]
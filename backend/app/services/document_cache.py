@@ -0,0 +1,192 @@
+"""
+Short-lived in-process cache of the patient view (GET /api/documents/by-token/{token}).
+
+Patients reload the link a lot. Each API process keeps the rendered JSON of
+recently viewed documents for DOCUMENT_CACHE_TTL seconds, so reloads skip the
+document, patient and audit trail queries.
+
+Changes have to reach the caches of every API process:
+- Code that changes what the view shows (signing, field updates, expiry, the
+  signed PDF job, WizeChat deliveries, the link expiry sweep) calls
+  document_cache.invalidate(db, id) or invalidate_many(db, ids).
+  That drops the local entry and sends NOTIFY document_cache with the document
+  id, in the caller's transaction.
+- Postgres delivers the notification on commit to every process that listens.
+  The listener is started in the API lifespan and drops the entry there too.
+- An entry is only stored when no invalidation arrived while it was being
+  read, so a view read before a concurrent change can't outlive the change's
+  notification.
+- Without a working listener, the cache is bypassed.
+
+The TTL bounds what isn't invalidated explicitly (e.g. patient renames).
+"""
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional
+
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.services.metrics import metrics
+
+CHANNEL = "document_cache"
+RECONNECT_SECONDS = 5
+NOTIFY_BATCH = 200  # Document ids per notification (payloads are limited to 8000 bytes)
+
+lookups_total = metrics.counter(
+    "wizesign_document_cache_lookups_total", "Patient view cache lookups, by outcome (hit, miss, bypass)"
+)
+invalidations_total = metrics.counter(
+    "wizesign_document_cache_invalidations_total", "Patient view cache invalidations, by source (local, notify)"
+)
+entries_gauge = metrics.gauge("wizesign_document_cache_entries", "Patient views cached in this process")
+
+
+class CachedView:
+    __slots__ = ("document_id", "link_expiry", "body", "stored_at")
+
+    def __init__(self, document_id: uuid.UUID, link_expiry: Optional[datetime], body: str):
+        self.document_id = document_id
+        self.link_expiry = link_expiry
+        self.body = body
+        self.stored_at = time.monotonic()
+
+
+class DocumentCache:
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._views: "OrderedDict[uuid.UUID, CachedView]" = OrderedDict()  # secure_token -> view, LRU order
+        self._tokens = {}  # document id -> secure_token
+        self._invalidations = 0  # Bumped on every invalidation, see put()
+        self._listening = False
+        self._listener_task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._views)
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self._listening
+
+    def generation(self) -> int:
+        """Take before reading a document; pass to put()"""
+        return self._invalidations
+
+    def get(self, token: uuid.UUID) -> Optional[str]:
+        """The cached JSON of the view, unless it is too old or its link has expired"""
+        if not self.enabled:
+            lookups_total.inc(outcome="bypass")
+            return None
+        view = self._views.get(token)
+        if view is None or time.monotonic() - view.stored_at > self.ttl or (
+            view.link_expiry and view.link_expiry < datetime.utcnow()
+        ):
+            # Expired links go to the database, which marks the document EXPIRED
+            lookups_total.inc(outcome="miss")
+            return None
+        self._views.move_to_end(token)
+        lookups_total.inc(outcome="hit")
+        return view.body
+
+    def put(self, token: uuid.UUID, document_id: uuid.UUID, link_expiry: Optional[datetime], body: str, generation: int):
+        if not self.enabled or generation != self._invalidations:
+            return  # Something changed while the view was read; it may be stale already
+        self._discard(document_id)
+        self._views[token] = CachedView(document_id, link_expiry, body)
+        self._tokens[document_id] = token
+        while len(self._views) > self.max_entries:
+            _, oldest = self._views.popitem(last=False)
+            self._tokens.pop(oldest.document_id, None)
+
+    def _discard(self, document_id: uuid.UUID):
+        token = self._tokens.pop(document_id, None)
+        if token is not None:
+            self._views.pop(token, None)
+
+    def discard(self, document_id: uuid.UUID, source: str = "local"):
+        self._invalidations += 1
+        self._discard(document_id)
+        invalidations_total.inc(source=source)
+
+    def clear(self):
+        self._invalidations += 1
+        self._views.clear()
+        self._tokens.clear()
+
+    async def invalidate(self, db: AsyncSession, document_id: uuid.UUID):
+        """The view of document_id changes in db's transaction; every process drops it on commit"""
+        self.discard(document_id)
+        await db.execute(text("SELECT pg_notify(:channel, :document_id)"), {"channel": CHANNEL, "document_id": str(document_id)})
+
+    async def invalidate_many(self, db: AsyncSession, document_ids: List[uuid.UUID]):
+        """invalidate() for a batch: comma-separated ids, as few notifications as the payload limit allows"""
+        for document_id in document_ids:
+            self.discard(document_id)
+        ids = [str(document_id) for document_id in document_ids]
+        payloads = [",".join(ids[i:i + NOTIFY_BATCH]) for i in range(0, len(ids), NOTIFY_BATCH)]
+        if payloads:
+            await db.execute(
+                text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"),
+                {"channel": CHANNEL, "payloads": payloads}
+            )
+
+    def _on_notification(self, connection, pid, channel, payload):
+        for document_id in payload.split(","):
+            try:
+                self.discard(uuid.UUID(document_id), source="notify")
+            except ValueError:
+                print(f"⚠️ Ignoring {CHANNEL} notification {document_id!r}")
+
+    async def _listen(self):
+        dsn = make_url(settings.DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(dsn)
+                lost = asyncio.Event()
+                connection.add_termination_listener(lambda _: lost.set())
+                await connection.add_listener(CHANNEL, self._on_notification)
+                self.clear()  # Notifications may have been missed while not listening
+                self._listening = True
+                print(f"✅ Document cache listening on {CHANNEL}")
+                await lost.wait()
+                print("⚠️ Document cache listener connection lost, bypassing the cache")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Document cache listener failed ({e}), bypassing the cache")
+            finally:
+                self._listening = False
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(RECONNECT_SECONDS)
+
+    def start(self):
+        """Listen for invalidations from other processes (API lifespan)"""
+        if self.ttl > 0 and self._listener_task is None:
+            self._listener_task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+        self.clear()
+
+
+document_cache = DocumentCache(settings.DOCUMENT_CACHE_TTL, settings.DOCUMENT_CACHE_MAX_ENTRIES)
+
+
+@metrics.collector
+async def collect_document_cache_metrics():
+    entries_gauge.set(len(document_cache))
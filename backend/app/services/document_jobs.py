@@ -0,0 +1,85 @@
+"""
+Post-signature work, run by worker.py instead of inside the sign request.
+
+render_signed_pdf: render the signed PDF with the certificate page
+The signing confirmation to the patient goes through the WizeChat outbox.
+"""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.config import settings
+from app.models import Document, DocumentStatusEnum, Job, OutboxMessage
+from app.services import audit
+from app.services.document_cache import document_cache
+from app.services.jobs import job_queue, RetryLater
+from app.services.outbox import add_message
+from app.services.pdf_generator import pdf_render_engine, RenderQueueFullError
+
+RENDER_SIGNED_PDF = "render_signed_pdf"
+
+
+async def _load_document(db: AsyncSession, job: Job) -> Document:
+    return await db.get(
+        Document, job.document_id,
+        options=[selectinload(Document.patient), selectinload(Document.hospital)]
+    )
+
+
+@job_queue.handler(RENDER_SIGNED_PDF)
+async def render_signed_pdf(db: AsyncSession, job: Job):
+    document = await _load_document(db, job)
+    if not document or document.status != DocumentStatusEnum.SIGNED or not document.signature:
+        print(f"ℹ️ Document {job.document_id} is not signed (anymore), nothing to render")
+        return
+
+    try:
+        signed_pdf_path = await pdf_render_engine.generate_signed_pdf(
+            document_id=str(document.id),
+            signature_base64=document.signature,
+            patient_name=document.patient.full_name if document.patient else "Unknown",
+            procedure_name=document.procedure_name,
+            signed_date=document.signed_date,
+            certificate_hash=document.certificate_hash,
+            original_pdf_path=document.file_path,  # Use stored file path
+            signature_fields=document.fields,  # Pass signature field positions
+            ip_address=document.ip_address,
+            phone_number=document.patient.phone if document.patient else None
+        )
+    except RenderQueueFullError as e:
+        # Saturation is not a failure of this job
+        raise RetryLater(e.retry_after, "Render pool saturated")
+
+    # Update document with signed PDF path
+    document.file_url = f"/api/documents/{document.id}/download"
+
+    audit.record(db, document.id, "SIGNED_PDF_GENERATED", details=f"Signed PDF generated: {signed_pdf_path}")
+    await document_cache.invalidate(db, document.id)
+
+
+def queue_completion_message(db: AsyncSession, document: Document, after_job: Optional[Job] = None) -> Optional[OutboxMessage]:
+    """
+    Put the signing confirmation for the patient in the outbox (patient and
+    hospital must be loaded). Returns None when there is nobody to send it to.
+    """
+    if not document.patient or not document.patient.phone:
+        return None
+    config = document.hospital.wizechat_config if document.hospital else None
+    if not config or not config.get("inbox_id"):
+        print(f"ℹ️ No WizeChat inbox configured for hospital {document.hospital_id}, skipping completion message")
+        return None
+
+    # Format signed date (ISO format for API)
+    signed_at_iso = document.signed_date.isoformat() if document.signed_date else datetime.utcnow().isoformat()
+
+    return add_message(db, "send_completion", document, {
+        "inbox_id": config.get("inbox_id"),
+        "to_phone": document.patient.phone,
+        "document_name": document.procedure_name or "Medical Consent Form",
+        "signed_document_url": f"{settings.FRONTEND_URL}/document/{document.secure_token}",
+        "signer_name": document.patient.full_name,
+        "signed_at": signed_at_iso,
+        "send_document": False,  # Link only, not PDF attachment
+    }, after_job=after_job)
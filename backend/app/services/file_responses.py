@@ -0,0 +1,137 @@
+"""
+File responses with HTTP Range support.
+
+Starlette's FileResponse (in the version we pin) always sends the whole file.
+pdf.js checks for `Accept-Ranges: bytes` on its first request and then fetches
+the PDF in chunks, so with a linearized file the first page renders after the
+first few ranges instead of after the full download.
+"""
+import os
+import re
+import hashlib
+from email.utils import formatdate
+from pathlib import Path
+from typing import Optional
+from urllib.parse import quote
+
+import anyio
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+CHUNK_SIZE = 64 * 1024
+_RANGE_RE = re.compile(r"^\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*$")
+
+
+def file_etag(stat_result: os.stat_result) -> str:
+    """Same validator FileResponse derives from mtime and size"""
+    etag_base = f"{stat_result.st_mtime}-{stat_result.st_size}"
+    return f'"{hashlib.md5(etag_base.encode(), usedforsecurity=False).hexdigest()}"'
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def _parse_range(header: str, size: int) -> Optional[tuple]:
+    """
+    Parse a single `bytes=` range into an inclusive (start, end).
+
+    Returns None when the header should be ignored (malformed or multiple
+    ranges; a full 200 is a valid answer to those) and raises ValueError when
+    the range cannot be satisfied.
+    """
+    match = _RANGE_RE.match(header)
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+
+async def _iter_file_range(path: str, start: int, length: int):
+    async with await anyio.open_file(path, "rb") as f:
+        await f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = await f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def ranged_file_response(
+    request: Request, path: Path, filename: str, media_type: str = "application/pdf"
+) -> Response:
+    """
+    Serve a file honouring Range, If-Range and If-None-Match.
+
+    Responds 200 (whole file), 206 (one byte range), 304 (ETag still valid)
+    or 416 (range outside the file). Every response advertises
+    `Accept-Ranges: bytes` and carries the file's ETag.
+    """
+    stat_result = os.stat(path)
+    size = stat_result.st_size
+    etag = file_etag(stat_result)
+
+    quoted = quote(filename)
+    if quoted != filename:
+        content_disposition = f"attachment; filename*=utf-8''{quoted}"
+    else:
+        content_disposition = f'attachment; filename="{filename}"'
+    headers = {
+        "accept-ranges": "bytes",
+        "etag": etag,
+        "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+        # Signed copies are re-rendered in place; revalidate instead of trusting a stale copy
+        "cache-control": "private, no-cache",
+        "content-disposition": content_disposition,
+    }
+
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            return Response(
+                status_code=416,
+                headers={**headers, "content-range": f"bytes */{size}"}
+            )
+        if byte_range is not None:
+            start, end = byte_range
+            length = end - start + 1
+            return StreamingResponse(
+                _iter_file_range(str(path), start, length),
+                status_code=206,
+                media_type=media_type,
+                headers={
+                    **headers,
+                    "content-range": f"bytes {start}-{end}/{size}",
+                    "content-length": str(length),
+                },
+            )
+
+    return FileResponse(
+        path=str(path),
+        media_type=media_type,
+        headers=headers,
+        stat_result=stat_result,
+    )
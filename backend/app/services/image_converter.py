@@ -0,0 +1,151 @@
+"""
+Image-to-PDF conversion for photographed / scanned consent forms.
+
+Each image becomes one letter-size page with the image fitted and centred.
+JPEGs that already fit the target resolution are embedded as-is (DCTDecode),
+without decoding or re-encoding, and their EXIF orientation is applied by the
+placement matrix instead of rotating pixels. Oversize images are downscaled to
+IMAGE_PDF_DPI at their drawn size; other formats are stored losslessly.
+"""
+import io
+from typing import List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from PIL import Image, ImageOps
+from pypdf import PdfWriter
+from pypdf.generic import NameObject, NumberObject, DecodedStreamObject, StreamObject
+from reportlab.lib.pagesizes import letter
+
+from app.config import settings
+from app.services.pdf_generator import stamp_xobject
+
+IMAGE_XOBJECT_NAME = "/WzImage"
+EXIF_ORIENTATION = 0x0112
+
+# Unit-square placement per EXIF orientation: (u', v') = (a1*u + b1*v + c1, a2*u + b2*v + c2),
+# mapping stored image coordinates to upright display coordinates (PDF y-up).
+ORIENTATION_TRANSFORMS = {
+    1: (1, 0, 0, 0, 1, 0),
+    2: (-1, 0, 1, 0, 1, 0),    # Mirrored horizontally
+    3: (-1, 0, 1, 0, -1, 1),   # Rotated 180
+    4: (1, 0, 0, 0, -1, 1),    # Mirrored vertically
+    5: (0, -1, 1, -1, 0, 1),   # Transposed
+    6: (0, 1, 0, -1, 0, 1),    # Rotated 90 clockwise
+    7: (0, 1, 0, 1, 0, 0),     # Transversed
+    8: (0, -1, 1, 1, 0, 0),    # Rotated 90 counter-clockwise
+}
+
+
+class ImageToPDFConverter:
+    """Convert one or more uploaded images (JPEG/PNG/...) into a multi-page PDF"""
+
+    def __init__(self, page_size: tuple = letter, dpi: Optional[int] = None, jpeg_quality: Optional[int] = None):
+        self.page_size = page_size
+        self.dpi = dpi or settings.IMAGE_PDF_DPI
+        self.jpeg_quality = jpeg_quality or settings.IMAGE_PDF_JPEG_QUALITY
+
+    def convert(self, images: List[bytes]) -> bytes:
+        """One page per image, in order"""
+        if not images:
+            raise ValueError("No images to convert")
+        writer = PdfWriter()
+        for data in images:
+            self._add_image_page(writer, data)
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        return buffer.getvalue()
+
+    async def convert_async(self, images: List[bytes]) -> bytes:
+        """convert() in a worker thread; Pillow and zlib release the GIL while they work"""
+        return await run_in_threadpool(self.convert, images)
+
+    def _placement(self, display_width: int, display_height: int) -> tuple:
+        """Box (x, y, width, height) in points fitting the upright image on the page"""
+        page_width, page_height = self.page_size
+        scale = min(page_width / display_width, page_height / display_height)
+        width, height = display_width * scale, display_height * scale
+        return (page_width - width) / 2, (page_height - height) / 2, width, height
+
+    def _add_image_page(self, writer: PdfWriter, data: bytes):
+        image = Image.open(io.BytesIO(data))
+        orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+        if orientation not in ORIENTATION_TRANSFORMS:
+            orientation = 1
+        stored_width, stored_height = image.size
+        display_width, display_height = (
+            (stored_height, stored_width) if orientation >= 5 else (stored_width, stored_height)
+        )
+        x, y, box_width, box_height = self._placement(display_width, display_height)
+        # Pixels needed for the drawn size at the target resolution
+        max_width = round(box_width * self.dpi / 72)
+        max_height = round(box_height * self.dpi / 72)
+        oversize = display_width > max_width * 1.05 or display_height > max_height * 1.05
+
+        if image.format == "JPEG" and image.mode in ("L", "RGB") and not oversize:
+            print(f"  - Embedding JPEG {stored_width}x{stored_height} as-is (orientation {orientation})")
+            stream = self._jpeg_stream(data, image)
+        else:
+            if image.format == "JPEG" and oversize:
+                # Let libjpeg decode at a reduced scale (1/2, 1/4, 1/8) when it can
+                image.draft("RGB", (max_width, max_height) if orientation < 5 else (max_height, max_width))
+            image = ImageOps.exif_transpose(image)
+            orientation = 1
+            image = self._flatten(image)
+            if oversize:
+                image.thumbnail((max_width, max_height), Image.LANCZOS)
+                print(f"  - Downscaled image to {image.width}x{image.height} ({self.dpi} DPI)")
+            if image.format == "JPEG" or data[:3] == b"\xff\xd8\xff":
+                # Photos stay lossy: re-encode as JPEG instead of inflating them losslessly
+                buffer = io.BytesIO()
+                image.save(buffer, format="JPEG", quality=self.jpeg_quality, optimize=True)
+                stream = self._jpeg_stream(buffer.getvalue(), image)
+            else:
+                stream = self._flate_stream(image)
+
+        page = writer.add_blank_page(*self.page_size)
+        a1, b1, c1, a2, b2, c2 = ORIENTATION_TRANSFORMS[orientation]
+        matrix = (
+            box_width * a1, box_height * a2, box_width * b1, box_height * b2,
+            x + box_width * c1, y + box_height * c2,
+        )
+        stamp_xobject(writer, page, writer._add_object(stream), IMAGE_XOBJECT_NAME, [matrix])
+
+    @staticmethod
+    def _flatten(image: Image.Image) -> Image.Image:
+        """RGB or greyscale; transparency is composited onto white paper"""
+        if image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            return background
+        if image.mode not in ("L", "RGB"):
+            return image.convert("RGB")
+        return image
+
+    @staticmethod
+    def _image_dict(stream: StreamObject, image: Image.Image):
+        stream.update({
+            NameObject("/Type"): NameObject("/XObject"),
+            NameObject("/Subtype"): NameObject("/Image"),
+            NameObject("/Width"): NumberObject(image.width),
+            NameObject("/Height"): NumberObject(image.height),
+            NameObject("/ColorSpace"): NameObject("/DeviceGray" if image.mode == "L" else "/DeviceRGB"),
+            NameObject("/BitsPerComponent"): NumberObject(8),
+        })
+
+    def _jpeg_stream(self, jpeg: bytes, image: Image.Image) -> StreamObject:
+        stream = StreamObject()
+        stream.set_data(jpeg)
+        self._image_dict(stream, image)
+        stream[NameObject("/Filter")] = NameObject("/DCTDecode")
+        return stream
+
+    def _flate_stream(self, image: Image.Image) -> StreamObject:
+        stream = DecodedStreamObject()
+        stream.set_data(image.tobytes())
+        self._image_dict(stream, image)
+        return stream.flate_encode()
+
+
+# Create singleton instance
+image_converter = ImageToPDFConverter()
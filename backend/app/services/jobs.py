@@ -0,0 +1,325 @@
+"""
+Durable background jobs stored in Postgres.
+
+Jobs are enqueued in the caller's transaction, so a job exists exactly when
+the change that needs it was committed. worker.py runs them: workers claim due
+jobs with SELECT ... FOR UPDATE SKIP LOCKED, so several workers can poll the
+same table without handing a job out twice. A failed job is retried with
+exponential backoff and dead-lettered (status DEAD) after max_attempts.
+
+Delivery is at-least-once: a worker can die after a handler's side effect but
+before its commit, so handlers must tolerate running twice.
+"""
+import os
+import time
+import uuid
+import socket
+import asyncio
+import traceback
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import select, update, delete, func, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import Job, JobStatusEnum
+from app.services.metrics import metrics
+
+Handler = Callable[[AsyncSession, Job], Awaitable[None]]
+
+jobs_total = metrics.counter("wizesign_jobs_total", "Jobs finished by this worker, by kind and outcome")
+job_duration_seconds = metrics.counter("wizesign_job_duration_seconds_total", "Time spent running jobs, by kind")
+queue_depth = metrics.gauge("wizesign_job_queue_depth", "Jobs waiting, running or dead, by kind and status")
+oldest_due_seconds = metrics.gauge("wizesign_job_oldest_due_seconds", "Age of the oldest due but unclaimed job, by kind")
+
+
+class RetryLater(Exception):
+    """Raised by a handler to be rescheduled without using up an attempt (e.g. a dependency is not done yet)"""
+
+    def __init__(self, delay: float, reason: str = ""):
+        super().__init__(reason)
+        self.delay = delay
+        self.reason = reason
+
+
+def enqueue(
+    db: AsyncSession,
+    kind: str,
+    document_id: Optional[uuid.UUID] = None,
+    payload: Optional[dict] = None,
+    delay: float = 0,
+    max_attempts: Optional[int] = None
+) -> Job:
+    """Add a job to the session; it becomes visible to workers when the caller commits"""
+    now = datetime.utcnow()
+    job = Job(
+        id=uuid.uuid4(),
+        kind=kind,
+        document_id=document_id,
+        payload=payload,
+        status=JobStatusEnum.QUEUED,
+        attempts=0,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        run_at=now + timedelta(seconds=delay),
+        created_at=now,
+        updated_at=now,
+    )
+    db.add(job)
+    return job
+
+
+async def jobs_for_documents(db: AsyncSession, document_ids: list) -> Dict[uuid.UUID, List[Job]]:
+    """Jobs of several documents in one query, oldest first"""
+    by_document = {document_id: [] for document_id in document_ids}
+    if not document_ids:
+        return by_document
+    result = await db.execute(
+        select(Job).where(Job.document_id.in_(document_ids)).order_by(Job.created_at)
+    )
+    for job in result.scalars():
+        by_document[job.document_id].append(job)
+    return by_document
+
+
+async def pending_job(db: AsyncSession, document_id: uuid.UUID, kind: str) -> Optional[Job]:
+    """A queued or running job of this kind for the document, if any"""
+    result = await db.execute(
+        select(Job).where(
+            Job.document_id == document_id,
+            Job.kind == kind,
+            Job.status.in_([JobStatusEnum.QUEUED, JobStatusEnum.RUNNING])
+        ).limit(1)
+    )
+    return result.scalar_one_or_none()
+
+
+class JobQueue:
+    """Handler registry plus the claim / complete / fail transitions of the jobs table"""
+
+    def __init__(self):
+        self.handlers: Dict[str, Handler] = {}
+
+    def handler(self, kind: str):
+        """Decorator registering the coroutine that runs jobs of `kind`"""
+        def register(fn: Handler) -> Handler:
+            self.handlers[kind] = fn
+            return fn
+        return register
+
+    @staticmethod
+    def backoff(attempts: int) -> float:
+        return min(settings.JOB_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0), settings.JOB_RETRY_MAX_SECONDS)
+
+    async def claim(self, limit: int, worker_id: str) -> List[uuid.UUID]:
+        """
+        Lock up to `limit` due jobs for this worker. Jobs left RUNNING by a
+        worker that died (locked longer than JOB_LOCK_TIMEOUT) are claimed again.
+        """
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Job)
+                .where(or_(
+                    and_(Job.status == JobStatusEnum.QUEUED, Job.run_at <= now),
+                    and_(Job.status == JobStatusEnum.RUNNING, Job.locked_at < stale)
+                ))
+                .order_by(Job.run_at)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            )
+            claimed = []
+            for job in result.scalars():
+                if job.status == JobStatusEnum.RUNNING and job.attempts >= job.max_attempts:
+                    # Lost on its last attempt (e.g. the worker was OOM-killed while running it)
+                    job.status = JobStatusEnum.DEAD
+                    job.last_error = f"Worker {job.locked_by} lost the job while running it"
+                    job.locked_at = None
+                    job.finished_at = now
+                    print(f"💀 Job {job.kind} {job.id} dead-lettered: {job.last_error}")
+                    continue
+                job.status = JobStatusEnum.RUNNING
+                job.attempts += 1
+                job.locked_at = now
+                job.locked_by = worker_id
+                claimed.append(job.id)
+            await db.commit()
+            return claimed
+
+    async def run(self, job_id: uuid.UUID):
+        """Run a claimed job; the handler's changes and the DONE status commit together"""
+        async with AsyncSessionLocal() as db:
+            job = await db.get(Job, job_id)
+            if job is None:
+                return  # Deleted with its document since it was claimed
+            kind, attempts, max_attempts = job.kind, job.attempts, job.max_attempts
+            started = time.monotonic()
+            try:
+                handler = self.handlers.get(kind)
+                if handler is None:
+                    # Possibly enqueued by a newer API version than this worker: retry, don't drop
+                    raise LookupError(f"No handler registered for job kind '{kind}'")
+                await handler(db, job)
+                job.status = JobStatusEnum.DONE
+                job.locked_at = None
+                job.last_error = None
+                job.finished_at = datetime.utcnow()
+                await db.commit()
+                jobs_total.inc(kind=kind, outcome="done")
+                print(f"✅ Job {kind} {job_id} done (attempt {attempts})")
+            except RetryLater as e:
+                await db.rollback()
+                await self._reschedule(job_id, e.delay, e.reason, count_attempt=False)
+                jobs_total.inc(kind=kind, outcome="deferred")
+                print(f"⏳ Job {kind} {job_id} deferred {e.delay:g}s: {e.reason}")
+            except Exception as e:
+                await db.rollback()
+                error = f"{type(e).__name__}: {e}"
+                if attempts >= max_attempts:
+                    await self._dead_letter(job_id, error)
+                    jobs_total.inc(kind=kind, outcome="dead")
+                    print(f"💀 Job {kind} {job_id} dead-lettered after {attempts} attempts: {error}")
+                else:
+                    delay = self.backoff(attempts)
+                    await self._reschedule(job_id, delay, error)
+                    jobs_total.inc(kind=kind, outcome="retry")
+                    print(f"❌ Job {kind} {job_id} failed (attempt {attempts}/{max_attempts}), retrying in {delay:g}s: {error}")
+                traceback.print_exc()
+            finally:
+                job_duration_seconds.inc(time.monotonic() - started, kind=kind)
+
+    async def _reschedule(self, job_id: uuid.UUID, delay: float, error: str, count_attempt: bool = True):
+        values = dict(
+            status=JobStatusEnum.QUEUED,
+            run_at=datetime.utcnow() + timedelta(seconds=delay),
+            locked_at=None,
+            locked_by=None,
+            last_error=error or None,
+            updated_at=datetime.utcnow(),
+        )
+        if not count_attempt:
+            values["attempts"] = Job.attempts - 1
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(Job).where(Job.id == job_id).values(**values))
+            await db.commit()
+
+    async def _dead_letter(self, job_id: uuid.UUID, error: str):
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(Job).where(Job.id == job_id).values(
+                    status=JobStatusEnum.DEAD,
+                    locked_at=None,
+                    last_error=error,
+                    finished_at=datetime.utcnow(),
+                    updated_at=datetime.utcnow(),
+                )
+            )
+            await db.commit()
+
+    async def requeue_dead(self, kind: Optional[str] = None) -> int:
+        """Give dead-lettered jobs a fresh set of attempts. Returns how many were requeued"""
+        conditions = [Job.status == JobStatusEnum.DEAD]
+        if kind:
+            conditions.append(Job.kind == kind)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(Job).where(*conditions).values(
+                    status=JobStatusEnum.QUEUED,
+                    attempts=0,
+                    run_at=datetime.utcnow(),
+                    finished_at=None,
+                    updated_at=datetime.utcnow(),
+                )
+            )
+            await db.commit()
+            return result.rowcount
+
+    async def prune(self) -> int:
+        """Delete DONE jobs older than JOB_RETENTION_DAYS"""
+        cutoff = datetime.utcnow() - timedelta(days=settings.JOB_RETENTION_DAYS)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                delete(Job).where(Job.status == JobStatusEnum.DONE, Job.finished_at < cutoff)
+            )
+            await db.commit()
+            return result.rowcount
+
+
+# Create singleton instance
+job_queue = JobQueue()
+
+
+@metrics.collector
+async def collect_job_metrics():
+    """Queue depth from the jobs table (shared by all processes, so any API worker can report it)"""
+    now = datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        counts = await db.execute(
+            select(Job.kind, Job.status, func.count())
+            .where(Job.status != JobStatusEnum.DONE)
+            .group_by(Job.kind, Job.status)
+        )
+        oldest = await db.execute(
+            select(Job.kind, func.min(Job.run_at))
+            .where(Job.status == JobStatusEnum.QUEUED, Job.run_at <= now)
+            .group_by(Job.kind)
+        )
+    queue_depth.clear()
+    for kind, status, count in counts:
+        queue_depth.set(count, kind=kind, status=status.value)
+    oldest_due_seconds.clear()
+    for kind, run_at in oldest:
+        oldest_due_seconds.set(round((now - run_at).total_seconds(), 1), kind=kind)
+
+
+class JobWorker:
+    """
+    Polls a queue and runs up to `concurrency` items at a time. Works with any
+    queue offering claim(limit, worker_id), run(id), prune() and a `handlers`
+    dict (JobQueue, the WizeChat outbox dispatcher).
+    """
+
+    PRUNE_INTERVAL = 3600  # Seconds between clean-ups of finished jobs
+
+    def __init__(self, queue: JobQueue, concurrency: int, poll_interval: float, name: str = "Job worker"):
+        self.queue = queue
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.name = name
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+    async def run_forever(self, stop: asyncio.Event):
+        """Run until `stop` is set, then let the running jobs finish"""
+        running = set()
+        stop_waiter = asyncio.create_task(stop.wait())
+        next_prune = time.monotonic()
+        print(f"👷 {self.name} {self.worker_id} started ({self.concurrency} concurrent jobs, kinds: {', '.join(sorted(self.queue.handlers))})")
+        while not stop.is_set():
+            free = self.concurrency - len(running)
+            claimed = []
+            try:
+                if time.monotonic() >= next_prune:
+                    next_prune = time.monotonic() + self.PRUNE_INTERVAL
+                    pruned = await self.queue.prune()
+                    if pruned:
+                        print(f"🧹 {self.name} pruned {pruned} finished items")
+                if free:
+                    claimed = await self.queue.claim(free, self.worker_id)
+            except Exception as e:
+                # Database restarts etc.: keep polling
+                print(f"⚠️ {self.name} poll failed: {e}")
+            for job_id in claimed:
+                task = asyncio.create_task(self.queue.run(job_id))
+                running.add(task)
+                task.add_done_callback(running.discard)
+            if free and len(claimed) == free:
+                continue  # The queue may hold more due jobs than we had room for
+            # Idle or full: wake up on stop, on a finished job or after the poll interval
+            await asyncio.wait([stop_waiter, *running], timeout=self.poll_interval, return_when=asyncio.FIRST_COMPLETED)
+        stop_waiter.cancel()
+        if running:
+            print(f"⏳ Waiting for {len(running)} running jobs to finish...")
+            await asyncio.wait(running)
+        print(f"👋 {self.name} {self.worker_id} stopped")
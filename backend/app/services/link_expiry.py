@@ -0,0 +1,74 @@
+"""
+Link expiry sweep (runs in worker.py every LINK_EXPIRY_SWEEP_INTERVAL seconds).
+
+Documents whose patient link expired while they were still DRAFT, SENT or
+VIEWED are set to EXPIRED, so the status counts of the dashboards are right
+without waiting for the patient to open the link. The sweep works in batches
+of LINK_EXPIRY_BATCH_SIZE documents, one transaction each:
+- one UPDATE ... RETURNING sets the status of the batch;
+- one multi-row INSERT writes their LINK_EXPIRED audit events;
+- one NOTIFY drops them from the patient view caches.
+Rows are picked with FOR UPDATE SKIP LOCKED, so a document being signed right
+now is left for the next run, and several workers can sweep at once.
+
+The partial index ix_documents_link_expiry_expirable covers exactly the
+expirable documents, so a run reads only what is due.
+"""
+from datetime import datetime
+
+from sqlalchemy import select, update, insert
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import Document, DocumentAuditEvent, DocumentStatusEnum
+from app.services.document_cache import document_cache
+from app.services.metrics import metrics
+
+# Statuses a link can still expire in; SIGNED, COMPLETED and EXPIRED are final
+EXPIRABLE_STATUSES = (DocumentStatusEnum.DRAFT, DocumentStatusEnum.SENT, DocumentStatusEnum.VIEWED)
+
+expired_total = metrics.counter("wizesign_documents_expired_total", "Documents set to EXPIRED by the link expiry sweep")
+
+
+async def expire_batch(now: datetime, batch_size: int) -> int:
+    async with AsyncSessionLocal() as db:
+        due = (
+            select(Document.id)
+            .where(Document.link_expiry < now, Document.status.in_(EXPIRABLE_STATUSES))
+            .order_by(Document.link_expiry)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        result = await db.execute(
+            update(Document)
+            .where(Document.id.in_(due.scalar_subquery()))
+            .values(status=DocumentStatusEnum.EXPIRED)
+            .returning(Document.id, Document.link_expiry)
+            .execution_options(synchronize_session=False)
+        )
+        expired = result.all()
+        if not expired:
+            return 0
+
+        await db.execute(insert(DocumentAuditEvent), [
+            {
+                "document_id": document_id, "ts": now, "action": "LINK_EXPIRED", "actor": "SYSTEM",
+                "details": f"Patient link expired at {link_expiry.isoformat()} UTC",
+            }
+            for document_id, link_expiry in expired
+        ])
+        await document_cache.invalidate_many(db, [document_id for document_id, _ in expired])
+        await db.commit()
+        return len(expired)
+
+
+async def expire_links() -> int:
+    """Expire every document that is due, batch by batch; returns how many"""
+    now = datetime.utcnow()
+    total = 0
+    while True:
+        count = await expire_batch(now, settings.LINK_EXPIRY_BATCH_SIZE)
+        total += count
+        expired_total.inc(count)
+        if count < settings.LINK_EXPIRY_BATCH_SIZE:
+            return total
@@ -0,0 +1,98 @@
+"""
+Prometheus metrics in the text exposition format, served at GET /metrics.
+
+Counters and gauges live in process memory (one set per uvicorn worker).
+Values that live in the database, like the job queue depth, are read by
+collectors at scrape time, so every API process reports the same numbers for
+them. /metrics is not routed through nginx; scrape the backend directly.
+"""
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in key) + "}"
+
+
+class Metric:
+    """A named family of samples, one per label combination"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.samples: Dict[LabelKey, float] = {}
+
+    @staticmethod
+    def _key(labels: dict) -> LabelKey:
+        return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in self.samples.items():
+            lines.append(f"{self.name}{_format_labels(key)} {value:g}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self.samples[key] = self.samples.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        self.samples[self._key(labels)] = value
+
+    def clear(self):
+        """Drop all samples (collectors refill gauges from scratch on every scrape)"""
+        self.samples = {}
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self.collectors: List[Callable[[], Awaitable[None]]] = []
+
+    def _register(self, metric: Metric) -> Metric:
+        # Modules are imported once per process, but keep re-registration harmless
+        return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self._register(Counter(name, documentation))
+
+    def gauge(self, name: str, documentation: str) -> Gauge:
+        return self._register(Gauge(name, documentation))
+
+    def collector(self, fn: Callable[[], Awaitable[None]]):
+        """Register an async function that refreshes gauges right before each scrape"""
+        self.collectors.append(fn)
+        return fn
+
+    async def render(self) -> str:
+        for collect in self.collectors:
+            try:
+                await collect()
+            except Exception as e:
+                # A failing collector must not take the other metrics down with it
+                print(f"⚠️ Metrics collector {collect.__name__} failed: {e}")
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Create singleton instance
+metrics = MetricsRegistry()
@@ -0,0 +1,229 @@
+"""
+Transactional outbox for WizeChat messages.
+
+Request handlers call add_message() in the same transaction as the document
+change behind the message and respond without waiting for WizeChat. The
+dispatcher in worker.py claims due messages with SELECT ... FOR UPDATE SKIP
+LOCKED, sends them with bounded concurrency over the shared HTTP client of
+wizechat_service and writes the delivery result to the document's audit trail.
+
+A claimed message is leased until next_attempt_at; if its dispatcher dies it
+is picked up again after the lease, so delivery is at-least-once.
+"""
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import Document, Hospital, Job, JobStatusEnum, OutboxMessage, OutboxStatusEnum
+from app.services import audit
+from app.services.document_cache import document_cache
+from app.services.jobs import JobQueue
+from app.services.metrics import metrics
+from app.services.wizechat import wizechat_service, WizeChatClientError
+
+# Audit actions written on delivery and on giving up, per message kind (WizeChatService method)
+AUDIT_ACTIONS = {
+    "send_signature_request": ("WHATSAPP_SENT", "WHATSAPP_FAILED"),
+    "send_otp": ("OTP_SENT", "OTP_FAILED"),
+    "send_completion": ("SIGNED_COPY_SENT", "SIGNED_COPY_FAILED"),
+}
+
+# Payload keys that must not outlive delivery
+SECRET_PAYLOAD_KEYS = ("otp_code",)
+
+# How long a message waits before checking again on the job it follows
+AFTER_JOB_WAIT_SECONDS = 5
+
+messages_total = metrics.counter("wizesign_outbox_messages_total", "Outbox messages finished by this worker, by kind and outcome")
+outbox_depth = metrics.gauge("wizesign_outbox_pending", "Outbox messages waiting for delivery, by kind")
+oldest_pending_seconds = metrics.gauge("wizesign_outbox_oldest_pending_seconds", "Age of the oldest undelivered outbox message, by kind")
+
+
+def add_message(
+    db: AsyncSession,
+    kind: str,
+    document: Document,
+    payload: dict,
+    expires_at: Optional[datetime] = None,
+    after_job: Optional[Job] = None
+) -> OutboxMessage:
+    """
+    Add a WizeChat message to the session; it is sent once the caller commits.
+    `payload` holds the WizeChatService method arguments except api_key, which
+    is read from the hospital's WizeChat config at send time. With `after_job`
+    the message waits until that job is no longer queued or running.
+    """
+    if kind not in AUDIT_ACTIONS:
+        raise ValueError(f"Unknown outbox message kind '{kind}'")
+    now = datetime.utcnow()
+    message = OutboxMessage(
+        id=uuid.uuid4(),
+        kind=kind,
+        document_id=document.id,
+        hospital_id=document.hospital_id,
+        payload=payload,
+        status=OutboxStatusEnum.PENDING,
+        attempts=0,
+        next_attempt_at=now,
+        expires_at=expires_at,
+        after_job_id=after_job.id if after_job else None,
+        created_at=now,
+    )
+    db.add(message)
+    return message
+
+
+def _describe(message: OutboxMessage) -> str:
+    payload = message.payload
+    if message.kind == "send_signature_request":
+        return f"WhatsApp to {payload.get('to_phone')} via inbox {payload.get('inbox_id')}"
+    if message.kind == "send_otp":
+        return f"OTP to {payload.get('to_phone')} via WizeChat"
+    return f"Signed document notification to {payload.get('to_phone')} via WizeChat"
+
+
+class OutboxDispatcher:
+    """Claim / deliver / prune for the outbox table; driven by a JobWorker in worker.py"""
+
+    def __init__(self):
+        self.handlers = {kind: getattr(wizechat_service, kind) for kind in AUDIT_ACTIONS}
+
+    async def claim(self, limit: int, worker_id: str) -> List[uuid.UUID]:
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(OutboxMessage)
+                .where(OutboxMessage.status == OutboxStatusEnum.PENDING, OutboxMessage.next_attempt_at <= now)
+                .order_by(OutboxMessage.next_attempt_at)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            )
+            claimed = []
+            for message in result.scalars():
+                message.attempts += 1
+                message.next_attempt_at = now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+                claimed.append(message.id)
+            await db.commit()
+            return claimed
+
+    async def run(self, message_id: uuid.UUID):
+        async with AsyncSessionLocal() as db:
+            message = await db.get(OutboxMessage, message_id)
+            if message is None or message.status != OutboxStatusEnum.PENDING:
+                return
+            kind = message.kind
+            now = datetime.utcnow()
+
+            if message.attempts > settings.OUTBOX_MAX_ATTEMPTS:
+                # Its lease ran out on the last attempt (dispatcher killed mid-send)
+                await self._record(db, message, OutboxStatusEnum.FAILED, "Dispatcher lost the message while sending it")
+                messages_total.inc(kind=kind, outcome="failed")
+                return
+
+            if message.expires_at and message.expires_at <= now:
+                await self._record(db, message, OutboxStatusEnum.EXPIRED, "Not delivered before it expired")
+                messages_total.inc(kind=kind, outcome="expired")
+                return
+
+            if message.after_job_id:
+                job_status = await db.scalar(select(Job.status).where(Job.id == message.after_job_id))
+                if job_status in (JobStatusEnum.QUEUED, JobStatusEnum.RUNNING):
+                    message.attempts -= 1
+                    message.next_attempt_at = now + timedelta(seconds=AFTER_JOB_WAIT_SECONDS)
+                    await db.commit()
+                    return
+
+            hospital = await db.get(Hospital, message.hospital_id) if message.hospital_id else None
+            api_key = (hospital.wizechat_config or {}).get("api_key") if hospital else None
+            # Don't hold a transaction open while waiting on WizeChat
+            await db.commit()
+
+            try:
+                response = await self.handlers[kind](**message.payload, api_key=api_key)
+            except WizeChatClientError as e:
+                await self._record(db, message, OutboxStatusEnum.FAILED, str(e))
+                messages_total.inc(kind=kind, outcome="failed")
+                return
+            except Exception as e:
+                error = str(e) or type(e).__name__
+                if message.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                    await self._record(db, message, OutboxStatusEnum.FAILED, error)
+                    messages_total.inc(kind=kind, outcome="failed")
+                else:
+                    delay = JobQueue.backoff(message.attempts)
+                    message.last_error = error
+                    message.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+                    await db.commit()
+                    messages_total.inc(kind=kind, outcome="retry")
+                    print(f"❌ Outbox {kind} {message_id} failed (attempt {message.attempts}), retrying in {delay:g}s: {error}")
+                return
+
+            message.response = response
+            await self._record(db, message, OutboxStatusEnum.SENT)
+            messages_total.inc(kind=kind, outcome="sent")
+
+    def _finish(self, message: OutboxMessage, status: OutboxStatusEnum, error: Optional[str] = None):
+        message.status = status
+        message.last_error = error
+        if status == OutboxStatusEnum.SENT:
+            message.sent_at = datetime.utcnow()
+        message.payload = {
+            key: "******" if key in SECRET_PAYLOAD_KEYS else value
+            for key, value in message.payload.items()
+        }
+
+    async def _record(self, db: AsyncSession, message: OutboxMessage, status: OutboxStatusEnum, error: Optional[str] = None):
+        """Final status plus the matching audit event on the document, in one transaction"""
+        description = _describe(message)
+        self._finish(message, status, error)
+        if message.document_id:
+            sent_action, failed_action = AUDIT_ACTIONS[message.kind]
+            if status == OutboxStatusEnum.SENT:
+                audit.record(db, message.document_id, sent_action, details=f"{description} delivered")
+            else:
+                audit.record(
+                    db, message.document_id, failed_action,
+                    details=f"{description} not delivered after {message.attempts} attempt(s): {error}"
+                )
+            await document_cache.invalidate(db, message.document_id)
+        await db.commit()
+        icon = "✅" if status == OutboxStatusEnum.SENT else "💀"
+        print(f"{icon} Outbox {message.kind} {message.id} {status.value}: {description}{f' ({error})' if error else ''}")
+
+    async def prune(self) -> int:
+        """Delete delivered and expired messages older than JOB_RETENTION_DAYS (failed ones are kept)"""
+        cutoff = datetime.utcnow() - timedelta(days=settings.JOB_RETENTION_DAYS)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                delete(OutboxMessage).where(
+                    OutboxMessage.status.in_([OutboxStatusEnum.SENT, OutboxStatusEnum.EXPIRED]),
+                    OutboxMessage.created_at < cutoff
+                )
+            )
+            await db.commit()
+            return result.rowcount
+
+
+# Create singleton instance
+outbox_dispatcher = OutboxDispatcher()
+
+
+@metrics.collector
+async def collect_outbox_metrics():
+    now = datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        rows = await db.execute(
+            select(OutboxMessage.kind, func.count(), func.min(OutboxMessage.created_at))
+            .where(OutboxMessage.status == OutboxStatusEnum.PENDING)
+            .group_by(OutboxMessage.kind)
+        )
+    outbox_depth.clear()
+    oldest_pending_seconds.clear()
+    for kind, count, oldest in rows:
+        outbox_depth.set(count, kind=kind)
+        oldest_pending_seconds.set(round((now - oldest).total_seconds(), 1), kind=kind)
@@ -0,0 +1,119 @@
+"""
+Server-side page previews for the mobile patient view.
+
+Each page of a stored PDF is rasterized with pdfium at a few fixed widths and
+saved as WebP/JPEG under PREVIEW_DIR, keyed by the SHA-256 of the file. A
+document and the template it was created from share one set of previews, and
+a preview never changes for a given key, so it can be cached by clients for
+good. Requires pypdfium2; without it the endpoint answers 404 and the viewer
+falls back to pdf.js.
+"""
+import os
+import hashlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+from app.config import settings
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # Optional dependency: previews are disabled without it
+    pdfium = None
+
+MEDIA_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg"}
+
+
+def previews_available() -> bool:
+    return pdfium is not None
+
+
+@lru_cache(maxsize=4096)
+def _digest(path: str, mtime_ns: int, size: int) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file, memoized on (path, mtime, size) so requests don't re-hash large scans"""
+    stat_result = os.stat(path)
+    return _digest(str(path), stat_result.st_mtime_ns, stat_result.st_size)
+
+
+def preview_dir(digest: str) -> Path:
+    return Path(settings.PREVIEW_DIR) / digest[:2] / digest
+
+
+def preview_path(digest: str, page_number: int, width: int) -> Path:
+    return preview_dir(digest) / f"p{page_number}_w{width}.{settings.PREVIEW_FORMAT}"
+
+
+def snap_width(requested: Optional[int]) -> int:
+    """Smallest configured width that covers the requested one (largest if none does)"""
+    widths = sorted(settings.PREVIEW_WIDTHS)
+    if not requested:
+        return widths[-1]
+    return next((width for width in widths if width >= requested), widths[-1])
+
+
+def _save(image, target: Path):
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+    options = {"quality": settings.PREVIEW_QUALITY}
+    if settings.PREVIEW_FORMAT == "webp":
+        options["method"] = 2  # Half the encode time of the default effort for ~2% larger files
+    image.save(tmp_path, format=settings.PREVIEW_FORMAT.upper(), **options)
+    os.replace(tmp_path, target)
+
+
+def _render_page(pdf, digest: str, page_index: int, widths: list):
+    page = pdf[page_index]
+    try:
+        page_width, _ = page.get_size()
+        for width in widths:
+            target = preview_path(digest, page_index + 1, width)
+            if target.exists():
+                continue
+            image = page.render(scale=width / page_width).to_pil()
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            _save(image, target)
+    finally:
+        page.close()
+
+
+def render_previews(path: str) -> int:
+    """
+    Render every page of a PDF at all configured widths (pool job).
+    Already rendered previews are kept. Returns the page count.
+    """
+    if not previews_available():
+        return 0
+    digest = file_digest(path)
+    pdf = pdfium.PdfDocument(path)
+    try:
+        pages = len(pdf)
+        for page_index in range(pages):
+            _render_page(pdf, digest, page_index, settings.PREVIEW_WIDTHS)
+    finally:
+        pdf.close()
+    print(f"✅ Rendered previews for {pages} pages of {path}")
+    return pages
+
+
+def render_page_preview(path: str, page_number: int, width: int) -> Optional[str]:
+    """Render a single (1-indexed) page on demand (pool job). Returns None if the page does not exist"""
+    if not previews_available():
+        return None
+    digest = file_digest(path)
+    pdf = pdfium.PdfDocument(path)
+    try:
+        if not 1 <= page_number <= len(pdf):
+            return None
+        _render_page(pdf, digest, page_number - 1, [width])
+    finally:
+        pdf.close()
+    return str(preview_path(digest, page_number, width))
@@ -0,0 +1,55 @@
+"""
+Keyset pagination for the list endpoints, newest first.
+
+Pages are ordered by (created_at desc, id desc) and the next page starts after
+the last row of the previous one, so a page costs the same however deep it is
+and rows inserted meanwhile don't shift later pages (they show up on the first
+page instead). Each list response carries an opaque X-Next-Cursor header while
+there are more rows; the client passes it back as ?cursor=. The old ?skip=
+offset still works when no cursor is given.
+
+Every listing has a matching (..., created_at DESC, id DESC) index.
+"""
+import base64
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import Select, tuple_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(row) -> str:
+    key = f"{row.created_at.isoformat()}|{row.id}"
+    return base64.urlsafe_b64encode(key.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """(created_at, id) of the last row of the previous page"""
+    try:
+        key = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = key.split("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(row_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def paginate(query: Select, model, cursor: Optional[str], skip: int, limit: int) -> Select:
+    """
+    One page of query: after cursor when given, else at offset skip. Fetches
+    one row more than limit so next_page can tell whether there is another page.
+    """
+    query = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+    if cursor:
+        return query.where(tuple_(model.created_at, model.id) < decode_cursor(cursor))
+    return query.offset(skip)
+
+
+def next_page(rows: list, limit: int, response: Response) -> list:
+    """The rows of the page; sets X-Next-Cursor when paginate fetched a row beyond it"""
+    if limit > 0 and len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1])
+    return rows
@@ -0,0 +1,170 @@
+"""
+Patient resolution shared by document creation (single and bulk) and the SSO
+deep link.
+
+Within a hospital a patient with a WizeFlow external_id is found by that id
+first: WizeFlow patients may share a phone number (a parent and child) and SSO
+deep links must open the patient WizeFlow means. When no patient has the id
+yet, a patient without an external_id is looked up by email, then by
+normalized phone and full name, and takes the external_id over; patients
+created before WizeFlow ids were stored keep their document history that way.
+Other patients are found by email, then normalized phone, preferring patients
+without an external_id and then the latest one, as the old per-key lookups
+did.
+
+(hospital_id, external_id) is unique, so the insert of a missing patient is
+INSERT ... ON CONFLICT DO NOTHING: a request that loses a race for the same
+new WizeFlow patient reads the winner's row instead of creating a duplicate.
+The normalized phone is only a lookup key, since relatives share phones.
+"""
+import re
+import uuid
+from types import SimpleNamespace
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select, or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Patient
+
+MATCH_KEYS = ("external_id", "email", "phone_normalized")  # In match order
+
+# Patient columns a caller may set on a new patient
+PATIENT_COLUMNS = (
+    "external_id", "registration_number", "full_name", "email", "phone", "dob", "age", "gender", "address"
+)
+
+
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    """Digits of a phone number, with the leading + kept: '+91 98765-43210' -> '+919876543210'"""
+    if not phone:
+        return None
+    digits = re.sub(r"\D", "", phone)
+    if not digits:
+        return None
+    return ("+" if phone.strip().startswith("+") else "") + digits
+
+
+def _details(spec) -> dict:
+    """Column values of a new patient from a PatientCreate-like object or dict"""
+    values = spec if isinstance(spec, dict) else spec.model_dump()
+    details = {column: values.get(column) for column in PATIENT_COLUMNS}
+    for column in ("external_id", "email", "phone"):
+        details[column] = details[column] or None
+    details["phone_normalized"] = normalize_phone(details["phone"])
+    return details
+
+
+def _name_key(full_name: Optional[str]) -> str:
+    return " ".join((full_name or "").split()).lower()
+
+
+def _match(candidates: dict, details: dict):
+    if details["external_id"]:
+        patient = candidates.get(("external_id", details["external_id"]))
+        if patient is None and details["email"]:
+            patient = candidates.get(("email", details["email"]))
+            if patient is not None and patient.external_id:
+                patient = None  # Linked to another WizeFlow patient
+        if patient is None and details["phone_normalized"]:
+            # A shared phone alone doesn't identify a WizeFlow patient; the name has to agree
+            patient = candidates.get(("unlinked", details["phone_normalized"], _name_key(details["full_name"])))
+        return patient
+    for key in MATCH_KEYS[1:]:
+        if details[key] and (key, details[key]) in candidates:
+            return candidates[(key, details[key])]
+    return None
+
+
+def _adopt(candidates: dict, patient, details: dict):
+    """Link a patient found without an external_id to the WizeFlow id it was matched for"""
+    if details["external_id"] and not patient.external_id:
+        patient.external_id = details["external_id"]
+        candidates[("external_id", details["external_id"])] = patient
+
+
+async def _candidates(db: AsyncSession, hospital_id: uuid.UUID, specs: List[dict]) -> dict:
+    """(key, value) -> the patient that value matches; one query for all specs"""
+    wanted = {
+        key: {spec[key] for spec in specs if spec[key]}
+        for key in MATCH_KEYS
+    }
+    if not any(wanted.values()):
+        return {}
+    result = await db.execute(
+        select(Patient)
+        .where(
+            (Patient.hospital_id == hospital_id) &
+            or_(*[getattr(Patient, key).in_(values) for key, values in wanted.items() if values])
+        )
+        .order_by(Patient.external_id.isnot(None), Patient.created_at.desc())
+    )
+    candidates = {}
+    for patient in result.scalars():
+        for key in MATCH_KEYS:
+            if getattr(patient, key):
+                candidates.setdefault((key, getattr(patient, key)), patient)
+        if patient.phone_normalized and not patient.external_id:
+            candidates.setdefault(("unlinked", patient.phone_normalized, _name_key(patient.full_name)), patient)
+    return candidates
+
+
+async def resolve_patients(db: AsyncSession, hospital_id: uuid.UUID, specs: list) -> List[Tuple[Patient, bool]]:
+    """
+    (patient, created) for every spec (PatientCreate or dict of Patient columns).
+    One SELECT finds the existing patients, one INSERT adds the missing ones;
+    specs in the batch that would match each other share the new patient.
+    External ids taken over by existing patients are written on the caller's
+    commit.
+    """
+    specs = [_details(spec) for spec in specs]
+    candidates = await _candidates(db, hospital_id, specs)
+
+    matches = []
+    new_rows = []
+    pending = {}  # (key, value) -> patient about to be inserted
+    for spec in specs:
+        patient = _match(candidates, spec)
+        if patient:
+            _adopt(candidates, patient, spec)
+            matches.append(patient)
+            continue
+        row = _match(pending, spec)
+        if row is None:
+            row = SimpleNamespace(id=uuid.uuid4(), **spec)  # Stands in for the patient until it is inserted
+            new_rows.append(row)
+            for key in MATCH_KEYS[:1] if spec["external_id"] else MATCH_KEYS[1:]:
+                if spec[key]:
+                    pending.setdefault((key, spec[key]), row)
+        matches.append(row.id)
+
+    created = {}
+    if new_rows:
+        statement = insert(Patient).on_conflict_do_nothing().returning(Patient)
+        result = await db.scalars(statement, [{**vars(row), "hospital_id": hospital_id} for row in new_rows])
+        created = {patient.id: patient for patient in result}
+
+    lost = [spec for spec, match in zip(specs, matches) if isinstance(match, uuid.UUID) and match not in created]
+    if lost:
+        # Inserted by a concurrent request since the SELECT
+        candidates = await _candidates(db, hospital_id, lost)
+
+    resolved = []
+    for spec, match in zip(specs, matches):
+        if not isinstance(match, uuid.UUID):
+            resolved.append((match, False))
+        elif match in created:
+            resolved.append((created[match], True))
+        else:
+            patient = _match(candidates, spec)
+            if patient is None:
+                raise RuntimeError(f"Patient '{spec['full_name']}' conflicted on insert but was not found")
+            _adopt(candidates, patient, spec)
+            resolved.append((patient, False))
+    return resolved
+
+
+async def resolve_patient(db: AsyncSession, hospital_id: uuid.UUID, spec) -> Tuple[Patient, bool]:
+    """(patient, created) for one PatientCreate or dict of Patient columns"""
+    return (await resolve_patients(db, hospital_id, [spec]))[0]
@@ -1,13 +1,328 @@
 import io
+import os
 import base64
+import hashlib
+import asyncio
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Callable, Any
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.utils import ImageReader
-from pypdf import PdfReader, PdfWriter
-from PIL import Image
+from pypdf import PdfReader, PdfWriter, PageObject
+from pypdf.generic import (
+    ArrayObject, DecodedStreamObject, DictionaryObject, IndirectObject,
+    NameObject, NumberObject, RectangleObject, StreamObject
+)
+from PIL import Image, ImageOps
+
+from app.config import settings
+from app.services.pdf_incremental import IncrementalUpdate, supports_incremental_update
+from app.services.pdf_linearize import linearize_pdf
+from app.services.page_previews import render_previews
+
+
+# Name under which the shared signature image is registered on each page
+SIGNATURE_XOBJECT_NAME = "/WzSignature"
+
+# Box (points) the signature is fitted into on the certificate page
+CERTIFICATE_SIGNATURE_SIZE = (250, 100)
+
+# Certificate (BSA 2023 / Section 65B) static text
+CERTIFICATE_DETAIL_LABELS = [
+    "Document:",
+    "Signed by:",
+    "Date & Time (IST):",
+    "IP Address:",
+    "Verified Phone:",
+    "Document ID:",
+]
+
+CERTIFICATE_DECLARATION = [
+    "I hereby certify that:",
+    "",
+    "(a) This electronic record was produced by the WizeSign system during the ordinary",
+    "    course of its regular operation, for the purpose of recording medical consent.",
+    "",
+    "(b) The information contained in this electronic record was supplied to the system",
+    "    in the ordinary course of its operation by the person named above.",
+    "",
+    "(c) At the time of creation of this electronic record, the computer system was",
+    "    operating properly and was not subject to any defect or malfunction.",
+    "",
+    "(d) The electronic record faithfully and accurately reproduces the information",
+    "    supplied to it, including the electronic signature.",
+    "",
+]
+
+
+def page_to_form_xobject(page: PageObject) -> StreamObject:
+    """
+    Wrap a page's content stream and resources in a Form XObject.
+
+    The result is independent of any writer; clone it into a writer with
+    `writer._add_object(form.clone(writer))` and draw it with stamp_xobject.
+    """
+    form = DecodedStreamObject()
+    form.set_data(page.get_contents().get_data())
+    form.update({
+        NameObject("/Type"): NameObject("/XObject"),
+        NameObject("/Subtype"): NameObject("/Form"),
+        NameObject("/BBox"): RectangleObject(page.mediabox),
+        NameObject("/Resources"): page.get("/Resources", DictionaryObject()),
+    })
+    return form.flate_encode()
+
+
+def _pdf_number(value: float) -> str:
+    return ("%.4f" % value).rstrip("0").rstrip(".") or "0"
+
+
+def stamp_xobject(
+    writer: PdfWriter, page: PageObject, xobject_ref: IndirectObject,
+    name: str, matrices: Optional[list] = None, under: bool = False
+):
+    """
+    Draw an XObject (form or image) on a writer-owned page.
+
+    Unlike PageObject.merge_page this never parses or renames the page's content
+    stream: the XObject is registered under `name` in a page-local copy of the
+    resources and invoked from a small extra content stream, once per `cm`
+    matrix in `matrices` (or once untransformed when no matrices are given).
+    """
+    resources = DictionaryObject(page.get("/Resources", DictionaryObject()).get_object())
+    xobjects = DictionaryObject(resources.get("/XObject", DictionaryObject()).get_object())
+    xobjects[NameObject(name)] = xobject_ref
+    resources[NameObject("/XObject")] = xobjects
+    page[NameObject("/Resources")] = resources
+    
+    def content(data: str) -> IndirectObject:
+        stream = DecodedStreamObject()
+        stream.set_data(data.encode())
+        return writer._add_object(stream)
+    
+    if matrices:
+        draw = "".join(
+            f"q {' '.join(_pdf_number(v) for v in matrix)} cm {name} Do Q\n" for matrix in matrices
+        )
+    else:
+        draw = f"q {name} Do Q\n"
+    
+    existing = page.get("/Contents")
+    if existing is None:
+        existing = []
+    elif isinstance(existing.get_object(), ArrayObject):
+        existing = list(existing.get_object())
+    else:
+        existing = [existing]
+    
+    if under:
+        contents = [content(draw), *existing]
+    else:
+        # Isolate the existing content so its graphics state cannot leak into the stamp
+        contents = [content("q\n"), *existing, content("\nQ\n" + draw)]
+    page[NameObject("/Contents")] = ArrayObject(contents)
+
+
+class SignatureAsset:
+    """
+    Signature image decoded, normalised and encoded once per signed PDF.
+
+    The image is cropped to its ink, downsampled to the resolution needed by the
+    largest box it is drawn into and emitted as a single image XObject that every
+    SIGNATURE field and the certificate page reference.
+    """
+
+    INK_THRESHOLD = 16  # Alpha (or darkness on opaque images) at or below this is background
+    PADDING = 4  # Pixels of background kept around the ink
+
+    def __init__(self, image: Image.Image, boxes: list, dpi: int):
+        image = self._crop_to_ink(image.convert("RGBA"))
+        sizes = [(box[2], box[3]) for box in boxes] + [CERTIFICATE_SIGNATURE_SIZE]
+        self.image = self._downsample(image, sizes, dpi)
+        self.width, self.height = self.image.size
+        self._streams = None
+
+    @classmethod
+    def from_base64(cls, signature_base64: str, boxes: list = (), dpi: Optional[int] = None) -> Optional["SignatureAsset"]:
+        """Decode a (data URL) base64 signature; returns None if it cannot be read"""
+        try:
+            signature_data = signature_base64.split(',')[1] if ',' in signature_base64 else signature_base64
+            image = Image.open(io.BytesIO(base64.b64decode(signature_data)))
+            return cls(image, list(boxes), dpi or settings.SIGNATURE_IMAGE_DPI)
+        except Exception as e:
+            print(f"⚠️ Error decoding signature image: {e}")
+            return None
+
+    def _crop_to_ink(self, image: Image.Image) -> Image.Image:
+        alpha = image.getchannel("A")
+        if alpha.getextrema()[0] < 255:
+            ink = alpha
+        else:
+            ink = ImageOps.invert(image.convert("L"))
+        bbox = ink.point(lambda v: 255 if v > self.INK_THRESHOLD else 0).getbbox()
+        if not bbox:
+            return image  # Blank signature, nothing to crop
+        left, top, right, bottom = bbox
+        return image.crop((
+            max(0, left - self.PADDING), max(0, top - self.PADDING),
+            min(image.width, right + self.PADDING), min(image.height, bottom + self.PADDING),
+        ))
+
+    @staticmethod
+    def _downsample(image: Image.Image, sizes: list, dpi: int) -> Image.Image:
+        # Widest rendering across all boxes (aspect ratio is preserved when drawn)
+        width, height = image.size
+        target_width = max(min(box_w / width, box_h / height) * width for box_w, box_h in sizes) * dpi / 72
+        if target_width >= width:
+            return image
+        new_width = max(1, round(target_width))
+        new_height = max(1, round(height * new_width / width))
+        return image.resize((new_width, new_height), Image.LANCZOS)
+
+    def _encode(self) -> tuple:
+        """Flate-encoded image (and soft mask) streams, built once and cloned per writer"""
+        if self._streams is None:
+            def image_stream(data: bytes, color_space: str) -> StreamObject:
+                stream = DecodedStreamObject()
+                stream.set_data(data)
+                stream.update({
+                    NameObject("/Type"): NameObject("/XObject"),
+                    NameObject("/Subtype"): NameObject("/Image"),
+                    NameObject("/Width"): NumberObject(self.width),
+                    NameObject("/Height"): NumberObject(self.height),
+                    NameObject("/ColorSpace"): NameObject(color_space),
+                    NameObject("/BitsPerComponent"): NumberObject(8),
+                })
+                return stream.flate_encode()
+
+            alpha = self.image.getchannel("A")
+            smask = None
+            if alpha.getextrema()[0] < 255:
+                smask = image_stream(alpha.tobytes(), "/DeviceGray")
+            self._streams = (image_stream(self.image.convert("RGB").tobytes(), "/DeviceRGB"), smask)
+        return self._streams
+
+    def add_to_writer(self, writer: PdfWriter) -> IndirectObject:
+        """Add the image XObject to a writer and return the reference shared by all placements"""
+        image, smask = self._encode()
+        image = image.clone(writer)
+        if smask is not None:
+            image[NameObject("/SMask")] = writer._add_object(smask.clone(writer))
+        return writer._add_object(image)
+
+    def placements(self, boxes: list) -> list:
+        """`cm` matrices that fit the image into each (x, y, w, h) box, centred with aspect preserved"""
+        matrices = []
+        for x_pos, y_pos, box_w, box_h in boxes:
+            scale = min(box_w / self.width, box_h / self.height)
+            draw_w, draw_h = self.width * scale, self.height * scale
+            matrices.append((draw_w, 0, 0, draw_h, x_pos + (box_w - draw_w) / 2, y_pos + (box_h - draw_h) / 2))
+        return matrices
+
+
+class ParsedPDF:
+    """A source PDF parsed once and kept in memory between signatures"""
+
+    # Rough per-object overhead of pypdf's in-memory structures
+    OBJECT_OVERHEAD = 512
+
+    def __init__(self, digest: str, data: bytes):
+        self.digest = digest
+        # Raw bytes are kept for append-only (incremental update) output
+        self.data = data
+        self.reader = PdfReader(io.BytesIO(data))
+        # Walk the page tree up front: (width, height, rotation) per page
+        self.page_layout = [
+            (float(page.mediabox.width), float(page.mediabox.height), page.rotation)
+            for page in self.reader.pages
+        ]
+        self.object_count = sum(len(offsets) for offsets in self.reader.xref.values()) + len(self.reader.xref_objStm)
+        self.size = len(data) + self.object_count * self.OBJECT_OVERHEAD
+
+
+class ParsedPDFCache:
+    """
+    Size-bounded LRU of parsed source PDFs keyed by the file's SHA-256.
+
+    Documents instantiated from the same template share one entry, so the xref
+    and page tree are parsed once per unique file instead of once per signature.
+    Cached readers must be treated as read-only: pages are cloned into a
+    PdfWriter (or shallow-copied into an incremental update) before anything is
+    drawn on them. Each render worker process owns its own cache.
+    """
+
+    MAX_DIGEST_ENTRIES = 4096
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, ParsedPDF]" = OrderedDict()
+        # (path, size, mtime) -> digest, so unchanged files are not re-hashed
+        self._digests: "OrderedDict[tuple, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _digest_for(self, path: str) -> tuple:
+        st = os.stat(path)
+        stat_key = (path, st.st_size, st.st_mtime_ns)
+        digest = self._digests.get(stat_key)
+        if digest is not None:
+            self._digests.move_to_end(stat_key)
+            return digest, None
+        data = Path(path).read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        self._digests[stat_key] = digest
+        if len(self._digests) > self.MAX_DIGEST_ENTRIES:
+            self._digests.popitem(last=False)
+        return digest, data
+
+    def get(self, path: str) -> ParsedPDF:
+        """Return the parsed PDF for a file, parsing it only on a cache miss"""
+        with self._lock:
+            digest, data = self._digest_for(str(path))
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return entry
+
+            self.misses += 1
+            if data is None:
+                data = Path(path).read_bytes()
+            entry = ParsedPDF(digest, data)
+            if entry.size <= self.max_bytes:
+                self._entries[digest] = entry
+                self.current_bytes += entry.size
+                while self.current_bytes > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self.current_bytes -= evicted.size
+                    self.evictions += 1
+            return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._digests.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
 
 
 class PDFGeneratorService:
@@ -16,6 +331,9 @@ class PDFGeneratorService:
     def __init__(self, storage_path: str = "/app/signed_documents"):
         self.storage_path = Path(storage_path)
         self.storage_path.mkdir(parents=True, exist_ok=True)
+        self.parsed_pdf_cache = ParsedPDFCache(settings.PDF_PARSE_CACHE_MAX_MB * 1024 * 1024)
+        # Static certificate pages keyed by whether the signature image rendered
+        self._certificate_templates: dict = {}
     
     def generate_signed_pdf(
         self,
@@ -28,7 +346,8 @@ class PDFGeneratorService:
         original_pdf_path: Optional[str] = None,
         signature_fields: Optional[list] = None,
         ip_address: Optional[str] = None,
-        phone_number: Optional[str] = None
+        phone_number: Optional[str] = None,
+        output_mode: Optional[str] = None
     ) -> str:
         """
         Generate a signed PDF with the signature embedded on the original document.
@@ -42,6 +361,8 @@ class PDFGeneratorService:
             certificate_hash: SHA-256 certificate hash
             original_pdf_path: Optional path to the original PDF file
             signature_fields: List of signature field positions and sizes
+            output_mode: "full" rewrite or "incremental" append-only update
+                (defaults to settings.PDF_OUTPUT_MODE)
         
         Returns:
             Filepath to the signed PDF
@@ -63,157 +384,108 @@ class PDFGeneratorService:
         
         if original_pdf_path and Path(original_pdf_path).exists():
             try:
-                # Read the original PDF
-                original_reader = PdfReader(original_pdf_path)
+                # Parsed source PDF (shared across signatures of the same file)
+                parsed = self.parsed_pdf_cache.get(original_pdf_path)
                 writer = PdfWriter()
                 
-                # Decode signature image
-                signature_data = signature_base64.split(',')[1] if ',' in signature_base64 else signature_base64
-                signature_bytes = base64.b64decode(signature_data)
-                signature_image = Image.open(io.BytesIO(signature_bytes))
+                # Decode the signature once; every field and the certificate share one image XObject
+                signature_boxes = [
+                    self._field_box(field, *parsed.page_layout[field.get('page', 1) - 1][:2])
+                    for field in (signature_fields or [])
+                    if field.get('type') == 'SIGNATURE' and 0 < field.get('page', 1) <= len(parsed.page_layout)
+                ]
+                signature = SignatureAsset.from_base64(signature_base64, signature_boxes)
+                signature_ref = signature.add_to_writer(writer) if signature else None
                 
-                # Save signature to temp file
-                temp_sig = io.BytesIO()
-                signature_image.save(temp_sig, format='PNG')
-                temp_sig.seek(0)
+                incremental = (output_mode or settings.PDF_OUTPUT_MODE) == "incremental"
+                if incremental and not supports_incremental_update(parsed.reader):
+                    print(f"ℹ️ Source PDF is encrypted, rewriting instead of appending")
+                    incremental = False
                 
-                # Process each page
-                for page_num, page in enumerate(original_reader.pages):
-                    page_width = float(page.mediabox.width)
-                    page_height = float(page.mediabox.height)
-                    
-                    # Gather fields for this page
-                    page_fields = []
-                    if signature_fields:
-                        for field in signature_fields:
-                            # Frontend pages are 1-indexed, pdf pages are 0-indexed
-                            field_page = field.get('page', 1)
-                            if field_page - 1 == page_num:
-                                page_fields.append(field)
-                    
-                    if page_fields:
-                        # Create overlay with signature and text fields
-                        packet = io.BytesIO()
-                        can = canvas.Canvas(packet, pagesize=(page_width, page_height))
-                        
-                        for field in page_fields:
-                            # Convert percentage-based coordinates to PDF coordinates
-                            # Fields use percentage (0-100) from top-left
-                            # PDF uses points from bottom-left
-                            x_percent = field.get('x', 10)
-                            y_percent = field.get('y', 70)
-                            w_percent = field.get('w', 30)
-                            h_percent = field.get('h', 10)
-                            
-                            # Calculate actual positions
-                            x_pos = (x_percent / 100) * page_width
-                            y_pos = page_height - ((y_percent / 100) * page_height) - ((h_percent / 100) * page_height)
-                            width = (w_percent / 100) * page_width
-                            height = (h_percent / 100) * page_height
-                            
-                            field_type = field.get('type')
-                            
-                            if field_type == 'SIGNATURE':
-                                # Draw signature image at the field position
-                                temp_sig.seek(0)
-                                can.drawImage(
-                                    ImageReader(temp_sig),
-                                    x_pos, y_pos,
-                                    width=width,
-                                    height=height,
-                                    preserveAspectRatio=True,
-                                    mask='auto'
-                                )
-                            elif field_type in ['TEXT', 'DATE', 'TITLE']:
-                                value = field.get('value', '')
-                                if value:
-                                    font_size = field.get('fontSize', 14)
-                                    is_bold = field.get('fontWeight') == 'bold'
-                                    font_name = "Helvetica-Bold" if is_bold else "Helvetica"
-                                    
-                                    can.setFont(font_name, font_size)
-                                    can.setFillColorRGB(0, 0, 0)
-                                    
-                                    # Adjust y_pos for text (bottom-left origin, need to add height or use baseline)
-                                    text_y = y_pos + (height * 0.2)
-                                    
-                                    align = field.get('textAlign', 'left')
-                                    if align == 'center':
-                                        can.drawCentredString(x_pos + width/2, text_y, value)
-                                    elif align == 'right':
-                                        can.drawRightString(x_pos + width, text_y, value)
-                                    else:
-                                        can.drawString(x_pos, text_y, value)
-
-                            elif field_type == 'CHECKBOX':
-                                font_size = field.get('fontSize', 14)
-                                box_size = font_size + 4
-                                box_x = x_pos
-                                box_y = y_pos + (height - box_size) / 2  # vertically center in field
-
-                                is_checked = str(field.get('value', 'false')).lower() == 'true'
-
-                                if is_checked:
-                                    # Filled blue box
-                                    can.setFillColorRGB(0.22, 0.45, 0.93)  # blue-600
-                                    can.setStrokeColorRGB(0.22, 0.45, 0.93)
-                                    can.rect(box_x, box_y, box_size, box_size, fill=1, stroke=0)
-
-                                    # White checkmark using lines
-                                    can.setStrokeColorRGB(1, 1, 1)
-                                    can.setLineWidth(max(1.5, box_size * 0.12))
-                                    can.setLineCap(1)  # round
-                                    can.setLineJoin(1)  # round
-                                    # tick: short left leg then long right leg
-                                    tick_x1 = box_x + box_size * 0.18
-                                    tick_y1 = box_y + box_size * 0.45
-                                    tick_x2 = box_x + box_size * 0.38
-                                    tick_y2 = box_y + box_size * 0.22
-                                    tick_x3 = box_x + box_size * 0.80
-                                    tick_y3 = box_y + box_size * 0.72
-                                    p = can.beginPath()
-                                    p.moveTo(tick_x1, tick_y1)
-                                    p.lineTo(tick_x2, tick_y2)
-                                    p.lineTo(tick_x3, tick_y3)
-                                    can.drawPath(p, stroke=1, fill=0)
-                                else:
-                                    # Empty box outline
-                                    can.setStrokeColorRGB(0.4, 0.4, 0.4)
-                                    can.setLineWidth(1)
-                                    can.rect(box_x, box_y, box_size, box_size, fill=0, stroke=1)
-
-                                # Draw label text beside the checkbox
-                                label = field.get('label', '')
-                                if label:
-                                    can.setFont("Helvetica", font_size)
-                                    can.setFillColorRGB(0, 0, 0)
-                                    label_x = box_x + box_size + 4
-                                    label_y = box_y + (box_size - font_size) / 2 + 1
-                                    can.drawString(label_x, label_y, label)
-
-                        
-                        can.save()
-                        packet.seek(0)
-                        
-                        # Merge overlay with original page
-                        overlay_reader = PdfReader(packet)
-                        page.merge_page(overlay_reader.pages[0])
+                # Fields bucketed by page once (frontend pages are 1-indexed, pdf pages are 0-indexed)
+                fields_by_page = {}
+                for field in signature_fields or []:
+                    page_num = field.get('page', 1) - 1
+                    if 0 <= page_num < len(parsed.page_layout):
+                        fields_by_page.setdefault(page_num, []).append(field)
+                
+                # XObjects to draw per page: (ref, name, matrices)
+                page_stamps = {}
+                
+                # Text and checkbox fields of every page go into one overlay document, one page per target page
+                overlay_pages = [
+                    page_num for page_num, page_fields in sorted(fields_by_page.items())
+                    if any(field.get('type') != 'SIGNATURE' for field in page_fields)
+                ]
+                if overlay_pages:
+                    packet = io.BytesIO()
+                    can = canvas.Canvas(packet)
+                    for page_num in overlay_pages:
+                        page_width, page_height, _ = parsed.page_layout[page_num]
+                        can.setPageSize((page_width, page_height))
+                        self._draw_overlay_fields(
+                            can,
+                            [field for field in fields_by_page[page_num] if field.get('type') != 'SIGNATURE'],
+                            page_width, page_height
+                        )
+                        can.showPage()
+                    can.save()
+                    packet.seek(0)
                     
-                    writer.add_page(page)
+                    # Draw each overlay page as a form XObject on top of the original content
+                    for page_num, overlay_page in zip(overlay_pages, PdfReader(packet).pages):
+                        overlay = page_to_form_xobject(overlay_page)
+                        page_stamps.setdefault(page_num, []).append(
+                            (writer._add_object(overlay.clone(writer)), "/WzOverlay", None)
+                        )
+                
+                # Place the shared signature image in every SIGNATURE field
+                if signature_ref is not None:
+                    for page_num, page_fields in fields_by_page.items():
+                        page_width, page_height, _ = parsed.page_layout[page_num]
+                        page_signature_boxes = [
+                            self._field_box(field, page_width, page_height)
+                            for field in page_fields if field.get('type') == 'SIGNATURE'
+                        ]
+                        if page_signature_boxes:
+                            page_stamps.setdefault(page_num, []).append(
+                                (signature_ref, SIGNATURE_XOBJECT_NAME, signature.placements(page_signature_boxes))
+                            )
+                
+                if incremental:
+                    # Original bytes untouched; only stamped pages, the page tree and new objects are appended
+                    update = IncrementalUpdate(parsed.data, parsed.reader, writer)
+                    for page_num, stamps in page_stamps.items():
+                        page = update.update_page(page_num)
+                        for ref, name, matrices in stamps:
+                            stamp_xobject(writer, page, ref, name, matrices)
+                else:
+                    for page_num, page in enumerate(parsed.reader.pages):
+                        # Clone into the writer first; the cached page itself must stay untouched
+                        page = writer.add_page(page)
+                        for ref, name, matrices in page_stamps.get(page_num, ()):
+                            stamp_xobject(writer, page, ref, name, matrices)
                 
                 # Add certificate page at the end
-                cert_page = self._create_certificate_page(
-                    procedure_name, patient_name, signed_date, 
-                    certificate_hash, document_id, signature_base64,
+                certificate_page = self._add_certificate_page(
+                    writer, procedure_name, patient_name, signed_date,
+                    certificate_hash, document_id, signature, signature_ref,
                     ip_address, phone_number
                 )
-                writer.add_page(cert_page)
                 
-                # Write to output file
-                with open(filepath, 'wb') as output_file:
-                    writer.write(output_file)
+                # Write to output file (swapped in atomically; re-renders replace existing files)
+                with open(self._temp_path(filepath), 'wb') as output_file:
+                    if incremental:
+                        update.append_page(certificate_page)
+                        output_file.write(update.write())
+                    else:
+                        writer.write(output_file)
+                if not incremental:
+                    # Linearizing rewrites the file, which would defeat the append-only original
+                    linearize_pdf(str(self._temp_path(filepath)))
+                os.replace(self._temp_path(filepath), filepath)
                 
-                print(f"✅ Signed PDF generated with signature overlaid on original document: {filepath}")
+                print(f"✅ Signed PDF generated with signature overlaid on original document ({'incremental' if incremental else 'full'}): {filepath}")
                 return str(filepath)
                 
             except Exception as e:
@@ -223,39 +495,144 @@ class PDFGeneratorService:
         
         # Fallback: Create certificate-only PDF
         print(f"ℹ️ Creating certificate-only PDF (no original file stored)")
-        packet = io.BytesIO()
-        can = canvas.Canvas(packet, pagesize=letter)
-        self._draw_certificate_content(
-            can, procedure_name, patient_name, signed_date,
-            certificate_hash, document_id, signature_base64,
+        writer = PdfWriter()
+        signature = SignatureAsset.from_base64(signature_base64)
+        self._add_certificate_page(
+            writer, procedure_name, patient_name, signed_date,
+            certificate_hash, document_id, signature,
+            signature.add_to_writer(writer) if signature else None,
             ip_address, phone_number
         )
-        can.save()
-        packet.seek(0)
         
-        with open(filepath, 'wb') as f:
-            f.write(packet.read())
+        with open(self._temp_path(filepath), 'wb') as f:
+            writer.write(f)
+        os.replace(self._temp_path(filepath), filepath)
         
         print(f"✅ Signed PDF certificate generated: {filepath}")
         return str(filepath)
     
-    def _create_certificate_page(
-        self, procedure_name: str, patient_name: str, signed_date: datetime,
-        certificate_hash: str, document_id: str, signature_base64: str,
+    @staticmethod
+    def _temp_path(filepath: Path) -> Path:
+        return filepath.with_name(f"{filepath.name}.{os.getpid()}.tmp")
+    
+    @staticmethod
+    def _field_box(field: dict, page_width: float, page_height: float) -> tuple:
+        """
+        Convert a field's percentage-based box to PDF coordinates.
+        Fields use percentage (0-100) from top-left; PDF uses points from bottom-left.
+        Returns (x, y, width, height).
+        """
+        x_percent = field.get('x', 10)
+        y_percent = field.get('y', 70)
+        w_percent = field.get('w', 30)
+        h_percent = field.get('h', 10)
+        
+        x_pos = (x_percent / 100) * page_width
+        y_pos = page_height - ((y_percent / 100) * page_height) - ((h_percent / 100) * page_height)
+        width = (w_percent / 100) * page_width
+        height = (h_percent / 100) * page_height
+        return x_pos, y_pos, width, height
+    
+    def _draw_overlay_fields(self, can: canvas.Canvas, fields: list, page_width: float, page_height: float):
+        """Draw text, date, title and checkbox fields onto the current overlay page"""
+        for field in fields:
+            x_pos, y_pos, width, height = self._field_box(field, page_width, page_height)
+            field_type = field.get('type')
+
+            if field_type in ['TEXT', 'DATE', 'TITLE']:
+                value = field.get('value', '')
+                if value:
+                    font_size = field.get('fontSize', 14)
+                    is_bold = field.get('fontWeight') == 'bold'
+                    font_name = "Helvetica-Bold" if is_bold else "Helvetica"
+
+                    can.setFont(font_name, font_size)
+                    can.setFillColorRGB(0, 0, 0)
+
+                    # Adjust y_pos for text (bottom-left origin, need to add height or use baseline)
+                    text_y = y_pos + (height * 0.2)
+
+                    align = field.get('textAlign', 'left')
+                    if align == 'center':
+                        can.drawCentredString(x_pos + width/2, text_y, value)
+                    elif align == 'right':
+                        can.drawRightString(x_pos + width, text_y, value)
+                    else:
+                        can.drawString(x_pos, text_y, value)
+
+            elif field_type == 'CHECKBOX':
+                font_size = field.get('fontSize', 14)
+                box_size = font_size + 4
+                box_x = x_pos
+                box_y = y_pos + (height - box_size) / 2  # vertically center in field
+
+                is_checked = str(field.get('value', 'false')).lower() == 'true'
+
+                if is_checked:
+                    # Filled blue box
+                    can.setFillColorRGB(0.22, 0.45, 0.93)  # blue-600
+                    can.setStrokeColorRGB(0.22, 0.45, 0.93)
+                    can.rect(box_x, box_y, box_size, box_size, fill=1, stroke=0)
+
+                    # White checkmark using lines
+                    can.setStrokeColorRGB(1, 1, 1)
+                    can.setLineWidth(max(1.5, box_size * 0.12))
+                    can.setLineCap(1)  # round
+                    can.setLineJoin(1)  # round
+                    # tick: short left leg then long right leg
+                    tick_x1 = box_x + box_size * 0.18
+                    tick_y1 = box_y + box_size * 0.45
+                    tick_x2 = box_x + box_size * 0.38
+                    tick_y2 = box_y + box_size * 0.22
+                    tick_x3 = box_x + box_size * 0.80
+                    tick_y3 = box_y + box_size * 0.72
+                    p = can.beginPath()
+                    p.moveTo(tick_x1, tick_y1)
+                    p.lineTo(tick_x2, tick_y2)
+                    p.lineTo(tick_x3, tick_y3)
+                    can.drawPath(p, stroke=1, fill=0)
+                else:
+                    # Empty box outline
+                    can.setStrokeColorRGB(0.4, 0.4, 0.4)
+                    can.setLineWidth(1)
+                    can.rect(box_x, box_y, box_size, box_size, fill=0, stroke=1)
+
+                # Draw label text beside the checkbox
+                label = field.get('label', '')
+                if label:
+                    can.setFont("Helvetica", font_size)
+                    can.setFillColorRGB(0, 0, 0)
+                    label_x = box_x + box_size + 4
+                    label_y = box_y + (box_size - font_size) / 2 + 1
+                    can.drawString(label_x, label_y, label)
+    
+    def _add_certificate_page(
+        self, writer: PdfWriter, procedure_name: str, patient_name: str,
+        signed_date: datetime, certificate_hash: str, document_id: str,
+        signature: Optional["SignatureAsset"], signature_ref: Optional[IndirectObject],
         ip_address: Optional[str] = None, phone_number: Optional[str] = None
-    ):
-        """Create a certificate page as a PdfReader page"""
+    ) -> PageObject:
+        """Append the certificate page: per-signature fields over the cached static template"""
+        signature_rendered = signature_ref is not None
+        
         packet = io.BytesIO()
         can = canvas.Canvas(packet, pagesize=letter)
-        self._draw_certificate_content(
+        self._draw_certificate_fields(
             can, procedure_name, patient_name, signed_date,
-            certificate_hash, document_id, signature_base64,
+            certificate_hash, document_id, signature_rendered,
             ip_address, phone_number
         )
         can.save()
         packet.seek(0)
-        reader = PdfReader(packet)
-        return reader.pages[0]
+        
+        page = writer.add_page(PdfReader(packet).pages[0])
+        template = self._certificate_template(signature_rendered)
+        template_ref = writer._add_object(template.clone(writer))
+        stamp_xobject(writer, page, template_ref, "/WzCertTemplate", under=True)
+        if signature_rendered:
+            box = self._certificate_layout(True)["signature_box"]
+            stamp_xobject(writer, page, signature_ref, SIGNATURE_XOBJECT_NAME, signature.placements([box]))
+        return page
     
     def _create_certificate_page_canvas(
         self, procedure_name: str, patient_name: str, signed_date: datetime,
@@ -274,6 +651,46 @@ class PDFGeneratorService:
         packet.seek(0)
         return packet
     
+    def _certificate_template(self, signature_rendered: bool) -> StreamObject:
+        """Static certificate layout as a Form XObject, rendered once per process and reused"""
+        template = self._certificate_templates.get(signature_rendered)
+        if template is None:
+            packet = io.BytesIO()
+            can = canvas.Canvas(packet, pagesize=letter)
+            self._draw_certificate_static(can, signature_rendered)
+            can.save()
+            packet.seek(0)
+            template = page_to_form_xobject(PdfReader(packet).pages[0])
+            self._certificate_templates[signature_rendered] = template
+        return template
+    
+    @staticmethod
+    def _certificate_layout(signature_rendered: bool) -> dict:
+        """Baselines shared by the static template and the per-signature overlay"""
+        y = letter[1] - 110
+        layout = {"details_heading": y}
+        y -= 20
+        layout["details"] = y
+        y -= 16 * len(CERTIFICATE_DETAIL_LABELS)
+        y -= 10
+        layout["signature_heading"] = y
+        y -= 10
+        layout["signature"] = y
+        sig_width, sig_height = CERTIFICATE_SIGNATURE_SIZE
+        layout["signature_box"] = ((letter[0] - sig_width) / 2, y - sig_height - 5, sig_width, sig_height)
+        y -= 115 if signature_rendered else 30
+        y -= 10
+        layout["hash_heading"] = y
+        y -= 18
+        layout["hash"] = y
+        y -= 12 + 18
+        layout["hash_note"] = y
+        y -= 35
+        layout["declaration_heading"] = y
+        y -= 18
+        layout["declaration"] = y
+        return layout
+    
     def _draw_certificate_content(
         self, can: canvas.Canvas, procedure_name: str, patient_name: str,
         signed_date: datetime, certificate_hash: str, document_id: str,
@@ -281,12 +698,22 @@ class PDFGeneratorService:
         phone_number: Optional[str] = None
     ):
         """Draw certificate content on a canvas — Section 63/65B (BSA 2023) compliant"""
-        from datetime import timezone, timedelta
+        signature = SignatureAsset.from_base64(signature_base64)
+        signature_rendered = signature is not None
+        self._draw_certificate_static(can, signature_rendered)
+        self._draw_certificate_fields(
+            can, procedure_name, patient_name, signed_date,
+            certificate_hash, document_id, signature_rendered,
+            ip_address, phone_number
+        )
+        if signature_rendered:
+            x_pos, y_pos, sig_width, sig_height = self._certificate_layout(True)["signature_box"]
+            can.drawImage(ImageReader(signature.image), x_pos, y_pos, width=sig_width, height=sig_height, preserveAspectRatio=True, mask='auto')
+    
+    def _draw_certificate_static(self, can: canvas.Canvas, signature_rendered: bool):
+        """Draw the parts of the certificate that are identical for every signature"""
         width, height = letter
-        IST = timezone(timedelta(hours=5, minutes=30))
-        ist_signed = signed_date.replace(tzinfo=timezone.utc).astimezone(IST) if signed_date.tzinfo is None else signed_date.astimezone(IST)
-        ist_str = ist_signed.strftime('%d-%m-%Y %H:%M:%S IST')
-        ist_generated = datetime.now(IST).strftime('%d-%m-%Y %H:%M:%S IST')
+        layout = self._certificate_layout(signature_rendered)
         
         # ─── Header ───
         can.setStrokeColorRGB(0.15, 0.25, 0.55)
@@ -303,120 +730,119 @@ class PDFGeneratorService:
         can.drawCentredString(width / 2, height - 80, "Read with Section 3A of the Information Technology Act, 2000")
         
         # ─── Document Details ───
-        y = height - 110
+        y = layout["details_heading"]
         can.setFillColorRGB(0, 0, 0)
         can.setFont("Helvetica-Bold", 11)
         can.drawString(50, y, "1. DOCUMENT DETAILS")
         can.setLineWidth(0.5)
         can.line(50, y - 3, width - 50, y - 3)
         
-        y -= 20
-        details = [
-            ("Document:", procedure_name),
-            ("Signed by:", patient_name),
-            ("Date & Time (IST):", ist_str),
-            ("IP Address:", ip_address or "Not captured"),
-            ("Verified Phone:", phone_number or "Not captured"),
-            ("Document ID:", document_id),
-        ]
-        for label, value in details:
-            can.setFont("Helvetica-Bold", 9)
+        y = layout["details"]
+        can.setFont("Helvetica-Bold", 9)
+        for label in CERTIFICATE_DETAIL_LABELS:
             can.drawString(60, y, label)
-            can.setFont("Helvetica", 9)
-            can.drawString(190, y, str(value))
             y -= 16
         
         # ─── Signature ───
-        y -= 10
+        y = layout["signature_heading"]
         can.setFont("Helvetica-Bold", 11)
         can.drawString(50, y, "2. ELECTRONIC SIGNATURE")
         can.line(50, y - 3, width - 50, y - 3)
-        y -= 10
-        
-        try:
-            signature_data = signature_base64.split(',')[1] if ',' in signature_base64 else signature_base64
-            signature_bytes = base64.b64decode(signature_data)
-            signature_image = Image.open(io.BytesIO(signature_bytes))
-            temp_sig = io.BytesIO()
-            signature_image.save(temp_sig, format='PNG')
-            temp_sig.seek(0)
-            sig_width, sig_height = 250, 100
-            x_pos = (width - sig_width) / 2
-            can.drawImage(ImageReader(temp_sig), x_pos, y - sig_height - 5, width=sig_width, height=sig_height, preserveAspectRatio=True, mask='auto')
-            y -= sig_height + 15
-        except Exception as e:
-            print(f"⚠️ Error adding signature image: {e}")
-            can.setFont("Helvetica", 9)
-            can.drawString(60, y - 20, "[Signature image could not be rendered]")
-            y -= 30
         
         # ─── Cryptographic Hash ───
-        y -= 10
+        y = layout["hash_heading"]
         can.setFont("Helvetica-Bold", 11)
-        can.setFillColorRGB(0, 0, 0)
         can.drawString(50, y, "3. CRYPTOGRAPHIC VERIFICATION")
         can.line(50, y - 3, width - 50, y - 3)
-        y -= 18
         can.setFont("Helvetica-Bold", 9)
-        can.drawString(60, y, "SHA-256 Hash:")
-        can.setFont("Courier", 7)
-        can.drawString(160, y, certificate_hash[:32])
-        y -= 12
-        can.drawString(160, y, certificate_hash[32:])
-        y -= 18
+        can.drawString(60, layout["hash"], "SHA-256 Hash:")
+        y = layout["hash_note"]
         can.setFont("Helvetica", 8)
         can.setFillColorRGB(0.3, 0.3, 0.3)
         can.drawString(60, y, "This hash uniquely identifies the document contents at the time of signing.")
         can.drawString(60, y - 11, "Any modification to this document will produce a different hash, proving tampering.")
         
         # ─── Section 65B Declaration ───
-        y -= 35
+        y = layout["declaration_heading"]
         can.setFillColorRGB(0, 0, 0)
         can.setFont("Helvetica-Bold", 11)
         can.drawString(50, y, "4. CERTIFICATE UNDER SECTION 65B, BSA 2023")
         can.line(50, y - 3, width - 50, y - 3)
-        y -= 18
-        
-        # Draw bordered declaration box
-        decl_lines = [
-            "I hereby certify that:",
-            "",
-            "(a) This electronic record was produced by the WizeSign system during the ordinary",
-            "    course of its regular operation, for the purpose of recording medical consent.",
-            "",
-            "(b) The information contained in this electronic record was supplied to the system",
-            "    in the ordinary course of its operation by the person named above.",
-            "",
-            "(c) At the time of creation of this electronic record, the computer system was",
-            "    operating properly and was not subject to any defect or malfunction.",
-            "",
-            "(d) The electronic record faithfully and accurately reproduces the information",
-            "    supplied to it, including the electronic signature.",
-            "",
-            f"Certificate generated on: {ist_generated}",
-            f"System: WizeSign Electronic Consent Platform",
-        ]
+        y = layout["declaration"]
         
-        box_height = len(decl_lines) * 11 + 10
+        # Draw bordered declaration box (the generated-on line is filled in per signature)
+        line_count = len(CERTIFICATE_DECLARATION) + 2
+        box_height = line_count * 11 + 10
         can.setStrokeColorRGB(0.5, 0.5, 0.5)
         can.setLineWidth(0.5)
         can.rect(55, y - box_height - 2, width - 110, box_height + 5, stroke=1, fill=0)
         
         can.setFont("Helvetica", 8)
         can.setFillColorRGB(0.1, 0.1, 0.1)
-        for line in decl_lines:
+        for line in CERTIFICATE_DECLARATION:
             can.drawString(65, y, line)
             y -= 11
+        y -= 11  # Certificate generated on: ...
+        can.drawString(65, y, "System: WizeSign Electronic Consent Platform")
         
         # ─── Footer ───
         can.setFont("Helvetica", 7)
         can.setFillColorRGB(0.5, 0.5, 0.5)
-        can.drawString(50, 50, f"Document ID: {document_id}")
-        can.drawString(50, 40, f"Generated: {ist_generated}")
         can.drawString(50, 30, "This certificate is auto-generated and does not require a physical signature.")
         can.drawRightString(width - 50, 50, "Powered by WizeSign")
         can.drawRightString(width - 50, 40, "Compliant with IT Act 2000 & BSA 2023")
     
+    def _draw_certificate_fields(
+        self, can: canvas.Canvas, procedure_name: str, patient_name: str,
+        signed_date: datetime, certificate_hash: str, document_id: str,
+        signature_rendered: bool, ip_address: Optional[str] = None,
+        phone_number: Optional[str] = None
+    ):
+        """Draw the per-signature text on top of the static certificate template (the image is stamped separately)"""
+        from datetime import timezone, timedelta
+        layout = self._certificate_layout(signature_rendered)
+        IST = timezone(timedelta(hours=5, minutes=30))
+        ist_signed = signed_date.replace(tzinfo=timezone.utc).astimezone(IST) if signed_date.tzinfo is None else signed_date.astimezone(IST)
+        ist_str = ist_signed.strftime('%d-%m-%Y %H:%M:%S IST')
+        ist_generated = datetime.now(IST).strftime('%d-%m-%Y %H:%M:%S IST')
+        
+        # ─── Document Details ───
+        y = layout["details"]
+        values = [
+            procedure_name,
+            patient_name,
+            ist_str,
+            ip_address or "Not captured",
+            phone_number or "Not captured",
+            document_id,
+        ]
+        can.setFillColorRGB(0, 0, 0)
+        can.setFont("Helvetica", 9)
+        for value in values:
+            can.drawString(190, y, str(value))
+            y -= 16
+        
+        # ─── Signature ───
+        if not signature_rendered:
+            can.drawString(60, layout["signature"] - 20, "[Signature image could not be rendered]")
+        
+        # ─── Cryptographic Hash ───
+        y = layout["hash"]
+        can.setFont("Courier", 7)
+        can.drawString(160, y, certificate_hash[:32])
+        can.drawString(160, y - 12, certificate_hash[32:])
+        
+        # ─── Section 65B Declaration ───
+        can.setFont("Helvetica", 8)
+        can.setFillColorRGB(0.1, 0.1, 0.1)
+        can.drawString(65, layout["declaration"] - len(CERTIFICATE_DECLARATION) * 11, f"Certificate generated on: {ist_generated}")
+        
+        # ─── Footer ───
+        can.setFont("Helvetica", 7)
+        can.setFillColorRGB(0.5, 0.5, 0.5)
+        can.drawString(50, 50, f"Document ID: {document_id}")
+        can.drawString(50, 40, f"Generated: {ist_generated}")
+    
     def get_download_path(self, document_id: str) -> Optional[Path]:
         """Get the path to a signed PDF if it exists"""
         filename = f"signed_{document_id}.pdf"
@@ -426,3 +852,116 @@ class PDFGeneratorService:
 
 # Singleton instance
 pdf_generator_service = PDFGeneratorService()
+
+
+class RenderQueueFullError(Exception):
+    """Raised when the render engine has no free queue slots left"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("PDF render queue is full")
+        self.retry_after = retry_after
+
+
+def _generate_signed_pdf_job(kwargs: dict) -> str:
+    """Entry point executed inside a pool worker process"""
+    return pdf_generator_service.generate_signed_pdf(**kwargs)
+
+
+class PDFRenderEngine:
+    """
+    Bounded process pool that runs CPU-heavy PDF rendering off the event loop.
+
+    At most `max_workers` jobs run at once and at most `max_queue` more may wait
+    for a free worker. Submissions beyond that raise RenderQueueFullError so the
+    API can shed load with a 503 instead of stalling every request on the worker.
+    """
+
+    def __init__(self, max_workers: int = 2, max_queue: int = 16, retry_after: int = 5):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = retry_after
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        """Jobs currently running or waiting in the pool"""
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        """Jobs waiting for a free worker process"""
+        return max(0, self._in_flight - self.max_workers)
+
+    def start(self):
+        """Create the worker pool (idempotent; also done lazily on first submit)"""
+        if self._executor is None:
+            # spawn keeps children clear of the parent's event loop, sockets and threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+
+    def shutdown(self, wait: bool = True):
+        """Stop the pool, cancelling jobs that have not started yet"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+    def _release(self, _future):
+        with self._lock:
+            self._in_flight -= 1
+
+    async def submit(self, fn: Callable[..., Any], *args) -> Any:
+        """Run a picklable module-level function in the pool and await its result"""
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                raise RenderQueueFullError(self.retry_after)
+            self._in_flight += 1
+        try:
+            self.start()
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        # Release the slot when the process finishes, even if the awaiting request was cancelled
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    async def generate_signed_pdf(self, **kwargs) -> str:
+        """Awaitable variant of PDFGeneratorService.generate_signed_pdf"""
+        return await self.submit(_generate_signed_pdf_job, kwargs)
+
+    async def linearize_pdf(self, path: str) -> bool:
+        """
+        Linearize a stored original in the pool. Best effort: an upload is never
+        rejected because the pool is saturated, the file is just kept as is.
+        """
+        try:
+            return await self.submit(linearize_pdf, str(path))
+        except RenderQueueFullError:
+            print(f"ℹ️ Render pool saturated, storing {path} without linearization")
+            return False
+
+    async def render_previews(self, path: str) -> int:
+        """
+        Pre-render page previews in the pool. Best effort (meant for background
+        tasks): previews that are missing get rendered on first request.
+        """
+        try:
+            return await self.submit(render_previews, str(path))
+        except RenderQueueFullError:
+            print(f"ℹ️ Render pool saturated, previews for {path} will be rendered on demand")
+        except Exception as e:
+            print(f"⚠️ Error rendering previews for {path}: {e}")
+        return 0
+
+
+# Shared engine, started lazily and shut down from the FastAPI lifespan
+pdf_render_engine = PDFRenderEngine(
+    max_workers=settings.PDF_RENDER_WORKERS,
+    max_queue=settings.PDF_RENDER_MAX_QUEUE,
+    retry_after=settings.PDF_RENDER_RETRY_AFTER
+)
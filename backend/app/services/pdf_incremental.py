@@ -0,0 +1,272 @@
+"""
+Append-only (incremental update) output for signed PDFs.
+
+Instead of rewriting every object of the source document, the signed PDF is the
+original file byte-for-byte followed by an update section (PDF 32000-1, 7.5.6)
+that holds only what signing adds:
+
+- the new objects (overlay forms, the shared signature image, the certificate
+  page and its resources), built in a scratch PdfWriter by the normal code paths
+- new revisions of the pages that received stamps and of the root page tree
+  node (which gains the certificate page), keeping their original object numbers
+- a cross-reference section pointing back to the original one via /Prev
+
+Write cost is proportional to the stamps, not to the size of the document, and
+the original byte range is preserved so its hash can be verified independently
+of the signed output.
+"""
+import io
+import re
+import zlib
+from functools import lru_cache
+from typing import Callable, Dict, List
+
+from pypdf import PdfReader, PdfWriter, PageObject
+from pypdf.generic import (
+    ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject,
+    StreamObject
+)
+
+
+_STARTXREF_RE = re.compile(rb"startxref\s+(\d+)")
+
+
+@lru_cache(maxsize=None)
+def _kind(cls: type) -> str:
+    """
+    Classify a pypdf object class for serialization.
+
+    pypdf objects derive from a typing.Protocol, which makes every isinstance()
+    check against them slow; the class hierarchy is looked up once instead.
+    """
+    for base, kind in (
+        (IndirectObject, "ref"), (StreamObject, "stream"),
+        (DictionaryObject, "dict"), (ArrayObject, "array"),
+    ):
+        if base in cls.__mro__:
+            return kind
+    return "other"
+
+
+def original_startxref(data: bytes) -> int:
+    """Offset of the last cross-reference section of a PDF file"""
+    matches = list(_STARTXREF_RE.finditer(data, max(0, len(data) - 2048)))
+    if not matches:
+        raise ValueError("startxref not found")
+    return int(matches[-1].group(1))
+
+
+def supports_incremental_update(reader: PdfReader) -> bool:
+    """Encrypted sources would need every new string/stream encrypted; rewrite those instead"""
+    return not reader.is_encrypted
+
+
+class IncrementalUpdate:
+    """
+    Collects object revisions for one incremental update of `original`.
+
+    New objects live in `scratch` (any PdfWriter) and are renumbered after the
+    original's highest object number when written; objects of the original
+    keep their numbers and are only written when passed to `update_object`.
+    """
+
+    def __init__(self, original: bytes, reader: PdfReader, scratch: PdfWriter):
+        self.original = original
+        self.reader = reader
+        self.scratch = scratch
+        self._updated: Dict[int, tuple] = {}
+        self._new_pages: List[IndirectObject] = []
+
+    def update_object(self, ref: IndirectObject, obj):
+        """Write a new revision of an object of the original document"""
+        self._updated[ref.idnum] = (ref.generation, obj)
+
+    def update_page(self, page_index: int) -> DictionaryObject:
+        """
+        Return a new revision of an original page for stamping.
+
+        The copy is shallow: content streams and resources still refer to the
+        original objects, so stamp_xobject can wrap them without copying.
+        """
+        page = self.reader.pages[page_index]
+        revision = PageObject(self.scratch)
+        revision.update(page)
+        self.update_object(page.indirect_reference, revision)
+        return revision
+
+    def append_page(self, page: PageObject):
+        """Append a page built in the scratch writer to the end of the document"""
+        self._new_pages.append(page.indirect_reference)
+
+    def _page_tree_revision(self):
+        if not self._new_pages:
+            return
+        root = self.reader.trailer["/Root"].get_object()
+        pages_ref = root.raw_get("/Pages")
+        pages = DictionaryObject(pages_ref.get_object())
+        kids = ArrayObject(pages["/Kids"].get_object())
+        for page_ref in self._new_pages:
+            page_ref.get_object()[NameObject("/Parent")] = pages_ref
+            kids.append(page_ref)
+        pages[NameObject("/Kids")] = kids
+        pages[NameObject("/Count")] = NumberObject(pages["/Count"] + len(self._new_pages))
+        self.update_object(pages_ref, pages)
+
+    def _is_new(self, ref: IndirectObject) -> bool:
+        return ref.pdf is self.scratch
+
+    def _collect_new(self) -> List[int]:
+        """Scratch objects reachable from the updated objects, in discovery order"""
+        found: Dict[int, None] = {}
+        stack = [obj for _, obj in self._updated.values()]
+        while stack:
+            obj = stack.pop()
+            kind = _kind(type(obj))
+            if kind == "ref":
+                if not self._is_new(obj) or obj.idnum in found:
+                    continue  # Objects of the original are already in the file
+                found[obj.idnum] = None
+                stack.append(obj.get_object())
+            elif kind in ("dict", "stream"):
+                stack.extend(obj.values())
+            elif kind == "array":
+                stack.extend(obj)
+        return list(found)
+
+    def write(self) -> bytes:
+        """Return the original bytes followed by the update section"""
+        self._page_tree_revision()
+
+        trailer = self.reader.trailer
+        known = list(self.reader.xref_objStm)
+        for entries in self.reader.xref.values():
+            known.extend(entries)
+        next_number = max([int(trailer.get("/Size", 0))] + [idnum + 1 for idnum in known])
+
+        numbers = {}
+        for idnum in self._collect_new():
+            numbers[idnum] = next_number
+            next_number += 1
+
+        def ref_number(ref: IndirectObject) -> str:
+            if self._is_new(ref):
+                return f"{numbers[ref.idnum]} 0 R"
+            return f"{ref.idnum} {ref.generation} R"
+
+        out = io.BytesIO()
+        out.write(self.original)
+        if not self.original.endswith((b"\n", b"\r")):
+            out.write(b"\n")
+
+        offsets = {}
+        objects = [(idnum, generation, obj) for idnum, (generation, obj) in self._updated.items()]
+        objects += [(numbers[idnum], 0, self.scratch.get_object(idnum)) for idnum in numbers]
+        for idnum, generation, obj in objects:
+            offsets[idnum] = (out.tell(), generation)
+            out.write(f"{idnum} {generation} obj\n".encode())
+            _write_object(obj, out, ref_number)
+            out.write(b"\nendobj\n")
+
+        prev = original_startxref(self.original)
+        trailer_entries = DictionaryObject({
+            NameObject("/Root"): trailer.raw_get("/Root"),
+            NameObject("/Prev"): NumberObject(prev),
+        })
+        for key in ("/Info", "/ID"):
+            if key in trailer:
+                trailer_entries[NameObject(key)] = trailer.raw_get(key)
+
+        # Match the original's cross-reference format: readers that predate
+        # xref streams must still see a classic table.
+        if self.original[prev:prev + 4] == b"xref":
+            _write_xref_table(out, offsets, next_number, trailer_entries, ref_number)
+        else:
+            _write_xref_stream(out, offsets, next_number, trailer_entries, ref_number)
+        return out.getvalue()
+
+
+def _write_object(obj, out: io.BytesIO, ref_number: Callable[[IndirectObject], str]):
+    """Serialize an object, renumbering references to scratch objects"""
+    kind = _kind(type(obj))
+    if kind == "ref":
+        out.write(ref_number(obj).encode())
+    elif kind == "stream":
+        data = obj._data
+        entries = DictionaryObject(obj)
+        entries[NameObject("/Length")] = NumberObject(len(data))
+        _write_object(entries, out, ref_number)
+        out.write(b"\nstream\n")
+        out.write(data)
+        out.write(b"\nendstream")
+    elif kind == "dict":
+        out.write(b"<<\n")
+        for key, value in obj.items():
+            key.write_to_stream(out)
+            out.write(b" ")
+            _write_object(value, out, ref_number)
+            out.write(b"\n")
+        out.write(b">>")
+    elif kind == "array":
+        out.write(b"[")
+        for value in obj:
+            out.write(b" ")
+            _write_object(value, out, ref_number)
+        out.write(b" ]")
+    else:
+        obj.write_to_stream(out)
+
+
+def _subsections(numbers: List[int]) -> List[List[int]]:
+    sections: List[List[int]] = []
+    for idnum in sorted(numbers):
+        if sections and sections[-1][-1] + 1 == idnum:
+            sections[-1].append(idnum)
+        else:
+            sections.append([idnum])
+    return sections
+
+
+def _write_xref_table(out, offsets: dict, size: int, trailer: DictionaryObject, ref_number):
+    xref_offset = out.tell()
+    # Head of the free list first; some readers treat a table not starting at 0 as misnumbered
+    out.write(b"xref\n0 1\n0000000000 65535 f\r\n")
+    for section in _subsections(list(offsets)):
+        out.write(f"{section[0]} {len(section)}\n".encode())
+        for idnum in section:
+            offset, generation = offsets[idnum]
+            out.write(f"{offset:010d} {generation:05d} n\r\n".encode())
+    trailer[NameObject("/Size")] = NumberObject(size)
+    out.write(b"trailer\n")
+    _write_object(trailer, out, ref_number)
+    out.write(f"\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+
+
+def _write_xref_stream(out, offsets: dict, size: int, trailer: DictionaryObject, ref_number):
+    # The xref stream is itself an object of the update
+    xref_number = size
+    xref_offset = out.tell()
+    offsets = dict(offsets)
+    offsets[xref_number] = (xref_offset, 0)
+
+    index = ArrayObject()
+    rows = bytearray()
+    for section in _subsections(list(offsets)):
+        index.extend([NumberObject(section[0]), NumberObject(len(section))])
+        for idnum in section:
+            offset, generation = offsets[idnum]
+            rows += b"\x01" + offset.to_bytes(4, "big") + generation.to_bytes(2, "big")
+    data = zlib.compress(bytes(rows))
+
+    trailer.update({
+        NameObject("/Type"): NameObject("/XRef"),
+        NameObject("/Size"): NumberObject(size + 1),
+        NameObject("/Index"): index,
+        NameObject("/W"): ArrayObject([NumberObject(1), NumberObject(4), NumberObject(2)]),
+        NameObject("/Filter"): NameObject("/FlateDecode"),
+        NameObject("/Length"): NumberObject(len(data)),
+    })
+    out.write(f"{xref_number} 0 obj\n".encode())
+    _write_object(trailer, out, ref_number)
+    out.write(b"\nstream\n")
+    out.write(data)
+    out.write(f"\nendstream\nendobj\nstartxref\n{xref_offset}\n%%EOF\n".encode())
@@ -0,0 +1,37 @@
+"""
+Linearization ("fast web view") of stored PDFs.
+
+A linearized PDF starts with the first page's objects and a hint table, so a
+range-capable viewer such as pdf.js can render page 1 after fetching only the
+head of the file. Requires pikepdf (qpdf); without it files are served as stored.
+"""
+from app.config import settings
+
+try:
+    import pikepdf
+except ImportError:  # Optional dependency: PDFs are stored as uploaded/generated
+    pikepdf = None
+
+
+def linearization_available() -> bool:
+    return pikepdf is not None and settings.PDF_LINEARIZE
+
+
+def linearize_pdf(path: str) -> bool:
+    """
+    Rewrite a PDF file in place as linearized. Returns True if it was rewritten.
+
+    Never raises: a file that cannot be linearized is left untouched.
+    """
+    if not linearization_available():
+        return False
+    try:
+        with pikepdf.open(path, allow_overwriting_input=True) as pdf:
+            if pdf.is_linearized:
+                return False
+            # pikepdf writes to a temporary file and swaps it in
+            pdf.save(path, linearize=True)
+        return True
+    except Exception as e:
+        print(f"⚠️ Could not linearize {path}: {e}")
+        return False
@@ -0,0 +1,171 @@
+"""
+Per-request database cost: statements, round trips and time spent in the
+database, counted by SQLAlchemy engine event hooks into a context variable
+that QueryStatsMiddleware sets for every request.
+
+The totals go out as a Server-Timing header (visible in the browser's network
+panel) and as per-route counters on /metrics. ROUTE_BUDGETS declares how many
+round trips each route may use; test_db_budgets.py fails when a route goes over
+(or has no budget), and in production going over is counted in
+wizesign_http_db_budget_exceeded_total.
+
+A round trip is a statement execution (a multi-row INSERT batch counts once) or
+a BEGIN / COMMIT / ROLLBACK. Database time is the time spent executing
+statements; transaction control is counted but not timed.
+"""
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.services.metrics import metrics
+
+# Round trips allowed per request, by route name (the endpoint function name).
+# Keep them tight: raise one deliberately, in the change that needs it.
+ROUTE_BUDGETS = {
+    # auth
+    "login": 3,
+    "validate_sso_token": 12,
+    "wizeflow_sso_login": 9,
+    "read_users_me": 3,
+    "generate_test_token": 0,
+    # documents
+    "upload_document_file": 5,
+    "create_document_for_patient": 16,
+    "bulk_create_documents": 11,
+    "get_document_by_token": 11,  # First view; cached reloads use none
+    "update_document_fields": 6,
+    "submit_signature": 14,
+    "download_signed_document": 4,
+    "download_original_document": 3,
+    "get_page_preview": 3,
+    "send_otp": 7,
+    "verify_otp": 4,
+    "get_document_by_id": 7,
+    "list_documents": 8,  # With a search: statement_timeout + patient lookup
+    "send_document_via_whatsapp": 7,
+    # templates
+    "create_template": 13,
+    "list_templates": 4,
+    "get_template": 4,
+    "update_template": 8,
+    "delete_template": 6,
+    "download_template_file": 4,
+    # hospitals
+    "get_my_hospital": 4,
+    "update_hospital_settings": 8,
+    "get_wizechat_status": 4,
+    "check_wizechat_connection": 4,
+    # superadmin
+    "get_dashboard_stats": 9,
+    "list_hospitals": 4,
+    "list_all_users": 4,
+}
+
+statements_total = metrics.counter("wizesign_http_db_statements_total", "SQL statements executed by API requests, by route")
+round_trips_total = metrics.counter("wizesign_http_db_round_trips_total", "Database round trips of API requests, by route")
+db_seconds_total = metrics.counter("wizesign_http_db_seconds_total", "Time API requests spent executing SQL, by route")
+requests_total = metrics.counter("wizesign_http_db_requests_total", "API requests counted in the wizesign_http_db_* totals, by route")
+budget_exceeded_total = metrics.counter(
+    "wizesign_http_db_budget_exceeded_total", "API requests that used more round trips than ROUTE_BUDGETS allows, by route"
+)
+
+
+class QueryStats:
+    """Database cost of one request"""
+
+    __slots__ = ("statements", "round_trips", "db_time")
+
+    def __init__(self):
+        self.statements = 0
+        self.round_trips = 0
+        self.db_time = 0.0
+
+    def server_timing(self) -> str:
+        return (
+            f'db;dur={self.db_time * 1000:.1f};desc="DB", '
+            f'db-round-trips;desc="{self.round_trips}", '
+            f'db-statements;desc="{self.statements}"'
+        )
+
+
+# Set per request by the middleware; the engine hooks run in the request's context
+current_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_stats_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_stats_started"].pop()
+    stats = current_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.round_trips += 1
+        stats.db_time += time.perf_counter() - started
+
+
+def _transaction_control(conn):
+    stats = current_stats.get()
+    if stats is not None:
+        stats.round_trips += 1
+
+
+def _handle_error(exception_context):
+    # The statement failed, so after_cursor_execute doesn't run
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_stats_started"):
+        connection.info["query_stats_started"].pop()
+        stats = current_stats.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.round_trips += 1
+
+
+def instrument(engine: Engine):
+    """Install the counting hooks on an engine (the sync_engine of an AsyncEngine)"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+    for name in ("begin", "commit", "rollback"):
+        event.listen(engine, name, _transaction_control)
+
+
+class QueryStatsMiddleware:
+    """Pure ASGI middleware (streamed file responses pass through untouched)"""
+
+    def __init__(self, app, server_timing: bool = True):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = current_stats.set(stats)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and self.server_timing:
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", stats.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_stats.reset(token)
+            route = scope.get("route")
+            name = getattr(route, "name", None)
+            if name in ROUTE_BUDGETS:
+                statements_total.inc(stats.statements, route=name)
+                round_trips_total.inc(stats.round_trips, route=name)
+                db_seconds_total.inc(stats.db_time, route=name)
+                requests_total.inc(route=name)
+                if stats.round_trips > ROUTE_BUDGETS[name]:
+                    budget_exceeded_total.inc(route=name)
@@ -0,0 +1,84 @@
+"""
+Document search for GET /api/documents/?search=: procedure name, doctor name,
+patient name and patient email, ranked by pg_trgm word similarity.
+
+Each searched column has a pg_trgm GIN index, so ILIKE '%term%' is an index
+scan for terms of three or more characters. The matching patients are fetched
+first and the documents are then filtered on patient_id. That keeps the
+document filter an OR of indexed conditions on the documents table alone;
+a condition on the joined patients would make Postgres read every document of
+the hospital.
+
+Search queries run with a statement_timeout of SEARCH_STATEMENT_TIMEOUT_MS; a
+search that runs into it is answered with 503 instead of holding a connection.
+"""
+from contextlib import asynccontextmanager
+from typing import Tuple
+import uuid
+
+from fastapi import HTTPException, status
+from sqlalchemy import select, func, or_, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.config import settings
+from app.models import Document, Patient
+
+MAX_PATIENT_IDS = 1000  # More matching patients than this are filtered with a subquery instead
+QUERY_CANCELED = "57014"  # SQLSTATE of a statement cancelled by statement_timeout
+
+
+def like_pattern(term: str) -> str:
+    """%term% with the LIKE wildcards in term escaped (use with escape='\\')"""
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+@asynccontextmanager
+async def search_time_limit(db: AsyncSession):
+    """Cancel the statements of this transaction after SEARCH_STATEMENT_TIMEOUT_MS"""
+    await db.execute(
+        text("SELECT set_config('statement_timeout', :timeout, true)"),
+        {"timeout": f"{settings.SEARCH_STATEMENT_TIMEOUT_MS}ms"}
+    )
+    try:
+        yield
+    except DBAPIError as e:
+        if getattr(e.orig, "sqlstate", None) != QUERY_CANCELED:
+            raise
+        print(f"⚠️ Document search cancelled after {settings.SEARCH_STATEMENT_TIMEOUT_MS} ms")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Search took too long. Please use a more specific search term."
+        )
+
+
+async def document_search(db: AsyncSession, hospital_id: uuid.UUID, term: str) -> Tuple[ColumnElement, ColumnElement]:
+    """
+    (condition, rank) for the documents of hospital_id matching term. rank
+    refers to Patient columns, so the query must join Document.patient.
+    """
+    pattern = like_pattern(term)
+    patient_match = (Patient.hospital_id == hospital_id) & or_(
+        Patient.full_name.ilike(pattern, escape="\\"),
+        Patient.email.ilike(pattern, escape="\\"),
+    )
+    result = await db.execute(select(Patient.id).where(patient_match).limit(MAX_PATIENT_IDS + 1))
+    patient_ids = result.scalars().all()
+    if len(patient_ids) > MAX_PATIENT_IDS:
+        by_patient = Document.patient_id.in_(select(Patient.id).where(patient_match))
+    else:
+        by_patient = Document.patient_id.in_(patient_ids)
+
+    condition = or_(
+        Document.procedure_name.ilike(pattern, escape="\\"),
+        Document.doctor_name.ilike(pattern, escape="\\"),
+        by_patient,
+    )
+    # greatest() skips the NULLs of missing doctor names and emails
+    rank = func.greatest(*[
+        func.word_similarity(term, column)
+        for column in (Document.procedure_name, Document.doctor_name, Patient.full_name, Patient.email)
+    ])
+    return condition, rank
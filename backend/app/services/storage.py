@@ -0,0 +1,464 @@
+"""
+Storage of uploaded PDFs and images.
+
+Create/update endpoints accept either the old JSON body (file as base64) or
+multipart/form-data: a `metadata` part with the same JSON and one or more
+`file` parts. Multipart bodies are parsed as they arrive: file data is written
+to the upload directory in UPLOAD_WRITE_BUFFER_KB chunks and hashed on the
+way, so a request holds at most one buffer of file data in memory whatever
+the file size, and nothing is base64-decoded on the event loop.
+
+Uploads end up in a content-addressed store keyed by the SHA-256 of the file
+as uploaded: the same consent form sent to many patients is stored (and
+linearized) once and shared by all their documents and templates. Shared files
+are reference-counted in stored_files; unreferenced ones are removed by the
+worker after STORAGE_GC_GRACE_HOURS.
+"""
+import os
+import re
+import time
+import uuid
+import hashlib
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional, Tuple, Type, TypeVar
+
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from multipart.multipart import MultipartParser, parse_options_header
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import select, update, delete, exists, or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import Document, StoredFile, StoredFileOwner, Template
+from app.services.image_converter import image_converter
+from app.services.pdf_generator import pdf_render_engine
+
+UPLOAD_DIR = Path("/app/uploads")
+STORE_DIR = UPLOAD_DIR / "sha256"
+SHA256_HEX = re.compile(r"[0-9a-f]{64}")
+STAGED_PREFIX = ".staged-"  # Files of requests in flight; left over only if one crashed
+
+METADATA_FIELD = "metadata"
+FILE_FIELD = "file"
+METADATA_MAX_BYTES = 1024 * 1024  # The JSON part is buffered; fields and patient data only
+
+# Leading bytes -> (content type, file suffix)
+SIGNATURES = [
+    (b"%PDF-", "application/pdf", ".pdf"),
+    (b"\xff\xd8\xff", "image/jpeg", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png", ".png"),
+]
+
+Schema = TypeVar("Schema", bound=BaseModel)
+
+
+def sniff(head: bytes) -> Tuple[Optional[str], Optional[str]]:
+    """(content type, suffix) from the leading bytes of a file; (None, None) if not a PDF/JPEG/PNG"""
+    for signature, content_type, suffix in SIGNATURES:
+        if head.startswith(signature):
+            return content_type, suffix
+    return None, None
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class StoredUpload:
+    """A file staged in the upload directory, before it is added to the content store"""
+
+    def __init__(self, path: Path, size: int, sha256: str, content_type: Optional[str], filename: Optional[str]):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.content_type = content_type
+        self.filename = filename
+
+    @property
+    def is_pdf(self) -> bool:
+        return self.content_type == "application/pdf"
+
+    def delete(self):
+        self.path.unlink(missing_ok=True)
+
+
+class UploadWriter:
+    """Buffered, hashing writer for one file part; the file only gets its final name in finish()"""
+
+    def __init__(self, directory: Path, filename: Optional[str], max_bytes: int):
+        self.directory = directory
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.head = b""
+        self.tmp_path = directory / f"{STAGED_PREFIX}{uuid.uuid4()}.part"
+        self._hash = hashlib.sha256()
+        self._buffer = bytearray()
+        self._file = open(self.tmp_path, "wb")
+
+    async def write(self, data: bytes):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"File too large. Maximum size is {self.max_bytes // (1024 * 1024)}MB."
+            )
+        if len(self.head) < 16:
+            self.head = (self.head + data)[:16]
+        self._buffer += data
+        if len(self._buffer) >= settings.UPLOAD_WRITE_BUFFER_KB * 1024:
+            await self._flush()
+
+    def _write_chunk(self, chunk: bytes):
+        # hashlib releases the GIL for large updates, so this runs in parallel with the loop
+        self._hash.update(chunk)
+        self._file.write(chunk)
+
+    async def _flush(self):
+        if self._buffer:
+            chunk = bytes(self._buffer)
+            self._buffer.clear()
+            await run_in_threadpool(self._write_chunk, chunk)
+
+    async def finish(self) -> StoredUpload:
+        await self._flush()
+        self._file.close()
+        content_type, suffix = sniff(self.head)
+        path = self.directory / f"{STAGED_PREFIX}{uuid.uuid4()}{suffix or '.bin'}"
+        os.replace(self.tmp_path, path)
+        return StoredUpload(path, self.size, self._hash.hexdigest(), content_type, self.filename)
+
+    def abort(self):
+        self._file.close()
+        self.tmp_path.unlink(missing_ok=True)
+
+
+class MultipartUpload:
+    """Incremental multipart/form-data parser writing `file` parts straight to disk"""
+
+    def __init__(self, request: Request, max_file_bytes: int):
+        self.request = request
+        self.max_file_bytes = max_file_bytes
+        self.metadata = bytearray()
+        self.uploads: List[StoredUpload] = []
+        self._events: list = []
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._writer: Optional[UploadWriter] = None
+        self._part: Optional[str] = None
+
+    # Parser callbacks only record what happened; the async side acts on it after each write
+    def _on_part_begin(self):
+        self._disposition = b""
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        filename = options[b"filename"].decode("utf-8", "replace") if b"filename" in options else None
+        self._events.append(("begin", name, filename))
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        self._events.append(("data", data[start:end]))
+
+    def _on_part_end(self):
+        self._events.append(("end",))
+
+    async def _handle(self, event: tuple):
+        kind = event[0]
+        if kind == "begin":
+            _, name, filename = event
+            self._part = name
+            if name == FILE_FIELD:
+                self._writer = UploadWriter(UPLOAD_DIR, filename, self.max_file_bytes)
+        elif kind == "data":
+            if self._writer:
+                await self._writer.write(event[1])
+            elif self._part == METADATA_FIELD:
+                self.metadata += event[1]
+                if len(self.metadata) > METADATA_MAX_BYTES:
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Metadata part too large")
+            # Any other part is skipped
+        elif kind == "end":
+            if self._writer:
+                writer, self._writer = self._writer, None
+                self.uploads.append(await writer.finish())
+            self._part = None
+
+    async def parse(self) -> Tuple[bytes, List[StoredUpload]]:
+        _, params = parse_options_header(self.request.headers["content-type"])
+        if b"boundary" not in params:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Missing multipart boundary")
+        parser = MultipartParser(params[b"boundary"], {
+            "on_part_begin": self._on_part_begin,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+        })
+        try:
+            async for chunk in self.request.stream():
+                parser.write(chunk)
+                events, self._events = self._events, []
+                for event in events:
+                    await self._handle(event)
+            parser.finalize()
+            if self._writer:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Incomplete multipart body")
+        except Exception:
+            if self._writer:
+                self._writer.abort()
+            discard(self.uploads)
+            raise
+        return bytes(self.metadata), self.uploads
+
+
+def _validate(schema: Type[Schema], raw: bytes) -> Schema:
+    try:
+        return schema.model_validate_json(raw or b"{}")
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+
+
+async def read_upload_request(request: Request, schema: Type[Schema]) -> Tuple[Schema, List[StoredUpload]]:
+    """
+    Body of a create/update endpoint: `schema` from a JSON body, or from the
+    `metadata` part of a multipart body together with its streamed `file` parts.
+    """
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith("multipart/form-data"):
+        return _validate(schema, await request.body()), []
+
+    metadata, uploads = await MultipartUpload(request, settings.UPLOAD_MAX_MB * 1024 * 1024).parse()
+    try:
+        return _validate(schema, metadata), uploads
+    except Exception:
+        discard(uploads)
+        raise
+
+
+def discard(uploads: List[StoredUpload]):
+    for upload in uploads:
+        upload.delete()
+
+
+async def pdf_from_uploads(uploads: List[StoredUpload]) -> StoredUpload:
+    """
+    The single PDF of a request, or one PDF made of its images (pages in part
+    order). Image uploads are removed once converted.
+    """
+    if any(upload.content_type is None for upload in uploads):
+        discard(uploads)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid file type. Allowed: PDF, JPEG, PNG")
+    if len(uploads) == 1 and uploads[0].is_pdf:
+        return uploads[0]
+    if any(upload.is_pdf for upload in uploads):
+        discard(uploads)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Send either one PDF or one or more images")
+
+    # Images have to be decoded in full anyway; they are bounded by UPLOAD_MAX_MB each
+    try:
+        images = [await run_in_threadpool(upload.path.read_bytes) for upload in uploads]
+        pdf_bytes = await image_converter.convert_async(images)
+    finally:
+        discard(uploads)
+    return await stage_bytes(pdf_bytes, uploads[0].filename)
+
+
+async def stage_bytes(data: bytes, filename: Optional[str] = None) -> StoredUpload:
+    """Stage an in-memory file (decoded base64, converted images) for the content store"""
+    content_type, suffix = sniff(data[:16])
+    path = UPLOAD_DIR / f"{STAGED_PREFIX}{uuid.uuid4()}{suffix or '.bin'}"
+    await run_in_threadpool(path.write_bytes, data)
+    return StoredUpload(path, len(data), hashlib.sha256(data).hexdigest(), content_type, filename)
+
+
+
+def upload_openapi(schema: Type[BaseModel]) -> dict:
+    """openapi_extra for endpoints that read their body with read_upload_request()"""
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": schema.model_json_schema()},
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {
+                            METADATA_FIELD: {"type": "string", "description": f"{schema.__name__} as JSON, without the base64 file"},
+                            FILE_FIELD: {"type": "array", "items": {"type": "string", "format": "binary"}},
+                        },
+                        "required": [METADATA_FIELD],
+                    }
+                },
+            },
+        }
+    }
+
+
+class ContentStore:
+    """
+    Uploaded files stored once per content under <root>/ab/cd/<sha256><suffix>.
+
+    A reference is counted for every document or template row whose file_path
+    points into the store; the counts change in the caller's transaction.
+    Files whose count dropped to 0 (and staged files left by crashed requests)
+    are deleted by collect_garbage() once STORAGE_GC_GRACE_HOURS have passed.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def path_for(self, sha256: str, suffix: str) -> Path:
+        return self.root / sha256[:2] / sha256[2:4] / f"{sha256}{suffix}"
+
+    def is_stored(self, path: Optional[str]) -> bool:
+        """path has the layout of path_for(), so '..' can't lead out of the store"""
+        if not path:
+            return False
+        path = Path(path)
+        sha256 = path.name[:64]
+        return (
+            path.parent.parent.parent == self.root and SHA256_HEX.fullmatch(sha256) is not None
+            and path.parent.parent.name == sha256[:2] and path.parent.name == sha256[2:4]
+        )
+
+    async def check_client_path(
+        self, db: AsyncSession, hospital_id: uuid.UUID, path: Optional[str], current: Optional[str] = None
+    ):
+        """
+        A file_path sent by a client must be a stored file of the caller's
+        hospital (as returned by /upload-file); documents serve their file
+        without authentication, and the store is shared by all hospitals.
+        Paths from before the store are accepted while a template or document
+        of the hospital uses them (e.g. duplicating a template), and `current`,
+        the path the row already has, always is.
+        """
+        if not path or path == current:
+            return
+        if self.is_stored(path):
+            allowed = exists().where(
+                StoredFileOwner.sha256 == Path(path).name[:64], StoredFileOwner.hospital_id == hospital_id
+            )
+        else:
+            allowed = or_(
+                exists().where(Template.hospital_id == hospital_id, Template.file_path == path),
+                exists().where(Document.hospital_id == hospital_id, Document.file_path == path),
+            )
+        if not await db.scalar(select(allowed)):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="file_path must be a file uploaded with /api/documents/upload-file"
+            )
+
+    async def _count(self, db: AsyncSession, upload: StoredUpload, path: Path, refs: int):
+        now = datetime.utcnow()
+        await db.execute(
+            insert(StoredFile)
+            .values(
+                sha256=upload.sha256, path=str(path), size=upload.size, content_type=upload.content_type,
+                ref_count=refs, created_at=now, updated_at=now
+            )
+            .on_conflict_do_update(
+                index_elements=[StoredFile.sha256],
+                set_={"ref_count": StoredFile.ref_count + refs, "updated_at": now}
+            )
+        )
+
+    async def add(self, db: AsyncSession, upload: StoredUpload, hospital_id: uuid.UUID, reference: bool = True) -> str:
+        """
+        Move a staged upload of hospital_id into the store and return its path.
+        A file that is already stored is reused and the staged copy dropped; a
+        new PDF is linearized first. reference=False stores without counting a
+        reference (/upload-file: the caller passes the path to a create request
+        later).
+        """
+        target = self.path_for(upload.sha256, upload.path.suffix)
+        # Row first: a concurrent collect_garbage() of the same file blocks on it
+        await self._count(db, upload, target, 1 if reference else 0)
+        await db.execute(
+            insert(StoredFileOwner)
+            .values(sha256=upload.sha256, hospital_id=hospital_id, created_at=datetime.utcnow())
+            .on_conflict_do_nothing()
+        )
+        if await run_in_threadpool(target.exists):
+            upload.delete()
+            print(f"♻️ Reusing stored file {target.name} ({upload.size} bytes)")
+            return str(target)
+        if upload.is_pdf:
+            await pdf_render_engine.linearize_pdf(str(upload.path))
+        await run_in_threadpool(target.parent.mkdir, parents=True, exist_ok=True)
+        os.replace(upload.path, target)
+        return str(target)
+
+    async def add_bytes(self, db: AsyncSession, data: bytes, hospital_id: uuid.UUID, reference: bool = True) -> str:
+        return await self.add(db, await stage_bytes(data), hospital_id, reference)
+
+    async def _change(self, db: AsyncSession, path: Optional[str], delta: int):
+        if self.is_stored(path):
+            await db.execute(
+                update(StoredFile)
+                .where(StoredFile.path == str(path))
+                .values(ref_count=StoredFile.ref_count + delta, updated_at=datetime.utcnow())
+            )
+
+    async def acquire(self, db: AsyncSession, path: Optional[str], count: int = 1):
+        """Count `count` more rows using `path` (no-op for files outside the store)"""
+        await self._change(db, path, count)
+
+    async def release(self, db: AsyncSession, path: Optional[str]):
+        """A row stopped using `path`; the file goes once nothing uses it"""
+        await self._change(db, path, -1)
+
+    def _remove_stale_staged(self, cutoff: float) -> int:
+        removed = 0
+        for entry in os.scandir(UPLOAD_DIR):
+            if entry.is_file() and entry.name.startswith(STAGED_PREFIX) and entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+                removed += 1
+        return removed
+
+    async def collect_garbage(self) -> int:
+        """Delete unreferenced files older than the grace period; returns the number removed"""
+        grace = timedelta(hours=settings.STORAGE_GC_GRACE_HOURS)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                delete(StoredFile)
+                .where(StoredFile.ref_count <= 0, StoredFile.updated_at < datetime.utcnow() - grace)
+                .returning(StoredFile.path)
+            )
+            paths = result.scalars().all()
+            # Unlink while the rows are still locked, so add() of the same content waits for us
+            for path in paths:
+                await run_in_threadpool(Path(path).unlink, missing_ok=True)
+            await db.commit()
+        removed = len(paths)
+        removed += await run_in_threadpool(self._remove_stale_staged, time.time() - grace.total_seconds())
+        return removed
+
+
+# Create singleton instance
+content_store = ContentStore(STORE_DIR)
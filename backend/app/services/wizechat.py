@@ -3,6 +3,10 @@ from typing import Optional
 from app.config import settings
 
 
+class WizeChatClientError(Exception):
+    """WizeChat rejected the request (4xx); sending it again will not help"""
+
+
 class WizeChatService:
     """Service to send WhatsApp messages via WizeChat E-Signature API"""
 
@@ -10,6 +14,21 @@ class WizeChatService:
 
     def __init__(self):
         self.api_key = settings.WIZECHAT_API_KEY
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared client (connection pool + keep-alive), created on first use in the running event loop"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=settings.WIZECHAT_MAX_CONNECTIONS)
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     def _get_headers(self, api_key: Optional[str] = None) -> dict:
         """Return headers using X-API-Token authentication."""
@@ -29,48 +48,49 @@ class WizeChatService:
         print(f"\n📤 WizeChat POST: {url}")
         print(f"   Payload: {payload}")
 
-        async with httpx.AsyncClient() as client:
+        try:
+            response = await self.client.post(url, json=payload, headers=headers, timeout=30.0)
+            print(f"✅ WizeChat Response: {response.status_code}")
+            response.raise_for_status()
+            result = response.json()
+            print(f"   Body: {result}")
+            return result
+
+        except httpx.TimeoutException:
+            print("⏱️ WizeChat Timeout")
+            raise Exception("WizeChat API request timed out.")
+
+        except httpx.HTTPStatusError as e:
+            status_code = e.response.status_code
             try:
-                response = await client.post(url, json=payload, headers=headers, timeout=30.0)
-                print(f"✅ WizeChat Response: {response.status_code}")
-                response.raise_for_status()
-                result = response.json()
-                print(f"   Body: {result}")
-                return result
-
-            except httpx.TimeoutException:
-                print("⏱️ WizeChat Timeout")
-                raise Exception("WizeChat API request timed out.")
-
-            except httpx.HTTPStatusError as e:
-                status_code = e.response.status_code
-                try:
-                    error_body = e.response.json()
-                except Exception:
-                    error_body = e.response.text
-                print(f"❌ WizeChat HTTP {status_code}: {error_body}")
-
-                if status_code == 401:
-                    raise Exception("Invalid WizeChat API Key. Please check your settings.")
-                elif status_code == 404:
-                    raise Exception("Invalid WizeChat Inbox ID or endpoint not found.")
-                elif status_code == 400:
-                    detail = (
-                        error_body.get("detail", str(error_body))
-                        if isinstance(error_body, dict)
-                        else str(error_body)
-                    )
-                    raise Exception(f"Bad request: {detail}")
-                else:
-                    raise Exception(f"WizeChat API error ({status_code}): {error_body}")
-
-            except httpx.ConnectError as e:
-                print(f"🔌 WizeChat Connection Error: {e}")
-                raise Exception(f"Cannot connect to WizeChat API at {self.BASE_URL}.")
-
-            except httpx.RequestError as e:
-                print(f"🔥 WizeChat Request Error: {e}")
-                raise Exception(f"Failed to connect to WizeChat: {str(e)}")
+                error_body = e.response.json()
+            except Exception:
+                error_body = e.response.text
+            print(f"❌ WizeChat HTTP {status_code}: {error_body}")
+
+            if status_code == 401:
+                raise WizeChatClientError("Invalid WizeChat API Key. Please check your settings.")
+            elif status_code == 404:
+                raise WizeChatClientError("Invalid WizeChat Inbox ID or endpoint not found.")
+            elif status_code == 400:
+                detail = (
+                    error_body.get("detail", str(error_body))
+                    if isinstance(error_body, dict)
+                    else str(error_body)
+                )
+                raise WizeChatClientError(f"Bad request: {detail}")
+            elif 400 <= status_code < 500 and status_code not in (408, 429):
+                raise WizeChatClientError(f"WizeChat API error ({status_code}): {error_body}")
+            else:
+                raise Exception(f"WizeChat API error ({status_code}): {error_body}")
+
+        except httpx.ConnectError as e:
+            print(f"🔌 WizeChat Connection Error: {e}")
+            raise Exception(f"Cannot connect to WizeChat API at {self.BASE_URL}.")
+
+        except httpx.RequestError as e:
+            print(f"🔥 WizeChat Request Error: {e}")
+            raise Exception(f"Failed to connect to WizeChat: {str(e)}")
 
     # ─── Public Methods ───────────────────────────────────────────────────────
 
@@ -84,13 +104,12 @@ class WizeChatService:
         headers = self._get_headers(api_key)
         payload = {"inbox_id": inbox_id}
 
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(url, json=payload, headers=headers, timeout=15.0)
-                # WizeChat returns 200 even for auth errors, body has success/connected
-                return response.json()
-            except Exception as e:
-                return {"success": False, "connected": False, "error": str(e), "message": "Could not reach WizeChat"}
+        try:
+            response = await self.client.post(url, json=payload, headers=headers, timeout=15.0)
+            # WizeChat returns 200 even for auth errors, body has success/connected
+            return response.json()
+        except Exception as e:
+            return {"success": False, "connected": False, "error": str(e), "message": "Could not reach WizeChat"}
 
 
     async def send_signature_request(
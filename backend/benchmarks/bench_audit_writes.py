@@ -0,0 +1,148 @@
+"""
+Benchmark audit trail write amplification: appending to the documents.audit_trail
+JSON array vs inserting into document_audit_events.
+
+Works on copies of both layouts in a scratch schema (dropped afterwards) of the
+DATABASE_URL database and measures WAL bytes, as reported by
+pg_current_wal_lsn(), per appended event. WAL is cluster-wide, so run it
+against an otherwise idle Postgres.
+Run from the backend directory with: python -m benchmarks.bench_audit_writes [documents] [events]
+"""
+import asyncio
+import json
+import sys
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.config import settings
+
+SCHEMA = "bench_audit"
+
+# Stand-in for the other document columns that get copied with every row version
+FIELDS = json.dumps([
+    {"id": f"f{i}", "type": "TEXT", "label": f"Field {i}", "page": 1, "x": 10, "y": 5 * i, "w": 30, "h": 4, "value": "x" * 40}
+    for i in range(12)
+])
+
+CREATE = f"""
+CREATE SCHEMA {SCHEMA};
+CREATE TABLE {SCHEMA}.documents (
+    id uuid PRIMARY KEY,
+    procedure_name varchar,
+    status varchar,
+    secure_token uuid,
+    fields json,
+    audit_trail json,
+    created_at timestamp,
+    updated_at timestamp
+);
+CREATE INDEX ON {SCHEMA}.documents (status);
+CREATE UNIQUE INDEX ON {SCHEMA}.documents (secure_token);
+CREATE TABLE {SCHEMA}.document_audit_events (
+    id bigserial PRIMARY KEY,
+    document_id uuid NOT NULL REFERENCES {SCHEMA}.documents (id) ON DELETE CASCADE,
+    ts timestamp NOT NULL,
+    action varchar NOT NULL,
+    actor varchar,
+    details text,
+    extra json
+);
+CREATE INDEX ON {SCHEMA}.document_audit_events (document_id, ts);
+"""
+
+
+def make_event(number: int) -> dict:
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "action": "LINK_ACCESSED" if number % 2 else "WHATSAPP_SENT",
+        "actor": "SYSTEM",
+        "details": f"Event {number}: IP 10.0.0.{number % 250}, User-Agent: Mozilla/5.0 (Linux; Android 14) Mobile Safari/537.36"
+    }
+
+
+async def wal_lsn(conn) -> int:
+    return (await conn.exec_driver_sql("SELECT (pg_current_wal_lsn() - '0/0'::pg_lsn)::bigint")).scalar()
+
+
+async def append_json(conn, document_id: uuid.UUID, event: dict):
+    """What the code did before: read the trail, write it back with one more entry"""
+    trail = (await conn.exec_driver_sql(
+        f"SELECT audit_trail FROM {SCHEMA}.documents WHERE id = $1 FOR UPDATE", (document_id,)
+    )).scalar()
+    await conn.exec_driver_sql(
+        f"UPDATE {SCHEMA}.documents SET audit_trail = $1::json, updated_at = $2 WHERE id = $3",
+        (json.dumps([*(trail or []), event]), datetime.utcnow(), document_id)
+    )
+
+
+async def insert_event(conn, document_id: uuid.UUID, event: dict):
+    await conn.exec_driver_sql(
+        f"INSERT INTO {SCHEMA}.document_audit_events (document_id, ts, action, actor, details) VALUES ($1, $2, $3, $4, $5)",
+        (document_id, datetime.fromisoformat(event["timestamp"]), event["action"], event["actor"], event["details"])
+    )
+
+
+async def measure(engine, document_ids, events: int, append) -> tuple:
+    """Append `events` events to every document, one transaction per event like the API does"""
+    async with engine.connect() as conn:
+        await conn.commit()
+        start_lsn = await wal_lsn(conn)
+        start = time.perf_counter()
+        for number in range(events):
+            for document_id in document_ids:
+                await append(conn, document_id, make_event(number))
+                await conn.commit()
+        elapsed = time.perf_counter() - start
+        wal_bytes = await wal_lsn(conn) - start_lsn
+    writes = events * len(document_ids)
+    return wal_bytes / writes, elapsed / writes * 1000
+
+
+async def table_size(engine, table: str) -> int:
+    async with engine.connect() as conn:
+        return (await conn.exec_driver_sql(f"SELECT pg_total_relation_size('{SCHEMA}.{table}')")).scalar()
+
+
+async def run(documents: int, events: int):
+    engine = create_async_engine(settings.DATABASE_URL)
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        for statement in CREATE.split(";"):
+            if statement.strip():
+                await conn.exec_driver_sql(statement)
+        document_ids = [uuid.uuid4() for _ in range(documents)]
+        for document_id in document_ids:
+            await conn.exec_driver_sql(
+                f"INSERT INTO {SCHEMA}.documents VALUES ($1, 'Laparoscopic Cholecystectomy', 'SENT', $2, $3::json, '[]'::json, now(), now())",
+                (document_id, uuid.uuid4(), FIELDS)
+            )
+
+    try:
+        print(f"Audit trail write amplification ({documents} documents x {events} events)")
+        print(f"  {'layout':<22}  {'WAL B/event':>11}  {'ms/event':>8}  {'table KB':>9}")
+        base_size = await table_size(engine, "documents")
+        json_wal, json_ms = await measure(engine, document_ids, events, append_json)
+        json_size = await table_size(engine, "documents") - base_size
+        print(f"  {'JSON array (before)':<22}  {json_wal:>11.0f}  {json_ms:>8.2f}  {json_size / 1024:>9.0f}")
+
+        events_wal, events_ms = await measure(engine, document_ids, events, insert_event)
+        events_size = await table_size(engine, "document_audit_events")
+        print(f"  {'event table (after)':<22}  {events_wal:>11.0f}  {events_ms:>8.2f}  {events_size / 1024:>9.0f}")
+        print(f"  WAL per event reduced {json_wal / events_wal:.1f}x")
+    finally:
+        async with engine.begin() as conn:
+            await conn.exec_driver_sql(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await engine.dispose()
+
+
+def main():
+    documents = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    events = int(sys.argv[2]) if len(sys.argv) > 2 else 15
+    asyncio.run(run(documents, events))
+
+
+if __name__ == "__main__":
+    main()
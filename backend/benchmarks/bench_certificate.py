@@ -0,0 +1,88 @@
+"""
+Benchmark certificate page generation: full redraw vs cached static template.
+Run from the backend directory with: python -m benchmarks.bench_certificate [iterations]
+"""
+import io
+import sys
+import time
+import base64
+from datetime import datetime
+
+from PIL import Image, ImageDraw
+from pypdf import PdfReader, PdfWriter
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import letter
+
+from app.services import pdf_generator
+from app.services.pdf_generator import PDFGeneratorService
+
+
+def make_signature() -> str:
+    image = Image.new("RGBA", (600, 200), (255, 255, 255, 0))
+    draw = ImageDraw.Draw(image)
+    draw.line([(120, 140), (260, 60), (380, 150), (500, 70)], fill=(0, 0, 0, 255), width=6)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+def full_redraw(service: PDFGeneratorService, args: tuple):
+    """Previous behaviour: draw every element of the certificate on a fresh canvas"""
+    packet = io.BytesIO()
+    can = canvas.Canvas(packet, pagesize=letter)
+    service._draw_certificate_content(can, *args)
+    can.save()
+    packet.seek(0)
+    writer = PdfWriter()
+    writer.add_page(PdfReader(packet).pages[0])
+    writer.write(io.BytesIO())
+
+
+def template_overlay(service: PDFGeneratorService, args: tuple):
+    """Current behaviour: clone the cached static page and overlay the variable fields"""
+    writer = PdfWriter()
+    procedure_name, patient_name, signed_date, certificate_hash, document_id, signature_base64, ip_address, phone = args
+    signature = pdf_generator.SignatureAsset.from_base64(signature_base64)
+    service._add_certificate_page(
+        writer, procedure_name, patient_name, signed_date, certificate_hash, document_id,
+        signature, signature.add_to_writer(writer) if signature else None, ip_address, phone
+    )
+    writer.write(io.BytesIO())
+
+
+def measure(fn, service, args, iterations: int) -> float:
+    fn(service, args)  # warm-up (builds the template once)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(service, args)
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def run(service: PDFGeneratorService, args: tuple, iterations: int, title: str):
+    print(title)
+    baseline = measure(full_redraw, service, args, iterations)
+    print(f"  Full redraw:       {baseline:7.2f} ms/certificate")
+    current = measure(template_overlay, service, args, iterations)
+    print(f"  Template overlay:  {current:7.2f} ms/certificate")
+    print(f"  Speed-up:          {baseline / current:7.2f}x")
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    service = PDFGeneratorService(storage_path="/tmp/wizesign_bench")
+    args = (
+        "Laparoscopic Cholecystectomy", "Test Patient", datetime.utcnow(),
+        "ab" * 32, "00000000-0000-0000-0000-000000000000", make_signature(),
+        "10.0.0.1", "+919539170177",
+    )
+
+    print(f"Certificate benchmark ({iterations} iterations)")
+    run(service, args, iterations, "With signature image:")
+
+    # Same layout without the image, isolating the cost of the static parts
+    pdf_generator.SignatureAsset.from_base64 = staticmethod(lambda *a, **k: None)
+    run(service, args, iterations, "Layout only (signature image excluded):")
+
+
+if __name__ == "__main__":
+    main()
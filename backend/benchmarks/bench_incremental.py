@@ -0,0 +1,84 @@
+"""
+Benchmark signed PDF output: full rewrite vs incremental (append-only) update.
+Run from the backend directory with: python -m benchmarks.bench_incremental [iterations]
+"""
+import io
+import os
+import sys
+import time
+from datetime import datetime
+
+from PIL import Image
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+
+from app.services.pdf_generator import PDFGeneratorService
+from benchmarks.bench_certificate import make_signature
+
+PAGE_COUNTS = [1, 10, 50, 100]
+STORAGE = "/tmp/wizesign_bench"
+
+FIELDS = [
+    {"type": "TEXT", "page": 1, "x": 10, "y": 10, "w": 30, "h": 4, "value": "Test Patient"},
+    {"type": "CHECKBOX", "page": 1, "x": 10, "y": 20, "w": 4, "h": 4, "value": "true", "label": "I agree"},
+    {"type": "SIGNATURE", "page": 1, "x": 55, "y": 80, "w": 30, "h": 10},
+]
+
+
+def make_source(pages: int) -> str:
+    """A scan-like consent form: a JPEG image and some text on every page"""
+    path = os.path.join(STORAGE, f"source_{pages}.pdf")
+    scan = Image.effect_noise((800, 1100), 40).convert("RGB")
+    buffer = io.BytesIO()
+    scan.save(buffer, format="JPEG", quality=60)
+    packet = io.BytesIO()
+    can = canvas.Canvas(packet, pagesize=A4)
+    for number in range(pages):
+        buffer.seek(0)
+        can.drawImage(ImageReader(buffer), 40, 80, width=515, height=700)
+        can.setFont("Helvetica", 12)
+        can.drawString(40, 800, f"Consent form page {number + 1} of {pages}")
+        can.showPage()
+    can.save()
+    with open(path, "wb") as f:
+        f.write(packet.getvalue())
+    return path
+
+
+def measure(service: PDFGeneratorService, kwargs: dict, mode: str, iterations: int) -> tuple:
+    path = service.generate_signed_pdf(**kwargs, output_mode=mode)  # warm-up (parse cache, template)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        service.generate_signed_pdf(**kwargs, output_mode=mode)
+    elapsed = (time.perf_counter() - start) / iterations * 1000
+    return elapsed, os.path.getsize(path)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    os.makedirs(STORAGE, exist_ok=True)
+    service = PDFGeneratorService(storage_path=STORAGE)
+    signature = make_signature()
+
+    print(f"Signed PDF output benchmark ({iterations} iterations, fields on page 1)")
+    print(f"  {'pages':>5}  {'source KB':>9}  {'full ms':>8}  {'incr ms':>8}  {'speed-up':>8}  {'full KB':>8}  {'incr KB':>8}")
+    for pages in PAGE_COUNTS:
+        source = make_source(pages)
+        kwargs = dict(
+            document_id=f"bench-{pages}", signature_base64=signature,
+            patient_name="Test Patient", procedure_name="Laparoscopic Cholecystectomy",
+            signed_date=datetime.utcnow(), certificate_hash="ab" * 32,
+            original_pdf_path=source, signature_fields=FIELDS,
+            ip_address="10.0.0.1", phone_number="+919539170177",
+        )
+        full_ms, full_size = measure(service, kwargs, "full", iterations)
+        incremental_ms, incremental_size = measure(service, kwargs, "incremental", iterations)
+        print(
+            f"  {pages:>5}  {os.path.getsize(source) / 1024:>9.0f}  {full_ms:>8.2f}  {incremental_ms:>8.2f}"
+            f"  {full_ms / incremental_ms:>7.2f}x  {full_size / 1024:>8.0f}  {incremental_size / 1024:>8.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
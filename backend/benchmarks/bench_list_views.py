@@ -0,0 +1,152 @@
+"""
+Benchmark GET /api/documents/ page size and latency: the full rows
+(view=detail, what the dashboard used to poll) vs view=summary.
+
+Creates a scratch hospital with signed documents (hand-drawn signature images
+and filled-in fields) in the DATABASE_URL database, calls the API in-process
+and deletes everything afterwards. Times are medians over the iterations
+after a warm-up call; DB ms comes from the Server-Timing header.
+Run from the backend directory with: python -m benchmarks.bench_list_views [documents] [iterations] [page size]
+"""
+import asyncio
+import base64
+import io
+import random
+import re
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import httpx
+from PIL import Image, ImageDraw
+from sqlalchemy import delete, insert
+
+from app.database import AsyncSessionLocal
+from app.main import app
+from app.models import Document, Hospital, Patient, User, RoleEnum, DocumentStatusEnum
+from app.routers.auth import create_access_token
+
+
+def make_signature(seed: int) -> str:
+    """A canvas export like the patient page sends: a few hundred jittery stroke points"""
+    rng = random.Random(seed)
+    image = Image.new("RGBA", (600, 200), (255, 255, 255, 0))
+    draw = ImageDraw.Draw(image)
+    for _ in range(3):
+        x, y = rng.uniform(60, 200), rng.uniform(60, 140)
+        points = []
+        for _ in range(120):
+            x = min(580, max(20, x + rng.uniform(-4, 9)))
+            y = min(180, max(20, y + rng.uniform(-9, 9)))
+            points.append((x, y))
+        draw.line(points, fill=(20, 20, 60, 255), width=3, joint="curve")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+def make_fields(number: int) -> list:
+    fields = [
+        {"id": f"f{i}", "type": "TEXT", "label": f"Field {i}", "page": 1 + i // 6, "x": 10, "y": 5 + 7 * (i % 6),
+         "w": 30, "h": 4, "value": f"Answer {i} of document {number}", "fontSize": 11}
+        for i in range(12)
+    ]
+    fields.append({"id": "sig", "type": "SIGNATURE", "label": "Signature", "page": 2, "x": 60, "y": 80, "w": 30, "h": 8})
+    return fields
+
+
+async def create_documents(count: int) -> tuple:
+    hospital = Hospital(id=uuid.uuid4(), name="List view benchmark")
+    doctor = User(
+        id=uuid.uuid4(), email=f"bench-{hospital.id}@list.views", name="Dr Bench",
+        role=RoleEnum.DOCTOR, hospital_id=hospital.id
+    )
+    signatures = [make_signature(seed) for seed in range(20)]
+    now = datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        db.add_all([hospital, doctor])
+        await db.flush()
+        patients = [
+            {"id": uuid.uuid4(), "hospital_id": hospital.id, "full_name": f"Patient {number}",
+             "phone": f"+9190000{number:05d}", "email": f"patient{number}@list.views"}
+            for number in range(count)
+        ]
+        await db.execute(insert(Patient), patients)
+        await db.execute(insert(Document), [
+            {"id": uuid.uuid4(), "hospital_id": hospital.id, "patient_id": patient["id"], "created_by_id": doctor.id,
+             "procedure_name": "Laparoscopic Cholecystectomy", "file_url": "/uploads/bench.pdf",
+             "doctor_name": doctor.name, "status": DocumentStatusEnum.SIGNED, "fields": make_fields(number),
+             "signature": signatures[number % len(signatures)], "signed_date": now, "certificate_hash": "ab" * 32,
+             "created_at": now - timedelta(minutes=number)}
+            for number, patient in enumerate(patients)
+        ])
+        await db.commit()
+    return hospital, doctor
+
+
+async def remove_documents(hospital_id: uuid.UUID):
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(Document).where(Document.hospital_id == hospital_id))
+        await db.execute(delete(Patient).where(Patient.hospital_id == hospital_id))
+        await db.execute(delete(User).where(User.hospital_id == hospital_id))
+        await db.execute(delete(Hospital).where(Hospital.id == hospital_id))
+        await db.commit()
+
+
+async def measure(client: httpx.AsyncClient, view: str, page_size: int, iterations: int) -> dict:
+    params = {"view": view, "limit": page_size}
+    (await client.get("/api/documents/", params=params)).raise_for_status()  # Warm-up
+    wall, db_ms = [], []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        response = await client.get("/api/documents/", params=params)
+        wall.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+        db_ms.append(float(re.search(r"db;dur=([\d.]+)", response.headers["server-timing"]).group(1)))
+    return {
+        "bytes": len(response.content),
+        "rows": len(response.json()),
+        "median_ms": statistics.median(wall),
+        "p95_ms": statistics.quantiles(wall, n=20)[-1] if iterations > 1 else wall[0],
+        "db_ms": statistics.median(db_ms),
+    }
+
+
+async def run(documents: int, iterations: int, page_size: int):
+    hospital, doctor = await create_documents(documents)
+    token = create_access_token({
+        "sub": str(doctor.id), "email": doctor.email, "role": doctor.role.value, "hospital_id": str(hospital.id)
+    }, expires_delta=timedelta(minutes=30))
+    transport = httpx.ASGITransport(app=app, client=("127.0.0.1", 50000))
+    try:
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench", headers={"Authorization": f"Bearer {token}"}
+        ) as client:
+            print(f"GET /api/documents/ ({page_size} of {documents} signed documents, {iterations} iterations)")
+            print(f"  {'view':<8}  {'rows':>4}  {'KB':>8}  {'median ms':>9}  {'p95 ms':>7}  {'DB ms':>6}")
+            results = {}
+            for view in ("detail", "summary"):
+                result = results[view] = await measure(client, view, page_size, iterations)
+                print(
+                    f"  {view:<8}  {result['rows']:>4}  {result['bytes'] / 1024:>8.1f}  {result['median_ms']:>9.1f}"
+                    f"  {result['p95_ms']:>7.1f}  {result['db_ms']:>6.1f}"
+                )
+            print(
+                f"  summary is {results['detail']['bytes'] / results['summary']['bytes']:.0f}x smaller and "
+                f"{results['detail']['median_ms'] / results['summary']['median_ms']:.1f}x faster"
+            )
+    finally:
+        await remove_documents(hospital.id)
+
+
+def main():
+    documents = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    page_size = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+    asyncio.run(run(documents, iterations, page_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Benchmark document search on a large tenant: the previous ILIKE over the
+documents/patients join vs app/services/search.py (pg_trgm GIN indexes,
+patients matched first, results ranked).
+
+Seeds one hospital with `documents` documents (a million by default) and a
+quarter as many patients into a scratch schema (dropped afterwards) of the
+DATABASE_URL database. Both searches run through the same SQLAlchemy
+statements as the API, redirected to that schema. Times are medians over the
+iterations after a warm-up run; pg_trgm must be installable.
+Run from the backend directory with: python -m benchmarks.bench_search [documents] [iterations]
+"""
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+
+from app.config import settings
+from app.models import Document, Patient
+from app.services.search import document_search, search_time_limit
+
+SCHEMA = "bench_search"
+PAGE_SIZE = 50
+
+FIRST_NAMES = [
+    "Aarav", "Priya", "Rohan", "Ananya", "Vikram", "Meera", "Arjun", "Kavya", "Siddharth", "Isha",
+    "Rahul", "Sneha", "Karan", "Pooja", "Aditya", "Nisha", "Manish", "Divya", "Suresh", "Lakshmi",
+    "John", "Maria", "David", "Sarah", "Ahmed", "Fatima", "Chen", "Yuki", "Carlos", "Elena",
+]
+LAST_NAMES = [
+    "Sharma", "Patel", "Iyer", "Reddy", "Nair", "Gupta", "Menon", "Rao", "Singh", "Kapoor",
+    "Das", "Joshi", "Pillai", "Bose", "Kulkarni", "Chatterjee", "Mehta", "Verma", "Shetty", "Agarwal",
+    "Smith", "Garcia", "Khan", "Wang", "Tanaka", "Silva", "Müller", "Ivanova", "Okafor", "Haddad",
+]
+PROCEDURES = [
+    "Laparoscopic Cholecystectomy", "Total Knee Replacement", "Cataract Surgery", "Coronary Angiography",
+    "Appendectomy", "Colonoscopy", "Upper GI Endoscopy", "Caesarean Section", "Tonsillectomy",
+    "Hernia Repair", "Hip Arthroplasty", "Spinal Fusion", "Blood Transfusion Consent", "General Anaesthesia",
+    "MRI with Contrast", "CT Guided Biopsy", "Dental Extraction", "Chemotherapy Cycle", "Dialysis Initiation",
+    "Bronchoscopy", "Thyroidectomy", "Hysterectomy", "Angioplasty with Stent", "Lumbar Puncture",
+]
+DOCTORS = [f"Dr. {first} {last}" for first, last in zip(FIRST_NAMES[::2], LAST_NAMES[1::2])]
+
+# (label, term): a rare patient name, a common procedure, an email fragment, a miss and a short term
+TERMS = [
+    ("patient name", "Haddad"),
+    ("procedure", "knee replacement"),
+    ("email", "kavya.menon"),
+    ("no match", "zzyzx"),
+    ("2 characters", "Ra"),
+]
+
+
+def sql_array(values: list) -> str:
+    return "ARRAY[" + ", ".join("'" + value.replace("'", "''") + "'" for value in values) + "]"
+
+
+CREATE = f"""
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE SCHEMA {SCHEMA};
+CREATE TABLE {SCHEMA}.patients (
+    id uuid PRIMARY KEY,
+    hospital_id uuid NOT NULL,
+    full_name varchar NOT NULL,
+    email varchar,
+    created_at timestamp
+);
+CREATE TABLE {SCHEMA}.documents (
+    id uuid PRIMARY KEY,
+    hospital_id uuid NOT NULL,
+    patient_id uuid NOT NULL REFERENCES {SCHEMA}.patients (id),
+    procedure_name varchar NOT NULL,
+    doctor_name varchar,
+    created_at timestamp
+)
+"""
+
+SEED = f"""
+INSERT INTO {SCHEMA}.patients
+SELECT md5('patient' || i)::uuid, $1::uuid, first || ' ' || last,
+       CASE WHEN i % 3 = 0 THEN NULL ELSE lower(first || '.' || last || i || '@example.com') END,
+       now() - i * interval '1 minute'
+FROM (
+    SELECT i,
+           ({sql_array(FIRST_NAMES)})[1 + (i * 7) % {len(FIRST_NAMES)}] AS first,
+           ({sql_array(LAST_NAMES)})[1 + (i * 13 + i / {len(FIRST_NAMES)}) % {len(LAST_NAMES)}] AS last
+    FROM generate_series(1, $2::int) AS i
+) AS names;
+INSERT INTO {SCHEMA}.documents
+SELECT gen_random_uuid(), $1::uuid, md5('patient' || (1 + (i * 7919) % $2::int))::uuid,
+       ({sql_array(PROCEDURES)})[1 + (i * 11) % {len(PROCEDURES)}],
+       ({sql_array(DOCTORS)})[1 + (i * 3) % {len(DOCTORS)}],
+       now() - i * interval '20 seconds'
+FROM generate_series(1, $3::int) AS i
+"""
+
+INDEXES = f"""
+CREATE INDEX ON {SCHEMA}.documents (hospital_id, created_at DESC, id DESC);
+CREATE INDEX ON {SCHEMA}.documents (patient_id);
+CREATE INDEX ON {SCHEMA}.patients (hospital_id);
+CREATE INDEX ON {SCHEMA}.documents USING gin (procedure_name gin_trgm_ops);
+CREATE INDEX ON {SCHEMA}.documents USING gin (doctor_name gin_trgm_ops);
+CREATE INDEX ON {SCHEMA}.patients USING gin (full_name gin_trgm_ops);
+CREATE INDEX ON {SCHEMA}.patients USING gin (email gin_trgm_ops);
+ANALYZE {SCHEMA}.patients;
+ANALYZE {SCHEMA}.documents
+"""
+
+
+async def before(db: AsyncSession, hospital_id: uuid.UUID, term: str) -> list:
+    """What list_documents did before: ILIKE on both sides of the join, newest first"""
+    pattern = f"%{term}%"
+    result = await db.execute(
+        select(Document.id).join(Document.patient)
+        .where(Document.hospital_id == hospital_id)
+        .where(
+            Document.procedure_name.ilike(pattern) | Document.doctor_name.ilike(pattern) |
+            Patient.full_name.ilike(pattern) | Patient.email.ilike(pattern)
+        )
+        .order_by(Document.created_at.desc())
+        .limit(PAGE_SIZE)
+    )
+    return result.scalars().all()
+
+
+async def after(db: AsyncSession, hospital_id: uuid.UUID, term: str) -> list:
+    """app/services/search.py, as list_documents uses it (relevance order)"""
+    async with search_time_limit(db):
+        condition, rank = await document_search(db, hospital_id, term)
+        result = await db.execute(
+            select(Document.id).join(Document.patient)
+            .where(Document.hospital_id == hospital_id, condition)
+            .order_by(rank.desc(), Document.created_at.desc(), Document.id.desc())
+            .limit(PAGE_SIZE)
+        )
+    return result.scalars().all()
+
+
+def milliseconds(value) -> str:
+    return "timeout" if value is None else f"{value:.1f}"
+
+
+async def measure(engine, search, hospital_id: uuid.UUID, term: str, iterations: int) -> tuple:
+    timings = []
+    for number in range(iterations + 1):
+        async with AsyncSession(engine) as db:
+            start = time.perf_counter()
+            try:
+                rows = await search(db, hospital_id, term)
+            except HTTPException:  # Cancelled by statement_timeout
+                return None, "-"
+            if number:
+                timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), len(rows)
+
+
+async def run(documents: int, iterations: int):
+    base = create_async_engine(settings.DATABASE_URL)
+    engine = base.execution_options(schema_translate_map={None: SCHEMA})
+    hospital_id = uuid.uuid4()
+    patients = max(1, documents // 4)
+    print(f"Seeding {documents} documents and {patients} patients into {SCHEMA}...")
+    started = time.perf_counter()
+    async with base.begin() as conn:
+        await conn.exec_driver_sql(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        for statement in CREATE.split(";"):
+            await conn.exec_driver_sql(statement)
+        patients_sql, documents_sql = SEED.split(";")
+        await conn.exec_driver_sql(patients_sql, (hospital_id, patients))
+        await conn.exec_driver_sql(documents_sql, (hospital_id, patients, documents))
+        for statement in INDEXES.split(";"):
+            await conn.exec_driver_sql(statement)
+    print(f"  seeded and indexed in {time.perf_counter() - started:.0f} s")
+
+    try:
+        print(f"Document search, first page of {PAGE_SIZE} ({iterations} iterations)")
+        print(f"  {'term':<30}  {'before ms':>9}  {'rows':>4}  {'after ms':>8}  {'rows':>4}  {'speedup':>7}")
+        for label, term in TERMS:
+            before_ms, before_rows = await measure(engine, before, hospital_id, term, iterations)
+            after_ms, after_rows = await measure(engine, after, hospital_id, term, iterations)
+            speedup = f"{before_ms / after_ms:.1f}x" if before_ms and after_ms else "-"
+            print(
+                f"  {label + ' (' + term + ')':<30}  {milliseconds(before_ms):>9}  {before_rows:>4}"
+                f"  {milliseconds(after_ms):>8}  {after_rows:>4}  {speedup:>7}"
+            )
+        print(f"  after = statement_timeout of {settings.SEARCH_STATEMENT_TIMEOUT_MS} ms, rows ranked by relevance")
+    finally:
+        async with base.begin() as conn:
+            await conn.exec_driver_sql(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await base.dispose()
+
+
+def main():
+    documents = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    asyncio.run(run(documents, iterations))
+
+
+if __name__ == "__main__":
+    main()
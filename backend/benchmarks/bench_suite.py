@@ -0,0 +1,253 @@
+"""
+PDF generation benchmark suite: signed PDF generation, image-to-PDF conversion
+and certificate rendering over a synthetic corpus.
+
+Run from the backend directory with:
+    python -m benchmarks.bench_suite run [--output results.json] [--iterations N] [--filter TEXT]
+    python -m benchmarks.bench_suite compare baseline.json results.json [--threshold 10]
+
+Every case runs in a fresh subprocess, so peak RSS is that of the case alone.
+Wall and CPU times are medians over the iterations after a first (cold) call,
+which is reported separately. `compare` exits with status 1 when a case got
+slower, bigger or more memory hungry than the threshold allows.
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import statistics
+import subprocess
+import contextlib
+from datetime import datetime
+
+from benchmarks import corpus
+
+METRICS = [
+    ("wall_ms", "Wall ms"),
+    ("cpu_ms", "CPU ms"),
+    ("peak_rss_mb", "Peak RSS MB"),
+    ("output_bytes", "Output bytes"),
+]
+
+
+def all_cases() -> list:
+    cases = []
+    for kind in corpus.KINDS:
+        for pages in corpus.PAGE_COUNTS:
+            for per_type in corpus.FIELDS_PER_TYPE:
+                cases.append(f"generate/{kind}/{pages}p/{per_type}f")
+    cases += ["image_to_pdf/jpeg_12mp", "image_to_pdf/png_screenshot", "image_to_pdf/jpeg_12mp_x4"]
+    cases += ["certificate/signature", "certificate/no_signature"]
+    return cases
+
+
+def _case_callable(case_id: str, corpus_dir: str, storage: str):
+    """Return a no-argument function running the case once and returning the output size"""
+    group, *params = case_id.split("/")
+
+    if group == "generate":
+        from app.services.pdf_generator import PDFGeneratorService
+        from benchmarks.bench_certificate import make_signature
+        kind, pages, per_type = params[0], int(params[1].rstrip("p")), int(params[2].rstrip("f"))
+        service = PDFGeneratorService(storage_path=storage)
+        kwargs = dict(
+            document_id=case_id.replace("/", "_"), signature_base64=make_signature(),
+            patient_name="Test Patient", procedure_name="Laparoscopic Cholecystectomy",
+            signed_date=datetime(2026, 1, 1), certificate_hash="ab" * 32,
+            original_pdf_path=corpus.source_pdf(pages, kind, corpus_dir),
+            signature_fields=corpus.make_fields(pages, per_type),
+            ip_address="10.0.0.1", phone_number="+919539170177",
+        )
+        return lambda: os.path.getsize(service.generate_signed_pdf(**kwargs))
+
+    if group == "image_to_pdf":
+        from app.services.image_converter import image_converter
+        # "<kind>_x<N>": N images packed into one multi-page PDF
+        kind, _, count = params[0].rpartition("_x") if "_x" in params[0] else (params[0], "", "1")
+        images = [corpus.photo_image(kind)] * int(count)
+        return lambda: len(image_converter.convert(images))
+
+    if group == "certificate":
+        from pypdf import PdfWriter
+        from app.services.pdf_generator import PDFGeneratorService, SignatureAsset
+        from benchmarks.bench_certificate import make_signature
+        service = PDFGeneratorService(storage_path=storage)
+        signature_base64 = make_signature() if params[0] == "signature" else ""
+
+        def certificate():
+            writer = PdfWriter()
+            signature = SignatureAsset.from_base64(signature_base64)
+            service._add_certificate_page(
+                writer, "Laparoscopic Cholecystectomy", "Test Patient", datetime(2026, 1, 1),
+                "ab" * 32, "00000000-0000-0000-0000-000000000000", signature,
+                signature.add_to_writer(writer) if signature else None, "10.0.0.1", "+919539170177"
+            )
+            buffer = io.BytesIO()
+            writer.write(buffer)
+            return buffer.tell()
+        return certificate
+
+    raise SystemExit(f"Unknown case {case_id}")
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss survives exec on Linux (it would include the parent's peak); VmHWM does not
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_case(case_id: str, iterations: int, corpus_dir: str, storage: str) -> dict:
+    """Measure one case in this process (called in the per-case subprocess)"""
+    with contextlib.redirect_stdout(io.StringIO()):  # The generator logs every call
+        fn = _case_callable(case_id, corpus_dir, storage)
+        start = time.perf_counter()
+        fn()
+        cold_ms = (time.perf_counter() - start) * 1000
+
+        walls, cpus = [], []
+        for _ in range(iterations):
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+            output_bytes = fn()
+            walls.append((time.perf_counter() - wall_start) * 1000)
+            cpus.append((time.process_time() - cpu_start) * 1000)
+
+    return {
+        "cold_ms": round(cold_ms, 2),
+        "wall_ms": round(statistics.median(walls), 2),
+        "cpu_ms": round(statistics.median(cpus), 2),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "output_bytes": output_bytes,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def command_run(args: argparse.Namespace):
+    from app.config import settings
+
+    cases = [case for case in all_cases() if not args.filter or args.filter in case]
+    print(f"Preparing corpus in {args.corpus_dir}...")
+    for kind in corpus.KINDS:
+        for pages in corpus.PAGE_COUNTS:
+            if any(case.startswith(f"generate/{kind}/{pages}p/") for case in cases):
+                corpus.source_pdf(pages, kind, args.corpus_dir)
+
+    results = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "iterations": args.iterations,
+            "pdf_output_mode": settings.PDF_OUTPUT_MODE,
+            "pdf_linearize": settings.PDF_LINEARIZE,
+        },
+        "cases": {},
+    }
+    print(f"Running {len(cases)} cases ({args.iterations} iterations each)")
+    print(f"  {'case':<36} {'cold ms':>9} {'wall ms':>9} {'cpu ms':>9} {'RSS MB':>7} {'bytes':>10}")
+    for case_id in cases:
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_suite", "case", case_id,
+             "--iterations", str(args.iterations), "--corpus-dir", args.corpus_dir,
+             "--storage", args.storage],
+            capture_output=True, text=True
+        )
+        if completed.returncode != 0:
+            print(f"❌ {case_id} failed:\n{completed.stderr}")
+            continue
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        results["cases"][case_id] = result
+        print(
+            f"  {case_id:<36} {result['cold_ms']:>9.1f} {result['wall_ms']:>9.1f} {result['cpu_ms']:>9.1f}"
+            f" {result['peak_rss_mb']:>7.1f} {result['output_bytes']:>10}"
+        )
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Results written to {args.output}")
+
+
+def command_compare(args: argparse.Namespace):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    print(f"Baseline {baseline['meta'].get('commit')} ({baseline['meta'].get('timestamp')})"
+          f" vs current {current['meta'].get('commit')} ({current['meta'].get('timestamp')})")
+
+    regressions = 0
+    for case_id in sorted(set(baseline["cases"]) | set(current["cases"])):
+        before, after = baseline["cases"].get(case_id), current["cases"].get(case_id)
+        if not before or not after:
+            print(f"  {case_id:<36} {'only in baseline' if before else 'new case'}")
+            continue
+        cells = []
+        for key, label in METRICS:
+            change = (after[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+            flag = ""
+            if change > args.threshold:
+                flag = " ⚠️"
+                regressions += 1
+            cells.append(f"{label} {before[key]:,g} → {after[key]:,g} ({change:+.1f}%){flag}")
+        print(f"  {case_id:<36} " + " | ".join(cells))
+
+    if regressions:
+        print(f"❌ {regressions} metrics regressed by more than {args.threshold:g}%")
+        sys.exit(1)
+    print(f"✅ No regressions above {args.threshold:g}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF generation benchmark suite")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Run the suite and write a JSON results file")
+    run.add_argument("--output", default="benchmark_results.json")
+    run.add_argument("--iterations", type=int, default=5)
+    run.add_argument("--filter", default=None, help="Only cases whose id contains this text")
+    run.add_argument("--corpus-dir", default=corpus.DEFAULT_CORPUS_DIR)
+    run.add_argument("--storage", default="/tmp/wizesign_bench/output")
+
+    compare = commands.add_parser("compare", help="Diff two results files")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=10.0, help="Allowed increase, in percent")
+
+    case = commands.add_parser("case", help=argparse.SUPPRESS)
+    case.add_argument("case_id")
+    case.add_argument("--iterations", type=int, default=5)
+    case.add_argument("--corpus-dir", default=corpus.DEFAULT_CORPUS_DIR)
+    case.add_argument("--storage", default="/tmp/wizesign_bench/output")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        command_run(args)
+    elif args.command == "compare":
+        command_compare(args)
+    else:
+        print(json.dumps(run_case(args.case_id, args.iterations, args.corpus_dir, args.storage)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Synthetic PDF corpus for the benchmark suite.
+
+Files are generated deterministically (fixed seeds) and cached under the corpus
+directory, so repeated runs and runs on different machines measure the same
+inputs. "scanned" pages are one full-page JPEG each, like a phone scan of a
+paper form; "vector" pages are text and rules only, like a PDF exported from
+a word processor.
+"""
+import io
+import os
+import random
+
+from PIL import Image, ImageDraw, ImageFilter
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+
+PAGE_COUNTS = [1, 10, 50, 200]
+KINDS = ["scanned", "vector"]
+FIELDS_PER_TYPE = [0, 10, 50]
+FIELD_TYPES = ["SIGNATURE", "TEXT", "DATE", "TITLE", "CHECKBOX"]
+
+DEFAULT_CORPUS_DIR = "/tmp/wizesign_bench/corpus"
+
+LOREM = (
+    "I consent to the procedure described above. The nature, purpose, risks and "
+    "alternatives have been explained to me and I have had the opportunity to ask questions."
+).split()
+
+
+def _scan_image(seed: int) -> bytes:
+    """A grey, slightly noisy page with text-like strokes, saved as JPEG at ~100 DPI"""
+    rng = random.Random(seed)
+    image = Image.new("L", (827, 1169), 235)
+    draw = ImageDraw.Draw(image)
+    y = 90
+    while y < 1080:
+        x = 70
+        while x < 740:
+            word = rng.randint(20, 90)
+            draw.rectangle([x, y, min(x + word, 760), y + 9], fill=rng.randint(30, 80))
+            x += word + 12
+        y += rng.choice([22, 22, 22, 44])
+    image = Image.blend(image, Image.effect_noise(image.size, 24), 0.12)
+    image = image.filter(ImageFilter.GaussianBlur(0.6)).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=75)
+    return buffer.getvalue()
+
+
+def _draw_vector_page(can: canvas.Canvas, rng: random.Random, number: int, pages: int):
+    width, height = A4
+    can.setFont("Helvetica-Bold", 16)
+    can.drawString(60, height - 70, f"Informed Consent Form - page {number} of {pages}")
+    can.setFont("Helvetica", 10)
+    y = height - 110
+    while y > 80:
+        words = [rng.choice(LOREM) for _ in range(rng.randint(10, 16))]
+        can.drawString(60, y, " ".join(words))
+        y -= 14
+        if rng.random() < 0.1:
+            can.line(60, y + 4, width - 60, y + 4)
+            y -= 10
+
+
+def source_pdf(pages: int, kind: str, corpus_dir: str = DEFAULT_CORPUS_DIR) -> str:
+    """Path of the corpus PDF for a page count and kind, generating it on first use"""
+    path = os.path.join(corpus_dir, f"{kind}_{pages}.pdf")
+    if os.path.exists(path):
+        return path
+    os.makedirs(corpus_dir, exist_ok=True)
+    rng = random.Random(pages)
+    packet = io.BytesIO()
+    can = canvas.Canvas(packet, pagesize=A4)
+    width, height = A4
+    for number in range(1, pages + 1):
+        if kind == "scanned":
+            # A distinct scan per page, as in a real scanned document
+            can.drawImage(ImageReader(io.BytesIO(_scan_image(pages * 1000 + number))), 0, 0, width, height)
+        else:
+            _draw_vector_page(can, rng, number, pages)
+        can.showPage()
+    can.save()
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(packet.getvalue())
+    os.replace(tmp_path, path)
+    return path
+
+
+def make_fields(pages: int, per_type: int) -> list:
+    """`per_type` fields of every type, spread over the pages in a grid (percent coordinates)"""
+    rng = random.Random(pages * 100 + per_type)
+    fields = []
+    for type_index, field_type in enumerate(FIELD_TYPES):
+        for i in range(per_type):
+            field = {
+                "type": field_type,
+                "page": i % pages + 1,
+                "x": 5 + (i % 3) * 30,
+                "y": 5 + ((i // 3 + type_index * 4) % 18) * 5,
+                "w": 4 if field_type == "CHECKBOX" else 25,
+                "h": 4,
+            }
+            if field_type == "CHECKBOX":
+                field.update(value=rng.choice(["true", "false"]), label="I agree")
+            elif field_type == "DATE":
+                field["value"] = "16/10/2026"
+            elif field_type in ("TEXT", "TITLE"):
+                field["value"] = " ".join(rng.choice(LOREM) for _ in range(3))
+                field["fontWeight"] = "bold" if field_type == "TITLE" else "normal"
+            fields.append(field)
+    return fields
+
+
+def photo_image(kind: str) -> bytes:
+    """Upload-like images for the image-to-PDF conversion cases"""
+    rng = random.Random(kind)
+    if kind == "jpeg_12mp":
+        # Phone camera photo of a form: uneven lighting, text blocks, sensor noise
+        lighting = Image.linear_gradient("L").resize((4000, 3000)).point(lambda v: 170 + v // 3)
+        image = Image.merge("RGB", (lighting, lighting, lighting.point(lambda v: v - 12)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(400):
+            x, y = rng.randint(0, 3900), rng.randint(0, 2950)
+            draw.rectangle([x, y, x + rng.randint(40, 300), y + 30], fill=(40, 40, 40))
+        image = Image.blend(image, Image.effect_noise((4000, 3000), 40).convert("RGB"), 0.08)
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=85)
+    else:
+        # Screenshot-like PNG
+        image = Image.new("RGB", (1240, 1754), "white")
+        draw = ImageDraw.Draw(image)
+        for y in range(100, 1650, 28):
+            draw.rectangle([100, y, rng.randint(400, 1140), y + 12], fill=(20, 20, 20))
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+    return buffer.getvalue()
@@ -0,0 +1,187 @@
+"""
+Fold existing uploads into the content-addressed upload store (app/services/storage.py)
+Run with: python dedupe_uploads.py [--dry-run]
+
+Every file referenced by a document or template that is not in the store yet
+is hashed and moved to <uploads>/sha256/ab/cd/<sha256><suffix>. Rows pointing
+at a copy of a file that is already stored are repointed to the stored one
+and the copy is deleted. Finally the stored_files reference counts are
+rebuilt from the rows, and every hospital is recorded as an owner of the
+stored files its rows use.
+
+Safe to interrupt and run again: a file is only deleted after the rows that
+used it have been committed with its new path.
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import time
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Load .env from backend directory
+load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
+
+from sqlalchemy import select, update, func, union_all
+from sqlalchemy.dialects.postgresql import insert
+
+from app.database import AsyncSessionLocal
+from app.models import Document, Template, StoredFile, StoredFileOwner
+from app.services.storage import content_store, hash_file, sniff, UPLOAD_DIR, STORE_DIR
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Move uploads into the content-addressed store and fold duplicates")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Report what would be moved and reclaimed without changing anything")
+    return parser.parse_args()
+
+
+def place(source: Path, target: Path):
+    """Put a copy of source at target (a hard link when possible, the source is deleted later)"""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(source, target)
+    except FileExistsError:
+        pass
+    except OSError:
+        shutil.copy2(source, target)
+
+
+async def repoint(old: str, new: str):
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(Document).where(Document.file_path == old)
+            .values(file_path=new, updated_at=Document.updated_at)  # Not a change of the document
+        )
+        await db.execute(update(Template).where(Template.file_path == old).values(file_path=new))
+        await db.commit()
+
+
+async def fold(dry_run: bool) -> dict:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Document.file_path).where(Document.file_path.isnot(None))
+            .union(select(Template.file_path).where(Template.file_path.isnot(None)))
+        )
+        paths = [path for path in result.scalars() if not content_store.is_stored(path)]
+
+    stats = {"files": len(paths), "moved": 0, "duplicates": 0, "missing": 0, "reclaimed_bytes": 0}
+    seen = set()  # Hashes stored during this run (a dry run doesn't create the targets)
+    started = time.perf_counter()
+    for number, old in enumerate(paths, 1):
+        source = Path(old)
+        if not source.exists():
+            print(f"⚠️ Missing file {old}, rows left unchanged")
+            stats["missing"] += 1
+            continue
+        with open(source, "rb") as f:
+            _, suffix = sniff(f.read(16))
+        sha256 = await asyncio.to_thread(hash_file, source)
+        target = content_store.path_for(sha256, suffix or source.suffix or ".bin")
+        size = source.stat().st_size
+
+        if sha256 in seen or target.exists():
+            stats["duplicates"] += 1
+            stats["reclaimed_bytes"] += size
+        else:
+            stats["moved"] += 1
+            if not dry_run:
+                await asyncio.to_thread(place, source, target)
+        seen.add(sha256)
+
+        if not dry_run:
+            await repoint(old, str(target))
+            source.unlink()
+        if number % 100 == 0:
+            print(f"  {number}/{len(paths)} files ({number / (time.perf_counter() - started):.0f}/s)")
+    return stats
+
+
+async def rebuild_counts() -> int:
+    """stored_files rows with the number of documents and templates using each stored file"""
+    async with AsyncSessionLocal() as db:
+        references = union_all(
+            select(Document.file_path.label("path")),
+            select(Template.file_path.label("path")),
+        ).subquery()
+        result = await db.execute(
+            select(references.c.path, func.count())
+            .where(references.c.path.like(f"{STORE_DIR}/%"))
+            .group_by(references.c.path)
+        )
+        counts = dict(result.all())
+
+        unused = update(StoredFile).values(ref_count=0)
+        if counts:
+            unused = unused.where(StoredFile.path.notin_(list(counts)))
+        await db.execute(unused)
+        for path, count in counts.items():
+            stored = Path(path)
+            if not stored.exists():
+                print(f"⚠️ Stored file {path} is referenced but missing")
+                continue
+            with open(stored, "rb") as f:
+                content_type, _ = sniff(f.read(16))
+            statement = insert(StoredFile).values(
+                sha256=stored.stem, path=path, size=stored.stat().st_size, content_type=content_type, ref_count=count
+            )
+            await db.execute(statement.on_conflict_do_update(
+                index_elements=[StoredFile.sha256], set_={"ref_count": statement.excluded.ref_count}
+            ))
+        await db.commit()
+        return len(counts)
+
+
+async def record_owners() -> int:
+    """stored_file_owners rows for the hospitals whose documents and templates use each stored file"""
+    async with AsyncSessionLocal() as db:
+        references = union_all(
+            select(Document.hospital_id, Document.file_path.label("path")),
+            select(Template.hospital_id, Template.file_path.label("path")),
+        ).subquery()
+        owners = (
+            select(StoredFile.sha256, references.c.hospital_id, func.timezone("UTC", func.now()))
+            .join(references, references.c.path == StoredFile.path)
+            .distinct()
+        )
+        result = await db.execute(
+            insert(StoredFileOwner)
+            .from_select(["sha256", "hospital_id", "created_at"], owners)
+            .on_conflict_do_nothing()
+        )
+        await db.commit()
+        return result.rowcount
+
+
+def unreferenced_uploads() -> tuple:
+    """Loose files in the upload directory (e.g. /upload-file uploads never used in a document)"""
+    count = size = 0
+    for entry in os.scandir(UPLOAD_DIR):
+        if entry.is_file() and not entry.name.startswith("."):
+            count += 1
+            size += entry.stat().st_size
+    return count, size
+
+
+async def main(args: argparse.Namespace):
+    stats = await fold(args.dry_run)
+    verb = "Would move" if args.dry_run else "Moved"
+    print(
+        f"{'🔎' if args.dry_run else '✅'} {verb} {stats['moved']} of {stats['files']} referenced files into the store, "
+        f"{stats['duplicates']} duplicates folded ({stats['reclaimed_bytes'] / 1024 / 1024:.1f} MB reclaimed), "
+        f"{stats['missing']} missing"
+    )
+    if not args.dry_run:
+        stored = await rebuild_counts()
+        print(f"✅ Reference counts rebuilt for {stored} stored files")
+        owners = await record_owners()
+        print(f"✅ {owners} stored file owners recorded")
+    count, size = unreferenced_uploads()
+    if count:
+        print(f"ℹ️ {count} unreferenced files ({size / 1024 / 1024:.1f} MB) left in {UPLOAD_DIR}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
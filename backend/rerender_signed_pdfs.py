@@ -0,0 +1,269 @@
+"""
+Re-render signed PDFs for SIGNED documents (e.g. after a certificate layout or wording change)
+Run with: python rerender_signed_pdfs.py [--hospital-id UUID ...] [--dry-run] [--workers N]
+
+Documents are streamed from the database with a server-side cursor in id order
+and rendered in a process pool. Progress is saved to a checkpoint file, so an
+interrupted run continues where it stopped when started again with the same
+filters (use --restart to start over). Failed documents are listed in the
+checkpoint and are not retried automatically.
+
+Documents whose original PDF is missing are skipped and listed as failed with
+"original missing": rendering them would replace the full signed PDF with a
+certificate-only one. --allow-certificate-only renders them anyway.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from datetime import datetime
+from dotenv import load_dotenv
+
+# Load .env from backend directory
+load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
+
+from sqlalchemy import select
+
+from app.database import AsyncSessionLocal
+from app.models import Document, DocumentStatusEnum, Patient
+from app.services.pdf_generator import PDFRenderEngine
+
+DEFAULT_CHECKPOINT = os.path.join(os.path.dirname(__file__), "rerender_checkpoint.json")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Re-render signed PDFs for SIGNED documents")
+    parser.add_argument("--hospital-id", action="append", type=uuid.UUID, default=[],
+                        help="Only documents of this hospital (repeatable)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="List what would be re-rendered without rendering anything")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Render processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=500,
+                        help="Rows fetched per round trip from the server-side cursor")
+    parser.add_argument("--output-mode", choices=["full", "incremental"], default=None,
+                        help="Signed PDF output mode (default: PDF_OUTPUT_MODE setting)")
+    parser.add_argument("--allow-certificate-only", action="store_true",
+                        help="Also re-render documents whose original PDF is missing (certificate page only)")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT,
+                        help="Checkpoint file used to resume an interrupted run")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignore an existing checkpoint and start from the first document")
+    parser.add_argument("--report-every", type=int, default=100,
+                        help="Print throughput every N documents")
+    return parser.parse_args()
+
+
+class Checkpoint:
+    """
+    Resume position of a run: every document with an id <= last_id is done.
+
+    Renders finish out of order, so last_id only advances over the contiguous
+    prefix of submitted documents that have completed.
+    """
+
+    def __init__(self, path: str, filters: dict):
+        self.path = path
+        self.filters = filters
+        self.last_id: str | None = None
+        self.rendered = 0
+        self.failed: list = []
+        self._pending: list = []  # Submitted ids in cursor order
+        self._done: set = set()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            data = json.load(f)
+        if data.get("filters") != self.filters:
+            raise SystemExit(
+                f"❌ Checkpoint {self.path} was written with different filters {data.get('filters')}; "
+                f"use --restart or another --checkpoint"
+            )
+        self.last_id = data.get("last_id")
+        self.rendered = data.get("rendered", 0)
+        self.failed = data.get("failed", [])
+
+    def submitted(self, document_id: str):
+        self._pending.append(document_id)
+
+    def completed(self, document_id: str, error: Exception | str | None = None):
+        if error is None:
+            self.rendered += 1
+        else:
+            self.failed.append({"id": document_id, "error": str(error)})
+        self._done.add(document_id)
+        # Advance over the finished prefix
+        advanced = 0
+        while advanced < len(self._pending) and self._pending[advanced] in self._done:
+            self._done.discard(self._pending[advanced])
+            advanced += 1
+        if advanced:
+            self.last_id = self._pending[advanced - 1]
+            del self._pending[:advanced]
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "filters": self.filters,
+                "last_id": self.last_id,
+                "rendered": self.rendered,
+                "failed": self.failed,
+                "updated_at": datetime.utcnow().isoformat(),
+            }, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def signed_documents_query(hospital_ids: list, after_id: str | None):
+    """Columns needed for rendering only; no ORM objects are built per row"""
+    query = (
+        select(
+            Document.id, Document.signature, Document.procedure_name, Document.signed_date,
+            Document.certificate_hash, Document.file_path, Document.fields, Document.ip_address,
+            Patient.full_name, Patient.phone,
+        )
+        .outerjoin(Patient, Document.patient_id == Patient.id)
+        .where(Document.status == DocumentStatusEnum.SIGNED)
+        .order_by(Document.id)
+    )
+    if hospital_ids:
+        query = query.where(Document.hospital_id.in_(hospital_ids))
+    if after_id:
+        query = query.where(Document.id > uuid.UUID(after_id))
+    return query
+
+
+def has_original(row) -> bool:
+    """Without its original, generate_signed_pdf falls back to a certificate-only PDF"""
+    return bool(row.file_path) and os.path.exists(row.file_path)
+
+
+def render_kwargs(row, output_mode: str | None) -> dict:
+    """Same arguments submit_signature passes to the generator"""
+    return dict(
+        document_id=str(row.id),
+        signature_base64=row.signature,
+        patient_name=row.full_name or "Unknown",
+        procedure_name=row.procedure_name,
+        signed_date=row.signed_date,
+        certificate_hash=row.certificate_hash,
+        original_pdf_path=row.file_path,
+        signature_fields=row.fields,
+        ip_address=row.ip_address,
+        phone_number=row.phone,
+        output_mode=output_mode,
+    )
+
+
+class Throughput:
+    def __init__(self, report_every: int):
+        self.report_every = report_every
+        self.started = time.perf_counter()
+        self.count = 0
+
+    def tick(self, checkpoint: Checkpoint | None = None):
+        self.count += 1
+        if self.count % self.report_every == 0:
+            self.report("…")
+            if checkpoint:
+                checkpoint.save()
+
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.count / elapsed if elapsed > 0 else 0.0
+
+    def report(self, prefix: str):
+        elapsed = time.perf_counter() - self.started
+        print(f"{prefix} {self.count} documents in {elapsed:.1f}s ({self.rate():.1f} docs/sec)")
+
+
+async def dry_run(args: argparse.Namespace, checkpoint: Checkpoint):
+    throughput = Throughput(args.report_every)
+    missing_originals = 0
+    async with AsyncSessionLocal() as session:
+        result = await session.stream(
+            signed_documents_query(args.hospital_id, checkpoint.last_id)
+            .execution_options(yield_per=args.batch_size)
+        )
+        async for row in result:
+            if not has_original(row):
+                missing_originals += 1
+            print(f"  - {row.id} {row.procedure_name!r} signed {row.signed_date}")
+            throughput.tick()
+    throughput.report("🔎 Dry run: would re-render")
+    if missing_originals:
+        if args.allow_certificate_only:
+            print(f"⚠️ {missing_originals} documents have no stored original; they would get a certificate-only PDF")
+        else:
+            print(f"⚠️ {missing_originals} documents have no stored original; they would be skipped")
+
+
+async def rerender(args: argparse.Namespace, checkpoint: Checkpoint):
+    engine = PDFRenderEngine(max_workers=args.workers, max_queue=args.workers)
+    # Backpressure: stop pulling rows while the pool is full
+    slots = asyncio.Semaphore(engine.max_workers + engine.max_queue)
+    throughput = Throughput(args.report_every)
+    tasks = set()
+
+    async def render(row):
+        document_id = str(row.id)
+        try:
+            if not args.allow_certificate_only and not has_original(row):
+                # Keep the existing signed PDF rather than replace it with the certificate alone
+                print(f"⚠️ Skipping {document_id}: original PDF missing")
+                checkpoint.completed(document_id, "original missing")
+                return
+            await engine.generate_signed_pdf(**render_kwargs(row, args.output_mode))
+            checkpoint.completed(document_id)
+        except Exception as e:
+            print(f"❌ Failed to re-render {document_id}: {e}")
+            checkpoint.completed(document_id, e)
+        finally:
+            slots.release()
+            throughput.tick(checkpoint)
+
+    try:
+        async with AsyncSessionLocal() as session:
+            result = await session.stream(
+                signed_documents_query(args.hospital_id, checkpoint.last_id)
+                .execution_options(yield_per=args.batch_size)
+            )
+            async for row in result:
+                await slots.acquire()
+                checkpoint.submitted(str(row.id))
+                task = asyncio.create_task(render(row))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+    finally:
+        checkpoint.save()
+        engine.shutdown(wait=True)
+
+    throughput.report("✅ Re-rendered")
+    print(f"   Total rendered across runs: {checkpoint.rendered}, failed: {len(checkpoint.failed)}")
+    print(f"   Checkpoint: {checkpoint.path}")
+
+
+async def main():
+    args = parse_args()
+    checkpoint = Checkpoint(args.checkpoint, {"hospital_ids": sorted(str(h) for h in args.hospital_id)})
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    checkpoint.load()
+    if checkpoint.last_id:
+        print(f"ℹ️ Resuming after document {checkpoint.last_id} ({checkpoint.rendered} already rendered)")
+
+    if args.dry_run:
+        await dry_run(args, checkpoint)
+    else:
+        print(f"Re-rendering signed PDFs with {args.workers} worker processes...")
+        await rerender(args, checkpoint)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
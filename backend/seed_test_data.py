@@ -5,6 +5,7 @@ from sqlalchemy import select
 
 from app.database import AsyncSessionLocal
 from app.models import User, RoleEnum, Hospital, Patient
+from app.services.patients import normalize_phone
 
 def hash_password(password: str) -> str:
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
@@ -78,6 +79,7 @@ async def seed_test_data():
                 full_name="Test Patient",
                 email="test.patient@example.com",
                 phone="+919539170177",
+                phone_normalized=normalize_phone("+919539170177"),
                 dob="1996-01-15",
                 registration_number="P_TEST",
                 age=30,
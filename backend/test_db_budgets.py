@@ -0,0 +1,265 @@
+"""
+Database round-trip budgets: calls every API route once, in-process against the
+DATABASE_URL database, and fails when a route uses more round trips than
+ROUTE_BUDGETS in app/services/query_stats.py allows, has no budget, or is not
+called here. Round trips are read from the Server-Timing header.
+
+Creates its own hospital, users, templates and documents and deletes them
+afterwards. Needs a migrated database (alembic upgrade head); WizeChat is
+never called.
+Run with: python test_db_budgets.py [--verbose]   (exit status 1 on failure)
+"""
+import argparse
+import io
+import json
+import os
+import re
+import sys
+import uuid
+from datetime import timedelta
+from dotenv import load_dotenv
+
+# Load .env from backend directory
+load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
+
+import bcrypt
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+from jose import jwt
+from reportlab.pdfgen import canvas
+from sqlalchemy import select, delete
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.main import app
+from app.models import Hospital, User, Patient, Document, Template, OutboxMessage, RoleEnum
+from app.routers.auth import create_access_token
+from app.services.query_stats import ROUTE_BUDGETS
+from app.services.storage import content_store
+
+ROUND_TRIPS = re.compile(r'db-round-trips;desc="(\d+)"')
+PASSWORD = "budget-check-" + uuid.uuid4().hex[:8]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Check the database round-trip budget of every API route")
+    parser.add_argument("--verbose", action="store_true", help="Print every call, not only failures")
+    return parser.parse_args()
+
+
+def sample_pdf(text: str) -> bytes:
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer)
+    pdf.drawString(100, 750, text)
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+class BudgetCheck:
+    def __init__(self, client: TestClient):
+        self.client = client
+        self.calls = []  # (route, method, path, status, round trips)
+        self.failures = []
+
+    def call(self, route: str, method: str, path: str, expect=(200,), **kwargs):
+        response = self.client.request(method, path, **kwargs)
+        match = ROUND_TRIPS.search(response.headers.get("server-timing", ""))
+        round_trips = int(match.group(1)) if match else None
+        self.calls.append((route, method, path, response.status_code, round_trips))
+        if response.status_code not in expect:
+            self.failures.append(f"{method} {path} ({route}): status {response.status_code}, expected {expect}: {response.text[:200]}")
+        elif round_trips is None:
+            self.failures.append(f"{method} {path} ({route}): no Server-Timing header")
+        elif route not in ROUTE_BUDGETS:
+            self.failures.append(f"{method} {path} ({route}): no budget in ROUTE_BUDGETS")
+        elif round_trips > ROUTE_BUDGETS[route]:
+            self.failures.append(f"{method} {path} ({route}): {round_trips} round trips, budget {ROUTE_BUDGETS[route]}")
+        return response
+
+    def check_coverage(self):
+        called = {route for route, *_ in self.calls}
+        for route in app.routes:
+            if isinstance(route, APIRoute) and route.path.startswith("/api/"):
+                if route.name not in ROUTE_BUDGETS:
+                    self.failures.append(f"{route.path} ({route.name}): no budget in ROUTE_BUDGETS")
+                if route.name not in called:
+                    self.failures.append(f"{route.path} ({route.name}): not called by test_db_budgets.py")
+
+
+def with_client_address(asgi_app):
+    """This TestClient leaves scope["client"] empty; handlers record the caller's IP"""
+    async def wrapped(scope, receive, send):
+        if scope["type"] == "http":
+            scope = {**scope, "client": ("127.0.0.1", 50000)}
+        await asgi_app(scope, receive, send)
+    return wrapped
+
+
+async def create_fixtures(tag: str) -> dict:
+    async with AsyncSessionLocal() as db:
+        hospital = Hospital(id=uuid.uuid4(), name=f"DB budget check {tag}")
+        hashed = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt()).decode()
+        doctor = User(
+            id=uuid.uuid4(), email=f"doctor-{tag}@budget.check", name="Dr Budget",
+            hashed_password=hashed, role=RoleEnum.DOCTOR, hospital_id=hospital.id
+        )
+        admin = User(
+            id=uuid.uuid4(), email=f"admin-{tag}@budget.check", name="Budget Admin",
+            hashed_password=hashed, role=RoleEnum.SUPERADMIN, hospital_id=hospital.id
+        )
+        db.add_all([hospital, doctor, admin])
+        await db.commit()
+        return {"hospital": hospital, "doctor": doctor, "admin": admin}
+
+
+async def remove_fixtures(hospital_id: uuid.UUID):
+    async with AsyncSessionLocal() as db:
+        for model in (Document, Template):
+            result = await db.execute(select(model.file_path).where(model.hospital_id == hospital_id))
+            for path in result.scalars():
+                await content_store.release(db, path)
+        # Audit events, jobs and outbox messages go with the documents (ON DELETE CASCADE)
+        await db.execute(delete(Document).where(Document.hospital_id == hospital_id))
+        await db.execute(delete(Template).where(Template.hospital_id == hospital_id))
+        await db.execute(delete(Patient).where(Patient.hospital_id == hospital_id))
+        await db.execute(delete(User).where(User.hospital_id == hospital_id))
+        await db.execute(delete(Hospital).where(Hospital.id == hospital_id))
+        await db.commit()
+
+
+async def latest_otp(document_id: str) -> str:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(OutboxMessage.payload)
+            .where(OutboxMessage.document_id == uuid.UUID(document_id), OutboxMessage.kind == "send_otp")
+            .order_by(OutboxMessage.created_at.desc())
+            .limit(1)
+        )
+        return result.scalar_one()["otp_code"]
+
+
+def bearer(user: User) -> dict:
+    token = create_access_token({
+        "sub": str(user.id), "email": user.email, "role": user.role.value, "hospital_id": str(user.hospital_id)
+    }, expires_delta=timedelta(minutes=30))
+    return {"Authorization": f"Bearer {token}"}
+
+
+def exercise(check: BudgetCheck, fixtures: dict, tag: str):
+    hospital, doctor, admin = fixtures["hospital"], fixtures["doctor"], fixtures["admin"]
+    auth = bearer(doctor)
+    pdf = sample_pdf("DB budget check")
+
+    # auth
+    # Only available with APP_ENV=development
+    check.call("generate_test_token", "POST", "/api/auth/sso/generate-test-token", expect=(200, 403))
+    sso_token = jwt.encode({
+        "user": {"email": doctor.email, "name": doctor.name, "role": "DOCTOR"},
+        "hospital": {"name": hospital.name},
+        "patient": {"id": f"budget-{tag}", "name": "SSO Patient", "phone": "+910000000001"},
+    }, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    check.call("validate_sso_token", "POST", "/api/auth/sso/validate", json={"token": sso_token, "source": "wizeflow"})
+    check.call("wizeflow_sso_login", "POST", "/api/auth/sso/wizeflow", headers={"Authorization": f"Bearer {sso_token}"})
+    check.call("login", "POST", "/api/auth/login", data={"username": doctor.email, "password": PASSWORD})
+    check.call("read_users_me", "GET", "/api/auth/me", headers=auth)
+
+    # hospitals (check-wizechat before the config is set, so WizeChat is not called)
+    check.call("get_my_hospital", "GET", "/api/hospitals/me", headers=auth)
+    check.call("check_wizechat_connection", "POST", "/api/hospitals/me/check-wizechat", headers=auth)
+    check.call("update_hospital_settings", "PATCH", "/api/hospitals/me/settings", headers=auth,
+               json={"wizechat_config": {"api_key": "budget-check", "inbox_id": "budget-check"}})
+    check.call("get_wizechat_status", "GET", "/api/hospitals/me/wizechat-status", headers=auth)
+
+    # templates
+    fields = [
+        {"id": "name", "type": "TEXT", "label": "Patient Name", "x": 10, "y": 20, "w": 30, "h": 3},
+        {"id": "sig", "type": "SIGNATURE", "label": "Signature", "x": 10, "y": 80, "w": 30, "h": 5},
+    ]
+    template = check.call(
+        "create_template", "POST", "/api/templates/", expect=(201,), headers=auth,
+        data={"metadata": json.dumps({"name": "Budget consent", "fields": fields})},
+        files=[("file", ("consent.pdf", pdf, "application/pdf"))]
+    ).json()
+    check.call("list_templates", "GET", "/api/templates/", headers=auth)
+    check.call("get_template", "GET", f"/api/templates/{template['id']}", headers=auth)
+    check.call("update_template", "PATCH", f"/api/templates/{template['id']}", headers=auth, json={"name": "Budget consent v2"})
+    check.call("download_template_file", "GET", f"/api/templates/{template['id']}/download", headers=auth)
+    spare = check.client.post("/api/templates/", headers=auth, json={"name": "Spare", "file_url": "https://example.com/spare.pdf"}).json()
+    check.call("delete_template", "DELETE", f"/api/templates/{spare['id']}", expect=(204,), headers=auth)
+
+    # documents
+    upload = check.call(
+        "upload_document_file", "POST", "/api/documents/upload-file", headers=auth,
+        files={"file": ("upload.pdf", sample_pdf("Uploaded"), "application/pdf")}
+    ).json()
+    check.call("create_document_for_patient", "POST", "/api/documents/create", expect=(201,), headers=auth, json={
+        "patient": {"full_name": "Upload Patient", "phone": "+910000000002"},
+        "procedure_name": "Budget upload", "file_path": upload["file_path"],
+    })
+    document = check.call("create_document_for_patient", "POST", "/api/documents/create", expect=(201,), headers=auth, json={
+        "patient": {"full_name": "Budget Patient", "phone": "+910000000003"},
+        "procedure_name": "Budget procedure", "template_id": template["id"], "field_values": {"name": "Budget Patient"},
+    }).json()
+    check.call("bulk_create_documents", "POST", "/api/documents/bulk-create", expect=(201,), headers=auth, json={
+        "template_id": template["id"], "send_via_whatsapp": True,
+        "items": [
+            {"patient": {"full_name": f"Bulk {i}", "phone": f"+9100000001{i:02d}"}, "field_values": {"name": f"Bulk {i}"}}
+            for i in range(25)
+        ],
+    })
+    document_id, token = document["id"], document["secure_token"]
+    check.call("list_documents", "GET", "/api/documents/", headers=auth)
+    check.call("list_documents", "GET", "/api/documents/", headers=auth, params={"view": "summary", "limit": 1})
+    check.call("list_documents", "GET", "/api/documents/", headers=auth, params={"search": "Budget"})
+    check.call("get_document_by_id", "GET", f"/api/documents/{document_id}", headers=auth)
+    check.call("get_document_by_token", "GET", f"/api/documents/by-token/{token}")
+    check.call("update_document_fields", "PATCH", f"/api/documents/{document_id}/fields", headers=auth,
+               json={"doctor_name": "Dr Budget"})
+    check.call("send_document_via_whatsapp", "POST", f"/api/documents/{document_id}/send-whatsapp",
+               json={"inbox_id": "", "phone_number": "+910000000003"})
+    check.call("download_original_document", "GET", f"/api/documents/{document_id}/pdf")
+    check.call("get_page_preview", "GET", f"/api/documents/{document_id}/pages/1", expect=(200, 404))
+    check.call("send_otp", "POST", f"/api/documents/{document_id}/send-otp")
+    otp = check.client.portal.call(latest_otp, document_id)
+    check.call("verify_otp", "POST", f"/api/documents/{document_id}/verify-otp", params={"otp_code": otp})
+    check.call("submit_signature", "POST", f"/api/documents/{document_id}/sign", params={"token": token},
+               json={"signature": "data:image/png;base64,iVBORw0KGgo=", "ip_address": "127.0.0.1"})
+    # The signed PDF is rendered by worker.py; without a worker this answers "not ready yet"
+    check.call("download_signed_document", "GET", f"/api/documents/{document_id}/download", params={"token": token},
+               expect=(200, 503))
+
+    # superadmin
+    admin_auth = bearer(admin)
+    check.call("get_dashboard_stats", "GET", "/api/superadmin/dashboard-stats", headers=admin_auth)
+    check.call("list_hospitals", "GET", "/api/superadmin/hospitals", headers=admin_auth)
+    check.call("list_all_users", "GET", "/api/superadmin/users", headers=admin_auth)
+
+
+def main(args: argparse.Namespace) -> int:
+    tag = uuid.uuid4().hex[:8]
+    # Database helpers run on the client's event loop, which owns the pooled connections
+    with TestClient(with_client_address(app)) as client:
+        fixtures = client.portal.call(create_fixtures, tag)
+        try:
+            check = BudgetCheck(client)
+            exercise(check, fixtures, tag)
+            check.check_coverage()
+        finally:
+            client.portal.call(remove_fixtures, fixtures["hospital"].id)
+
+    for route, method, path, status_code, round_trips in check.calls:
+        if args.verbose:
+            budget = ROUTE_BUDGETS.get(route, "-")
+            print(f"  {round_trips if round_trips is not None else '?':>3} / {budget:<3} {status_code} {method} {path}")
+    if check.failures:
+        print(f"❌ {len(check.failures)} round-trip budget failures:")
+        for failure in check.failures:
+            print(f"  - {failure}")
+        return 1
+    print(f"✅ {len(check.calls)} calls within their round-trip budgets")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(parse_args()))
@@ -0,0 +1,115 @@
+"""
+Background worker: runs the jobs enqueued by the API (signed PDF rendering),
+delivers the WizeChat outbox (OTPs, signature requests, confirmations),
+expires the links of documents that were not signed in time and removes
+unreferenced files from the upload store.
+Run with: python worker.py [--concurrency N] [--metrics-port PORT]
+          python worker.py --requeue-dead [--kind KIND]
+
+Any number of workers can run against the same database; jobs and messages
+are claimed with SELECT ... FOR UPDATE SKIP LOCKED. SIGTERM/SIGINT stop
+claiming and wait for the running jobs and sends to finish.
+"""
+import argparse
+import asyncio
+import os
+import signal
+from dotenv import load_dotenv
+
+# Load .env from backend directory
+load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
+
+from app.config import settings
+from app.services.jobs import job_queue, JobWorker
+from app.services.link_expiry import expire_links
+from app.services.metrics import metrics
+from app.services.outbox import outbox_dispatcher
+from app.services.pdf_generator import pdf_render_engine
+from app.services.storage import content_store
+from app.services.wizechat import wizechat_service
+import app.services.document_jobs  # noqa: F401  (registers the job handlers)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="WizeSign background job worker")
+    parser.add_argument("--concurrency", type=int, default=settings.JOB_WORKER_CONCURRENCY,
+                        help="Jobs run at once (default: JOB_WORKER_CONCURRENCY)")
+    parser.add_argument("--metrics-port", type=int, default=settings.JOB_WORKER_METRICS_PORT,
+                        help="Port serving this worker's Prometheus metrics (0 disables)")
+    parser.add_argument("--requeue-dead", action="store_true",
+                        help="Put dead-lettered jobs back in the queue and exit")
+    parser.add_argument("--kind", default=None,
+                        help="With --requeue-dead: only jobs of this kind")
+    return parser.parse_args()
+
+
+async def serve_metrics(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Minimal HTTP endpoint for Prometheus; every request gets the metrics page"""
+    try:
+        await reader.readuntil(b"\r\n\r\n")
+        body = (await metrics.render()).encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            b"Content-Length: " + str(len(body)).encode() + b"\r\n"
+            b"Connection: close\r\n\r\n" + body
+        )
+        await writer.drain()
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def run_periodic(stop: asyncio.Event, name: str, interval: float, task):
+    """Run `task` every `interval` seconds until stop is set; it prints what it did if it returns a count"""
+    while not stop.is_set():
+        try:
+            count = await task()
+            if count:
+                print(f"🧹 {name}: {count}")
+        except Exception as e:
+            print(f"⚠️ {name} failed: {e}")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def main(args: argparse.Namespace):
+    if args.requeue_dead:
+        count = await job_queue.requeue_dead(args.kind)
+        print(f"✅ Requeued {count} dead jobs")
+        return
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    server = None
+    if args.metrics_port:
+        server = await asyncio.start_server(serve_metrics, "0.0.0.0", args.metrics_port)
+        print(f"📈 Worker metrics on :{args.metrics_port}/metrics")
+
+    worker = JobWorker(job_queue, concurrency=args.concurrency, poll_interval=settings.JOB_POLL_INTERVAL)
+    dispatcher = JobWorker(
+        outbox_dispatcher, concurrency=settings.OUTBOX_CONCURRENCY,
+        poll_interval=settings.OUTBOX_POLL_INTERVAL, name="Outbox dispatcher"
+    )
+    try:
+        await asyncio.gather(
+            worker.run_forever(stop),
+            dispatcher.run_forever(stop),
+            run_periodic(stop, "Upload store files removed", settings.STORAGE_GC_INTERVAL, content_store.collect_garbage),
+            run_periodic(stop, "Document links expired", settings.LINK_EXPIRY_SWEEP_INTERVAL, expire_links),
+        )
+    finally:
+        if server:
+            server.close()
+        pdf_render_engine.shutdown(wait=True)
+        await wizechat_service.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
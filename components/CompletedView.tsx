@@ -10,6 +10,7 @@ export const CompletedView: React.FC = () => {
     const navigate = useNavigate();
     const { consentForm, patientDetails, resetSession } = useAppStore();
     const [isDownloading, setIsDownloading] = useState(false);
+    const [isPreparing, setIsPreparing] = useState(false);
 
     const handleFinish = () => {
         resetSession();
@@ -25,7 +26,8 @@ export const CompletedView: React.FC = () => {
         setIsDownloading(true);
         try {
             // Fetch the PDF blob
-            const blob = await api.downloadSignedDocument(consentForm.transactionId);
+            // Right after signing the PDF may still be rendering; the request waits for it
+            const blob = await api.downloadSignedDocument(consentForm.transactionId, () => setIsPreparing(true));
 
             // Create download link
             const url = window.URL.createObjectURL(blob);
@@ -38,11 +40,12 @@ export const CompletedView: React.FC = () => {
             window.URL.revokeObjectURL(url);
 
             toast.success('Document downloaded successfully!');
-        } catch (error) {
+        } catch (error: any) {
             console.error('Download error:', error);
-            toast.error('Failed to download document. Please try again.');
+            toast.error(error?.message || 'Failed to download document. Please try again.');
         } finally {
             setIsDownloading(false);
+            setIsPreparing(false);
         }
     };
 
@@ -159,7 +162,7 @@ export const CompletedView: React.FC = () => {
                                 className="flex items-center gap-2 text-white bg-blue-600 hover:bg-blue-700 disabled:bg-slate-400 disabled:cursor-not-allowed px-4 py-2 rounded-lg text-sm font-bold transition-colors"
                             >
                                 <Download className="w-4 h-4" />
-                                {isDownloading ? 'Downloading...' : 'Download Signed PDF'}
+                                {isPreparing ? 'Preparing signed PDF...' : isDownloading ? 'Downloading...' : 'Download Signed PDF'}
                             </button>
                         </div>
                     </div>
@@ -13,6 +13,11 @@ async function handleResponse<T>(response: Response): Promise<T> {
   return response.json();
 }
 
+// The signed PDF is rendered in the background after signing; until it is
+// ready /download answers 503 with Retry-After, so downloads wait this long
+const SIGNED_PDF_MAX_WAIT_MS = 60000;
+const DEFAULT_RETRY_AFTER_SECONDS = 5;
+
 const getAuthHeaders = () => {
     const token = localStorage.getItem('access_token');
     return token ? { 'Authorization': `Bearer ${token}` } : {};
@@ -47,14 +52,24 @@ export const api = {
     return handleResponse<any>(response);
   },
 
-  downloadSignedDocument: async (documentId: string) => {
-    const response = await fetch(`${API_BASE_URL}/documents/${documentId}/download`);
-    if (!response.ok) {
-      const errorData = await response.json().catch(() => ({ detail: response.statusText }));
-      throw new Error(errorData.detail || 'Failed to download document');
+  downloadSignedDocument: async (documentId: string, onWaiting?: () => void) => {
+    const deadline = Date.now() + SIGNED_PDF_MAX_WAIT_MS;
+    while (true) {
+      const response = await fetch(`${API_BASE_URL}/documents/${documentId}/download`);
+      if (response.status === 503 && Date.now() < deadline) {
+        // Still being generated: wait as long as the server asks, then try again
+        const retryAfter = Number(response.headers.get('Retry-After')) || DEFAULT_RETRY_AFTER_SECONDS;
+        onWaiting?.();
+        await new Promise(resolve => setTimeout(resolve, Math.min(retryAfter * 1000, deadline - Date.now())));
+        continue;
+      }
+      if (!response.ok) {
+        const errorData = await response.json().catch(() => ({ detail: response.statusText }));
+        throw new Error(errorData.detail || 'Failed to download document');
+      }
+      // Return blob for download
+      return response.blob();
     }
-    // Return blob for download
-    return response.blob();
   },
 
   sendWhatsApp: async (documentId: string, data: { inbox_id: string, phone_number: string, send_via_whatsapp: boolean }) => {
@@ -82,7 +97,8 @@ export const api = {
 
   listDocuments: async (options?: { statusFilter?: string, patientId?: string, search?: string }) => {
     let url = `${API_BASE_URL}/documents/`;
-    const params = new URLSearchParams();
+    // The dashboard list doesn't need signatures, fields or jobs
+    const params = new URLSearchParams({ view: 'summary' });
     
     if (options?.statusFilter && options.statusFilter !== 'ALL') {
       params.append('status_filter', options.statusFilter);
@@ -94,10 +110,7 @@ export const api = {
       params.append('search', options.search);
     }
     
-    const queryString = params.toString();
-    if (queryString) {
-      url += `?${queryString}`;
-    }
+    url += `?${params.toString()}`;
 
     const response = await fetch(url, {
       headers: getAuthHeaders()